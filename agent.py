@@ -1,7 +1,42 @@
 import random
+import numpy as np
+
+class AgentArrays:
+    """
+    Struct-of-arrays storage for the agents of one simulation.
+
+    Beliefs and adjacency live in flat NumPy arrays shared by the Agent views
+    and the stepping engines, so no per-agent copies of either exist.
+    """
+    def __init__(self, beliefs, indptr, indices):
+        """
+        Args:
+            beliefs (numpy.ndarray): Belief of every agent, by agent id.
+            indptr, indices (numpy.ndarray): Symmetric CSR adjacency.
+        """
+        self.beliefs = np.asarray(beliefs, dtype=np.float64)
+        self.indptr = indptr
+        self.indices = indices
+        # The adjacency is shared by every view and engine; neighbors() hands out slices of it
+        self.indptr.flags.writeable = False
+        self.indices.flags.writeable = False
+
+    def neighbors(self, agent_id):
+        """Returns the ids connected to agent_id (a read-only slice of the adjacency)."""
+        return self.indices[self.indptr[agent_id]:self.indptr[agent_id + 1]]
 
 class Agent:
-    """Represents an agent in the simulation."""
+    """
+    Represents an agent in the simulation.
+
+    Inside a Simulation an Agent is a lightweight view: its belief is read
+    from (and written to) the simulation's shared AgentArrays, and its
+    connections are read from the shared adjacency. A standalone Agent stores
+    them itself.
+    """
+    __slots__ = ('id', 'group', 'trust_store',
+                 '_beliefs', '_index', '_connections', '_arrays', '_trust_scores')
+
     def __init__(self, agent_id, initial_belief, connections=None, trust_scores=None):
         """
         Initializes an agent.
@@ -13,23 +48,106 @@ class Agent:
             trust_scores (dict, optional): Map {agent_id -> trust_score} for Echo Chamber model. Defaults to None.
         """
         self.id = agent_id
-        self.belief_state = initial_belief
-        # --- Assign Fixed Group based on initial belief --- 
-        self.group = 'A' if initial_belief < 0.5 else 'B'
+        # A standalone agent keeps its belief in a one-element array
+        self._beliefs = np.array([initial_belief], dtype=np.float64)
+        self._index = 0
+        self._arrays = None
+        # --- Assign Fixed Group based on initial belief ---
+        self.group = Agent.group_for_belief(initial_belief)
         # --- End Group Assignment ---
         # Store connections as a set for efficient lookup
-        self.connections = set(connections) if connections else set()
+        self._connections = set(connections) if connections else set()
         # Trust scores specific to Echo Chamber model
-        self.trust_scores = trust_scores if trust_scores else {}
+        self._trust_scores = trust_scores if trust_scores else {}
+        # Shared sparse trust (trust.TrustStore) consulted for agents not in trust_scores
+        self.trust_store = None
+
+    @classmethod
+    def view(cls, agent_id, arrays, group, trust_store=None):
+        """
+        Creates an agent backed by shared AgentArrays (no per-agent storage).
+
+        Args:
+            agent_id (int): Agent id, also its index into the arrays.
+            arrays (AgentArrays): Shared belief and adjacency storage.
+            group (str): The agent's fixed group label.
+            trust_store (trust.TrustStore, optional): Shared trust for the Echo Chamber model.
+        """
+        agent = cls.__new__(cls)
+        agent.id = agent_id
+        agent._beliefs = arrays.beliefs
+        agent._index = agent_id
+        agent._arrays = arrays
+        agent.group = group
+        agent._connections = None
+        agent._trust_scores = None # Created on first use, so views carry no per-agent dict
+        agent.trust_store = trust_store
+        return agent
+
+    @staticmethod
+    def group_for_belief(initial_belief):
+        """Returns the fixed group ('A' or 'B') for an initial belief."""
+        return 'A' if initial_belief < 0.5 else 'B'
+
+    @property
+    def belief_state(self):
+        """The agent's current belief."""
+        return self._beliefs.item(self._index)
+
+    @belief_state.setter
+    def belief_state(self, value):
+        self._beliefs[self._index] = value
+
+    @property
+    def connections(self):
+        """
+        IDs of connected agents.
+
+        A set for standalone agents. Simulation agents return a frozenset built
+        from the shared adjacency: the network of a running simulation is fixed.
+        """
+        if self._arrays is not None:
+            return frozenset(self._arrays.neighbors(self._index).tolist())
+        return self._connections
+
+    @connections.setter
+    def connections(self, value):
+        self._check_connections_mutable()
+        self._connections = set(value)
 
     def add_connection(self, other_agent_id):
         """Adds a connection to another agent."""
-        self.connections.add(other_agent_id)
+        self._check_connections_mutable()
+        self._connections.add(other_agent_id)
+
+    def _check_connections_mutable(self):
+        if self._arrays is not None:
+            raise ValueError(f"Agent {self.id} belongs to a simulation; its connections are the "
+                             "simulation's network and cannot be changed.")
+
+    @property
+    def trust_scores(self):
+        """Map {agent_id -> trust_score} of explicit trust (Echo Chamber model)."""
+        if self._trust_scores is None:
+            self._trust_scores = {}
+        return self._trust_scores
+
+    @trust_scores.setter
+    def trust_scores(self, scores):
+        self._trust_scores = scores
+
+    def has_trust_scores(self):
+        """Whether the agent holds any explicit trust scores (without creating its map)."""
+        return bool(self._trust_scores)
 
     def set_trust_scores(self, scores):
         """Sets the trust scores for this agent."""
         self.trust_scores = scores
 
+    def set_trust_store(self, trust_store):
+        """Attaches the shared trust store used for agents without an explicit score."""
+        self.trust_store = trust_store
+
     def get_trust_score(self, other_agent_id, default_trust=0.1):
         """
         Retrieves the trust score for a specific agent.
@@ -41,7 +159,24 @@ class Agent:
         Returns:
             float: The trust score.
         """
-        return self.trust_scores.get(other_agent_id, default_trust)
+        if self._trust_scores and other_agent_id in self._trust_scores:
+            return self._trust_scores[other_agent_id]
+        if self.trust_store is not None:
+            return self.trust_store.get(self.id, other_agent_id, default_trust=default_trust)
+        return default_trust
+
+    def average_trust(self):
+        """
+        Average trust this agent gives to the other agents.
+
+        Returns:
+            float or None: The average, or None if the agent holds no trust scores.
+        """
+        if self.trust_store is not None:
+            return self.trust_store.average(self.id)
+        if self._trust_scores:
+            return sum(self._trust_scores.values()) / len(self._trust_scores)
+        return None
 
     def __repr__(self):
         # Include group in representation
@@ -49,4 +184,4 @@ class Agent:
 
     def update_belief(self, new_belief):
          """Updates the agent's belief state, ensuring it stays within [0, 1]."""
-         self.belief_state = max(0.0, min(1.0, new_belief))    
\ No newline at end of file
+         self.belief_state = max(0.0, min(1.0, new_belief))
\ No newline at end of file
@@ -1,185 +1,48 @@
 import streamlit as st
-import networkx as nx
 # Remove matplotlib import if no longer needed elsewhere
 # import matplotlib.pyplot as plt 
-import plotly.graph_objects as go # Import Plotly
 import time
 import copy # To deep copy simulation state for modifications
-import pandas as pd # For metrics DataFrame
-import plotly.express as px # Import plotly express for default colors
 
 from simulation import Simulation
+from network_utils import AGENT_COUNT_OPTIONS, network_size_error
+from visualization import visualize_network as build_network_figure, plot_metrics
+from layout_service import LayoutService
+from metrics import MetricsHistory
 
-# --- Visualization Function (Updated for FIXED Group Symbols) ---
+@st.cache_resource
+def get_layout_service():
+    """One layout cache shared by all sessions."""
+    return LayoutService()
+
+# --- Visualization Function (shared figure builder from visualization.py) ---
 def visualize_network(sim_state, drawing_placeholder):
-    """Draws the network state using Plotly, differentiating fixed groups by symbol."""
+    """Draws the network state using Plotly, differentiating fixed groups by symbol.
+
+    Figure construction (including the WebGL mode for large networks) lives in
+    visualization.visualize_network; this wrapper only handles layout caching
+    and drawing into the Streamlit placeholder.
+    """
     agents = sim_state['agents']
-    network = sim_state['network']
-    time_step = sim_state['time_step']
-    model_type = sim_state['model_type']
 
-    if not network or not agents:
+    if not agents:
         drawing_placeholder.text("Simulation not initialized or no agents.")
         return
 
     # Get positions for nodes (layout algorithm)
     # Use a cached layout if available, otherwise compute
-    if 'layout' not in st.session_state or st.session_state.layout_params_changed:
-        st.session_state.pos = nx.spring_layout(network, seed=42) # Use a seed for consistent layout
+    if st.session_state.pos is None or st.session_state.layout_params_changed:
+        # Cached per graph fingerprint; large graphs get a fast group-clustered layout
+        st.session_state.pos, _ = get_layout_service().layout_for(
+            st.session_state.simulation_instance, background=False)
         st.session_state.layout_params_changed = False # Reset flag
     pos = st.session_state.pos
 
-    # --- Create Plotly Figure ---
-
-    # 1. Edge Trace
-    edge_x = []
-    edge_y = []
-    for edge in network.edges():
-        x0, y0 = pos[edge[0]]
-        x1, y1 = pos[edge[1]]
-        edge_x.extend([x0, x1, None]) # None creates gaps between lines
-        edge_y.extend([y0, y1, None])
-
-    edge_trace = go.Scatter(
-        x=edge_x, y=edge_y,
-        line=dict(width=0.5, color='#888'),
-        hoverinfo='none',
-        mode='lines')
-
-    # 2. Node Trace (Updated for FIXED Symbols)
-    node_x = []
-    node_y = []
-    node_text = []
-    node_colors = []
-    node_symbols = []
-    node_ids = list(network.nodes())
-
-    for node_id in node_ids:
-        x, y = pos[node_id]
-        node_x.append(x)
-        node_y.append(y)
-        agent = agents[node_id]
-        belief_str = f"Belief: {agent.belief_state:.3f}"
-        trust_info = ""
-        # Add trust info for echo chamber model on hover
-        if model_type == 'chamber' and agent.trust_scores:
-            avg_trust = sum(agent.trust_scores.values()) / len(agent.trust_scores) if agent.trust_scores else 0
-            trust_info = f"<br>Avg Trust Given: {avg_trust:.2f}"
-            
-        # Use the FIXED agent.group attribute for symbol
-        group = agent.group
-        symbol = "circle" if group == 'A' else "square"
-        
-        node_text.append(f"Agent ID: {agent.id}<br>Group: {group}<br>{belief_str}{trust_info}")
-        node_colors.append(agent.belief_state) # Use belief for color scale
-        node_symbols.append(symbol)
-
-    node_trace = go.Scatter(
-        x=node_x, y=node_y,
-        mode='markers',
-        hoverinfo='text',
-        marker=dict(
-            showscale=True,
-            # colorscale options: 'Greys', 'YlGnBu', 'Greens', 'YlOrRd', 'Bluered', 'RdBu',
-            # 'Reds', 'Blues', 'Picnic', 'Rainbow', 'Portland', 'Jet', 'Hot', 'Blackbody',
-            # 'Earth', 'Electric', 'Viridis', 'Cividis'
-            colorscale='RdBu', # Correct Plotly name for Red-Blue scale
-            reversescale=False,
-            color=node_colors,
-            size=10,
-            symbol=node_symbols, # Use the list of fixed symbols
-            colorbar=dict(
-                thickness=15,
-                title=dict(text='Belief State', side='right'),
-                xanchor='left'
-            ),
-            line_width=1,
-            line_color='#333'
-            ),
-        text=node_text # Text that appears on hover
-        )
-
-    # 3. Create Figure
-    fig = go.Figure(data=[edge_trace, node_trace],
-                 layout=go.Layout(
-                    title=dict(
-                        text=f'Network State at Time Step: {time_step} ({model_type.capitalize()})',
-                        font=dict(size=16)
-                    ),
-                    showlegend=False,
-                    hovermode='closest',
-                    margin=dict(b=20,l=5,r=5,t=40),
-                    annotations=[ dict(
-                        text="Visualization by Plotly",
-                        showarrow=False,
-                        xref="paper", yref="paper",
-                        x=0.005, y=-0.002 ) ],
-                    xaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
-                    yaxis=dict(showgrid=False, zeroline=False, showticklabels=False))
-                    )
+    fig = build_network_figure(sim_state, pos)
 
     # Display in Streamlit
     drawing_placeholder.plotly_chart(fig, use_container_width=True, key="network_plot")
 
-# --- Metrics Plotting Function (Updated for Styling) ---
-def plot_metrics(metrics_history):
-    """Plots the history of simulation metrics using Plotly with specific styling."""
-    if not metrics_history or len(metrics_history) < 1:
-        return None
-
-    df = pd.DataFrame(metrics_history)
-    df = df.dropna(axis=1, how='all')
-
-    fig = go.Figure()
-
-    # Get default Plotly colors
-    colors = px.colors.qualitative.Plotly
-    color_A = colors[0] # Default blue
-    color_B = colors[1] # Default orange
-
-    # Plot Group A Avg (Thick)
-    if 'group_A_avg' in df.columns:
-        fig.add_trace(go.Scatter(x=df['time_step'], y=df['group_A_avg'], mode='lines+markers', 
-                                 name='Avg Belief (Grp A)', line=dict(color=color_A, width=3)))
-    
-    # Plot Group B Avg (Thick)
-    if 'group_B_avg' in df.columns:
-        fig.add_trace(go.Scatter(x=df['time_step'], y=df['group_B_avg'], mode='lines+markers', 
-                                 name='Avg Belief (Grp B)', line=dict(color=color_B, width=3)))
-    
-    # --- Remove Std Dev Plotting ---
-    # # Plot Group A Std Dev (Thin, matching color)
-    # if 'group_A_std' in df.columns:
-    #     fig.add_trace(go.Scatter(x=df['time_step'], y=df['group_A_std'], mode='lines+markers', 
-    #                              name='Std Dev (Grp A)', yaxis="y2", line=dict(color=color_A, width=1)))
-    # 
-    # # Plot Group B Std Dev (Thin, matching color)
-    # if 'group_B_std' in df.columns:
-    #     fig.add_trace(go.Scatter(x=df['time_step'], y=df['group_B_std'], mode='lines+markers', 
-    #                              name='Std Dev (Grp B)', yaxis="y2", line=dict(color=color_B, width=1)))
-    # --- End Removal ---
-
-    # Update layout (Remove secondary y-axis)
-    fig.update_layout(
-        title="Group Average Belief Over Time",
-        xaxis_title="Time Step",
-        yaxis=dict(
-            title="Average Belief",
-            range=[0, 1]
-        ),
-        # --- Remove yaxis2 ---
-        # yaxis2=dict(
-        #     title="Standard Deviation",
-        #     overlaying="y",
-        #     side="right",
-        # ),
-        # --- End Removal ---
-        hovermode="x unified",
-        legend=dict(yanchor="top", y=0.99, xanchor="left", x=0.01)
-    )
-
-    return fig
-
 # --- Streamlit App Layout ---
 st.set_page_config(layout="wide") # Use wider layout
 st.title("Epistemic Bubbles vs. Echo Chambers ABM")
@@ -193,13 +56,13 @@ if 'simulation_instance' not in st.session_state:
     st.session_state.simulation_instance = None
 if 'running' not in st.session_state:
     st.session_state.running = False
-if 'layout' not in st.session_state:
+if 'pos' not in st.session_state:
     st.session_state.pos = None
 if 'layout_params_changed' not in st.session_state:
     st.session_state.layout_params_changed = True # Initially true to compute layout
 # Add session state for metrics history
 if 'metrics_history' not in st.session_state:
-    st.session_state.metrics_history = []
+    st.session_state.metrics_history = MetricsHistory()
 
 # --- Model Selection ---
 model_type = st.sidebar.radio(
@@ -210,10 +73,18 @@ model_type = st.sidebar.radio(
 )
 
 # --- Core Parameters (Updated Network Params) ---
-num_agents = st.sidebar.slider("Number of Agents", 10, 200, 50, key='num_agents_slider')
+num_agents = st.sidebar.select_slider("Number of Agents", AGENT_COUNT_OPTIONS, 50, key='num_agents_slider')
+engine = st.sidebar.selectbox(
+    "Engine",
+    ('auto', 'object', 'array'),
+    format_func=lambda name: {'auto': 'Automatic (array above 1,000 agents)',
+                              'object': 'Object (agent by agent)',
+                              'array': 'Array (batched, for large networks)'}[name],
+    key='engine_select'
+)
 st.sidebar.markdown("--- Network Connectivity ---")
-connection_probability_intra = st.sidebar.slider("Intra-Group Connection Prob (p_intra)", 0.0, 1.0, 0.3, 0.01, key='p_intra_slider')
-connection_probability_inter = st.sidebar.slider("Inter-Group Connection Prob (p_inter)", 0.0, 1.0, 0.05, 0.01, key='p_inter_slider')
+connection_probability_intra = st.sidebar.slider("Intra-Group Connection Prob (p_intra)", 0.0, 1.0, 0.3, 0.001, format="%.3f", key='p_intra_slider')
+connection_probability_inter = st.sidebar.slider("Inter-Group Connection Prob (p_inter)", 0.0, 1.0, 0.05, 0.001, format="%.3f", key='p_inter_slider')
 
 initial_belief_distribution = st.sidebar.selectbox(
     "Initial Belief Distribution",
@@ -237,6 +108,9 @@ default_outsider_trust = 0.1 # Define defaults here
 trust_threshold = 0.5
 initial_trust_setup = 'belief_based'
 initial_high_trust = 0.9 # Define default value BEFORE the if block
+dynamic_trust = False
+trust_reinforcement = 0.05
+trust_decay = 0.05
 
 if model_type == 'chamber':
     st.sidebar.markdown("--- Echo Chamber Settings ---")
@@ -251,6 +125,14 @@ if model_type == 'chamber':
         help="'belief_based': Trust agents with similar initial beliefs more. 'uniform_high': Initially trust everyone highly.",
         key='initial_trust_select'
     )
+    dynamic_trust = st.sidebar.checkbox(
+        "Dynamic Trust", value=False,
+        help="Confirming messages from trusted agents raise trust; discredited or disconfirming messages lower it.",
+        key='dynamic_trust_checkbox'
+    )
+    if dynamic_trust:
+        trust_reinforcement = st.sidebar.slider("Trust Reinforcement", 0.0, 0.2, 0.05, 0.01, key='trust_reinforcement_slider')
+        trust_decay = st.sidebar.slider("Trust Decay", 0.0, 0.2, 0.05, 0.01, key='trust_decay_slider')
 
 # Store parameters in a dictionary (Updated)
 params = {
@@ -259,13 +141,17 @@ params = {
     'connection_probability_intra': connection_probability_intra,
     'connection_probability_inter': connection_probability_inter,
     'initial_belief_distribution': initial_belief_distribution,
+    'engine': engine,
     'belief_update_step_size': belief_update_step_size,
     'interaction_chance': interaction_chance,
     'step_delay': step_delay,
     'trust_threshold': trust_threshold,
     'default_outsider_trust': default_outsider_trust,
     'initial_high_trust': initial_high_trust,
-    'initial_trust_setup': initial_trust_setup
+    'initial_trust_setup': initial_trust_setup,
+    'dynamic_trust': dynamic_trust,
+    'trust_reinforcement': trust_reinforcement,
+    'trust_decay': trust_decay
 }
 
 # --- Define Control Buttons FIRST ---
@@ -274,28 +160,33 @@ control_cols = st.columns(3)
 
 with control_cols[0]:
     if st.button("Setup / Reset Simulation", key='setup_button'):
-        # Indicate that layout needs recalculation if N or connection prob changes
-        if st.session_state.simulation_instance:
-            old_params = st.session_state.simulation_instance.params
-            # Check against new parameters for layout change
-            if old_params['num_agents'] != num_agents or \
-               old_params.get('connection_probability_intra', -1) != connection_probability_intra or \
-               old_params.get('connection_probability_inter', -1) != connection_probability_inter:
-                st.session_state.layout_params_changed = True
+        size_error = network_size_error(num_agents, connection_probability_intra, connection_probability_inter)
+        if size_error:
+            st.error(size_error)
         else:
-             st.session_state.layout_params_changed = True # First setup
+            # Indicate that layout needs recalculation if N or connection prob changes
+            if st.session_state.simulation_instance:
+                old_params = st.session_state.simulation_instance.params
+                # Check against new parameters for layout change
+                if old_params['num_agents'] != num_agents or \
+                   old_params.get('connection_probability_intra', -1) != connection_probability_intra or \
+                   old_params.get('connection_probability_inter', -1) != connection_probability_inter:
+                    st.session_state.layout_params_changed = True
+            else:
+                 st.session_state.layout_params_changed = True # First setup
+            st.session_state.pos = None # The new network needs its own layout
 
-        st.session_state.simulation_instance = Simulation(copy.deepcopy(params))
-        st.session_state.running = False
-        st.session_state.metrics_history = [] # Reset metrics history
-        st.success("Simulation Initialized/Reset!")
-
-        # Calculate initial metrics (but don't display text here yet)
-        sim_state = st.session_state.simulation_instance.get_simulation_state()
-        current_metrics = st.session_state.simulation_instance.calculate_metrics()
-        current_metrics['time_step'] = sim_state['time_step']
-        st.session_state.metrics_history.append(current_metrics)
-        # Display text will happen in the main loop display section
+            st.session_state.simulation_instance = Simulation(copy.deepcopy(params))
+            st.session_state.running = False
+            st.session_state.metrics_history = MetricsHistory() # Reset metrics history
+            st.success("Simulation Initialized/Reset!")
+
+            # Calculate initial metrics (but don't display text here yet)
+            sim_state = st.session_state.simulation_instance.get_simulation_state()
+            current_metrics = st.session_state.simulation_instance.calculate_metrics()
+            current_metrics['time_step'] = sim_state['time_step']
+            st.session_state.metrics_history.append(current_metrics)
+            # Display text will happen in the main loop display section
 
 with control_cols[1]:
     if st.button("Start / Resume", key='start_button'):
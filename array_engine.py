@@ -0,0 +1,153 @@
+import numpy as np
+from trust import TrustStore
+from models import receive_messages_bubble, receive_messages_chamber, update_trust_batch
+
+_NO_MESSAGES = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64),
+                np.empty(0, dtype=np.float64), np.empty(0, dtype=bool))
+
+def deliver_messages(beliefs, indices, senders, edges, params, receive_messages_func, trust_store=None):
+    """
+    Delivers one step's messages together (a synchronous, Jacobi update).
+
+    Every message carries its sender's belief from before the step and is
+    judged against its recipient's belief from before the step; the accepted
+    ones are then applied at once. Shared by the array engine and the object
+    engine's sync mode, which only differ in how they draw senders and edges.
+
+    Args:
+        beliefs (numpy.ndarray): Belief of every agent; updated in place.
+        indices (numpy.ndarray): CSR neighbor array.
+        senders (numpy.ndarray): Sending agent of every message.
+        edges (numpy.ndarray): CSR position of every message's sender -> recipient edge.
+        params (dict): Simulation parameters.
+        receive_messages_func (callable): Batched handler (models.receive_messages_*).
+        trust_store (trust.TrustStore, optional): Trust for the chamber model.
+
+    Returns:
+        tuple: (last_changes, last_messages): (touched agent ids, their beliefs
+            before the step) and (senders, recipients, contents, accepted mask).
+    """
+    recipients = indices[edges]
+    # Message content is the sender's belief at the start of the step
+    message_contents = beliefs[senders]
+
+    trust_threshold = params.get('trust_threshold', 0.5)
+    sender_trusted = None
+    if trust_store is not None:
+        # Whether the recipient trusts the sender, cached per edge until trust or threshold change
+        sender_trusted = trust_store.acceptance_mask(trust_threshold)[edges]
+
+    # Remember what the touched agents believed before the update
+    touched = np.unique(recipients)
+    last_changes = (touched, beliefs[touched])
+
+    dynamic_trust = trust_store is not None and params.get('dynamic_trust', False)
+    if dynamic_trust:
+        # Confirming messages are judged against the recipients' beliefs before the update
+        confirming = np.abs(message_contents - beliefs[recipients]) < trust_store.similarity_threshold
+
+    accepted = receive_messages_func(
+        beliefs, recipients, message_contents,
+        sender_trusted=sender_trusted,
+        belief_update_step_size=params.get('belief_update_step_size', 0.1),
+        trust_threshold=trust_threshold
+    )
+    if dynamic_trust:
+        update_trust_batch(trust_store, trust_store.reverse_edges[edges], accepted & confirming,
+                           reinforcement=params.get('trust_reinforcement', 0.05),
+                           decay=params.get('trust_decay', 0.05))
+    return last_changes, (senders, recipients, message_contents, accepted)
+
+class ArrayEngine:
+    """
+    Array-backed simulation engine.
+
+    Beliefs, groups and the adjacency (CSR) live in NumPy arrays and a whole
+    simulation step runs as a handful of batched array operations, which makes
+    runs with 100k+ agents practical.
+
+    Unlike the object engine, all messages of a step carry the senders' beliefs
+    from the start of the step and are applied together (see
+    models.update_beliefs_batch), so the result does not depend on agent order.
+    """
+    def __init__(self, beliefs, groups, indptr, indices, params, edge_trust=None, rng=None, trust_store=None):
+        """
+        Args:
+            beliefs (numpy.ndarray): Initial belief of every agent (float).
+            groups (numpy.ndarray): Fixed group code of every agent (see groups.GroupIndex).
+            indptr, indices (numpy.ndarray): Symmetric CSR adjacency.
+            params (dict): Simulation parameters (same keys as Simulation).
+            edge_trust (numpy.ndarray, optional): Trust of row agent i in neighbor indices[k]
+                for every edge position k. Required for the chamber model.
+            rng (numpy.random.Generator, optional): Random generator. Defaults to a fresh one.
+            trust_store (trust.TrustStore, optional): Shared trust for the chamber model;
+                takes precedence over edge_trust and supplies the cached acceptance mask.
+        """
+        self.params = params
+        self.beliefs = np.asarray(beliefs, dtype=np.float64)
+        self.groups = np.asarray(groups, dtype=np.int8)
+        self.indptr = indptr
+        self.indices = indices
+        self.degree = np.diff(indptr)
+        self.rng = rng if rng is not None else np.random.default_rng()
+        # (agent ids, beliefs before the step) of every recipient in the last step
+        self.last_changes = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64))
+        # (senders, recipients, contents, accepted mask) of the messages in the last step
+        self.last_messages = _NO_MESSAGES
+
+        model_type = params['model_type']
+        if model_type == 'bubble':
+            self.receive_messages_func = receive_messages_bubble
+            self.trust_store = None
+            self.edge_trust = None
+        elif model_type == 'chamber':
+            if trust_store is None:
+                if edge_trust is None:
+                    raise ValueError("The chamber model requires edge_trust.")
+                trust_store = TrustStore(self.beliefs, indptr, indices, edge_trust=edge_trust)
+            self.receive_messages_func = receive_messages_chamber
+            self.trust_store = trust_store
+            self.edge_trust = trust_store.edge_trust
+        else:
+            raise ValueError(f"Unknown model type: {model_type}")
+
+    @classmethod
+    def from_arrays(cls, arrays, group_index, params, trust_store=None, rng=None):
+        """
+        Builds an engine over a Simulation's shared AgentArrays.
+
+        The engine steps arrays.beliefs in place, so the Agent views always see
+        current beliefs. For the chamber model it also shares trust_store.
+        """
+        return cls(arrays.beliefs, group_index.codes, arrays.indptr, arrays.indices, params,
+                   rng=rng, trust_store=trust_store)
+
+    def close(self):
+        """Releases engine resources (nothing to release for the serial engine)."""
+
+    def step(self):
+        """
+        Executes one simulation step for all agents at once.
+
+        Returns:
+            int: Number of messages sent during the step.
+        """
+        num_agents = self.beliefs.size
+        if num_agents == 0:
+            self.last_changes = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64))
+            self.last_messages = _NO_MESSAGES
+            return 0
+
+        # One draw per agent for acting and one for neighbor choice, like the object engine
+        act_draws = self.rng.random(num_agents)
+        choice_draws = self.rng.random(num_agents)
+
+        acting = (act_draws < self.params.get('interaction_chance', 0.5)) & (self.degree > 0)
+        senders = np.flatnonzero(acting)
+        edges = self.indptr[senders] + (choice_draws[senders] * self.degree[senders]).astype(np.int64)
+
+        self.last_changes, self.last_messages = deliver_messages(
+            self.beliefs, self.indices, senders, edges, self.params,
+            self.receive_messages_func, self.trust_store
+        )
+        return senders.size
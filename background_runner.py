@@ -0,0 +1,107 @@
+import threading
+import time
+from collections import deque
+
+from metrics import MetricsHistory
+
+class SimulationRunner:
+    """
+    Steps a simulation in a background thread at its own pace.
+
+    After every batch of steps the runner publishes a snapshot (a copy of the
+    beliefs, the time step and the latest metrics) to a ring buffer and
+    appends the sampled metrics to metrics_history. Readers such as the Dash
+    interval callback only look at the latest snapshot, so a slow browser
+    never slows the simulation down, and any number of viewers can watch.
+
+    Hold `lock` while touching the simulation or metrics_history from
+    another thread.
+    """
+    def __init__(self, simulation, metrics_history=None, buffer_size=32):
+        """
+        Args:
+            simulation (Simulation): The simulation to step.
+            metrics_history (metrics.MetricsHistory, optional): History the sampled metrics are appended to.
+            buffer_size (int): Snapshots kept in the ring buffer.
+        """
+        self.simulation = simulation
+        self.metrics_history = metrics_history if metrics_history is not None else MetricsHistory()
+        self.snapshots = deque(maxlen=buffer_size)
+        self.lock = threading.Lock()
+        self.steps_per_batch = 1
+        self.metrics_sample_rate = 1
+        self.step_delay = 0.1
+        self.error = None
+        self._running = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._publish([])
+
+    def configure(self, steps_per_batch=None, metrics_sample_rate=None, step_delay=None):
+        """Changes the pace of a (possibly running) runner."""
+        if steps_per_batch is not None:
+            self.steps_per_batch = max(1, int(steps_per_batch))
+        if metrics_sample_rate is not None:
+            self.metrics_sample_rate = max(1, int(metrics_sample_rate))
+        if step_delay is not None:
+            self.step_delay = max(0.0, float(step_delay))
+
+    @property
+    def running(self):
+        """True while the runner is stepping."""
+        return self._running.is_set()
+
+    def start(self):
+        """Starts (or resumes) stepping."""
+        if self._stopped.is_set():
+            return
+        self._running.set()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name='simulation-runner', daemon=True)
+            self._thread.start()
+
+    def pause(self):
+        """Pauses stepping after the current batch."""
+        self._running.clear()
+
+    def stop(self):
+        """Stops the thread for good (the runner cannot be restarted)."""
+        self._stopped.set()
+        self._running.set() # Wake the loop so it can exit
+
+    def latest(self):
+        """Returns the most recent snapshot dict ('time_step', 'beliefs', 'metrics')."""
+        return self.snapshots[-1]
+
+    def _loop(self):
+        while True:
+            self._running.wait()
+            if self._stopped.is_set():
+                return
+            started = time.perf_counter()
+            try:
+                with self.lock:
+                    new_metrics = self.simulation.advance(self.steps_per_batch,
+                                                          sample_every=self.metrics_sample_rate)
+                    for metrics in new_metrics:
+                        if not self.metrics_history or self.metrics_history[-1]['time_step'] != metrics['time_step']:
+                            self.metrics_history.append(metrics)
+                    self._publish(new_metrics)
+            except Exception as e:
+                print(f"Error during simulation step: {e}")
+                self.error = f"{type(e).__name__}: {e}"
+                self._running.clear()
+                continue
+            # step_delay is the time between batches, including the batch itself
+            remaining = self.step_delay - (time.perf_counter() - started)
+            if remaining > 0:
+                self._stopped.wait(remaining)
+
+    def _publish(self, new_metrics):
+        """Appends a snapshot of the current state to the ring buffer."""
+        metrics = new_metrics[-1] if new_metrics else (self.metrics_history[-1] if self.metrics_history else None)
+        self.snapshots.append({
+            'time_step': self.simulation.time_step,
+            'beliefs': self.simulation.arrays.beliefs.copy(),
+            'metrics': metrics,
+        })
@@ -0,0 +1,238 @@
+"""
+Headless batch runner for parameter sweeps.
+
+Runs every configuration of a sweep spec for a fixed number of steps across
+a process pool and streams each run's calculate_metrics series to a CSV file.
+
+Usage:
+    python batch_runner.py sweep.json --output results --workers 8
+
+Sweep spec (JSON):
+    {
+        "steps": 500,
+        "tol": 1e-4,
+        "window": 50,
+        "record_every": 10,
+        "log_events": false,
+        "base": {"num_agents": 200, "engine": "array"},
+        "grid": {
+            "model_type": ["bubble", "chamber"],
+            "connection_probability_intra": [0.1, 0.3],
+            "connection_probability_inter": [0.01, 0.05],
+            "trust_threshold": [0.3, 0.5, 0.7],
+            "belief_update_step_size": [0.05]
+        },
+        "runs": [{"model_type": "chamber", "initial_trust_setup": "uniform_high"}],
+        "seeds": [0, 1, 2]
+    }
+
+Every combination in "grid" and every entry in "runs" is merged over the
+defaults and "base", then repeated once per seed. With "tol" set, a run
+stops early once its group metrics settle (see Simulation.run). Output layout:
+    <output>/manifest.jsonl     one line per finished run (params, status, timing);
+                                rewritten by every sweep, like the run_<index> files
+    <output>/runs/<run_id>.csv  time_step plus every metric, one row per step
+    <output>/runs/<run_id>_beliefs.npy  with "record_every" set: every agent's belief
+                                every k steps, time steps in <run_id>_beliefs_steps.npy
+                                (see recorder.load_trajectory)
+    <output>/runs/<run_id>_events.npy  with "log_events" set: every message sent
+                                (see events.load_events)
+"""
+import argparse
+import copy
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from simulation import Simulation
+from recorder import TrajectoryRecorder
+from events import InteractionLog
+
+METRIC_FIELDS = [
+    'time_step', 'avg_belief', 'std_dev_belief',
+    'group_A_count', 'group_A_avg', 'group_A_std',
+    'group_B_count', 'group_B_avg', 'group_B_std',
+]
+
+def get_default_params():
+    """Default simulation parameters, matching the interactive apps."""
+    return {
+        'model_type': 'bubble',
+        'num_agents': 50,
+        'connection_probability_intra': 0.3,
+        'connection_probability_inter': 0.05,
+        'initial_belief_distribution': 'bimodal',
+        'belief_update_step_size': 0.05,
+        'interaction_chance': 0.5,
+        'trust_threshold': 0.5,
+        'default_outsider_trust': 0.1,
+        'initial_high_trust': 0.9,
+        'initial_trust_setup': 'belief_based',
+        'dynamic_trust': False,
+        'trust_reinforcement': 0.05,
+        'trust_decay': 0.05
+    }
+
+def expand_sweep(spec):
+    """
+    Expands a sweep spec into a list of run configurations.
+
+    Args:
+        spec (dict): Sweep spec with optional 'base', 'grid', 'runs' and 'seeds' keys.
+
+    Returns:
+        list: One params dict per run (including a 'seed' key).
+    """
+    base = get_default_params()
+    base.update(spec.get('base', {}))
+
+    variants = []
+    grid = spec.get('grid', {})
+    if grid:
+        keys = list(grid.keys())
+        for values in itertools.product(*(grid[key] for key in keys)):
+            variants.append(dict(zip(keys, values)))
+    variants.extend(spec.get('runs', []))
+    if not variants:
+        variants.append({})
+
+    configs = []
+    for variant in variants:
+        for seed in spec.get('seeds', [None]):
+            params = copy.deepcopy(base)
+            params.update(variant)
+            params['seed'] = seed
+            configs.append(params)
+    return configs
+
+def run_one(run_id, params, steps, output_dir, tol=None, window=50, record_every=None, log_events=False):
+    """
+    Runs one configuration and streams its metrics to <output_dir>/runs/<run_id>.csv.
+
+    With tol set, the run stops as soon as it converges (see Simulation.run).
+    With record_every set, every agent's belief is recorded every record_every
+    steps to <output_dir>/runs/<run_id>_beliefs.npy. With log_events set, every
+    message is logged to <output_dir>/runs/<run_id>_events.npy.
+
+    Executed inside a worker process.
+
+    Returns:
+        dict: Manifest entry describing the run.
+    """
+    started = time.perf_counter()
+    csv_path = os.path.join(output_dir, 'runs', f'{run_id}.csv')
+    trajectory_path = os.path.join(output_dir, 'runs', f'{run_id}_beliefs.npy') if record_every else None
+    events_path = os.path.join(output_dir, 'runs', f'{run_id}_events.npy') if log_events else None
+    simulation = None
+    recorder = None
+    event_log = None
+    try:
+        simulation = Simulation(copy.deepcopy(params))
+        if record_every:
+            recorder = TrajectoryRecorder(trajectory_path, every=record_every).attach(simulation)
+        if log_events:
+            event_log = InteractionLog(events_path).attach(simulation)
+        with open(csv_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=METRIC_FIELDS, extrasaction='ignore')
+            writer.writeheader()
+            metrics = simulation.calculate_metrics()
+            metrics['time_step'] = simulation.time_step
+            writer.writerow(metrics)
+            result = simulation.run(steps, tol=tol, window=window, callback=writer.writerow)
+        status, error = 'ok', None
+    except Exception as e:
+        result = {}
+        status, error = 'error', f"{type(e).__name__}: {e}"
+    finally:
+        if recorder is not None:
+            recorder.close()
+        if event_log is not None:
+            event_log.close()
+        if simulation is not None:
+            simulation.close() # Stops parallel engine workers and frees their shared memory
+
+    return {
+        'run_id': run_id,
+        'params': params,
+        'steps': steps,
+        'steps_run': result.get('steps_run'),
+        'converged': result.get('converged'),
+        'convergence_step': result.get('convergence_step'),
+        'status': status,
+        'error': error,
+        'seconds': round(time.perf_counter() - started, 3),
+        'metrics_file': os.path.relpath(csv_path, output_dir),
+        'trajectory_file': os.path.relpath(trajectory_path, output_dir) if trajectory_path else None,
+        'events_file': os.path.relpath(events_path, output_dir) if events_path else None,
+    }
+
+def run_sweep(spec, output_dir, steps=None, workers=None, tol=None, window=None, record_every=None,
+              log_events=None):
+    """
+    Runs every configuration of a sweep across a process pool.
+
+    Args:
+        spec (dict): Sweep spec (see module docstring).
+        output_dir (str): Directory for the manifest and per-run CSV files.
+        steps (int, optional): Steps per run; overrides spec['steps'].
+        workers (int, optional): Worker processes; defaults to the CPU count.
+        tol (float, optional): Convergence tolerance for early stopping; overrides spec['tol'].
+        window (int, optional): Convergence window in steps; overrides spec['window'].
+        record_every (int, optional): Record belief trajectories every k steps; overrides spec['record_every'].
+        log_events (bool, optional): Log every message; overrides spec['log_events'].
+
+    Returns:
+        list: Manifest entries of all runs, in completion order.
+    """
+    steps = steps if steps is not None else spec.get('steps', 100)
+    tol = tol if tol is not None else spec.get('tol')
+    window = window if window is not None else spec.get('window', 50)
+    record_every = record_every if record_every is not None else spec.get('record_every')
+    log_events = log_events if log_events is not None else spec.get('log_events', False)
+    configs = expand_sweep(spec)
+    os.makedirs(os.path.join(output_dir, 'runs'), exist_ok=True)
+
+    results = []
+    with open(os.path.join(output_dir, 'manifest.jsonl'), 'w') as manifest, \
+            ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(run_one, f'run_{index:05d}', params, steps, output_dir, tol, window,
+                            record_every, log_events)
+            for index, params in enumerate(configs)
+        ]
+        for future in as_completed(futures):
+            entry = future.result()
+            manifest.write(json.dumps(entry) + '\n')
+            manifest.flush()
+            results.append(entry)
+            print(f"[{len(results)}/{len(configs)}] {entry['run_id']}: {entry['status']} "
+                  f"({entry['seconds']}s)", file=sys.stderr)
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run Simulation parameter sweeps without a UI.")
+    parser.add_argument('spec', help="Path to the sweep spec JSON file.")
+    parser.add_argument('--output', '-o', default='sweep_results', help="Output directory.")
+    parser.add_argument('--steps', type=int, default=None, help="Steps per run (overrides the spec).")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count).")
+    parser.add_argument('--tol', type=float, default=None, help="Stop runs early once metrics settle within this tolerance.")
+    parser.add_argument('--window', type=int, default=None, help="Steps the metrics must stay within --tol (default 50).")
+    parser.add_argument('--record-every', type=int, default=None, help="Record every agent's belief every N steps.")
+    parser.add_argument('--log-events', action='store_true', default=None, help="Log every message sent.")
+    args = parser.parse_args(argv)
+
+    with open(args.spec) as f:
+        spec = json.load(f)
+    results = run_sweep(spec, args.output, steps=args.steps, workers=args.workers,
+                        tol=args.tol, window=args.window, record_every=args.record_every,
+                        log_events=args.log_events)
+    failed = sum(1 for entry in results if entry['status'] != 'ok')
+    print(f"Finished {len(results)} runs ({failed} failed). Results in {args.output}", file=sys.stderr)
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
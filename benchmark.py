@@ -0,0 +1,270 @@
+"""
+Benchmarks the simulation stages across a ladder of network sizes.
+
+For every model, engine and size it times network creation, trust
+initialization, full setup, one simulation step, calculate_metrics and
+visualize_network, and measures each stage's peak traced memory. Results are
+written as JSON; with --baseline, stages that got slower (or hungrier) than a
+stored result by more than --tolerance are reported and the exit code is 1.
+
+Usage:
+    python benchmark.py --output bench.json
+    python benchmark.py --sizes 100 1000 10000 --baseline bench.json --tolerance 0.25
+
+Connection probabilities are scaled with size so every agent keeps about
+--intra-degree neighbors in its own group and --inter-degree in the other
+(fixed probabilities would make 100k-agent networks dense). Pass --p-intra /
+--p-inter to fix them instead.
+"""
+import argparse
+import gc
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from simulation import Simulation
+from network_utils import sample_group_aware_edges, edges_to_csr
+from trust import TrustStore
+from layout_service import group_clustered_layout
+from visualization import visualize_network
+
+DEFAULT_SIZES = [100, 1000, 10000, 100000]
+DEFAULT_MODELS = ['bubble', 'chamber']
+STAGES = ['network', 'trust', 'setup', 'step', 'metrics', 'visualize']
+
+# Stage times below this (seconds) are too noisy to flag as regressions
+NOISE_FLOOR_SECONDS = 0.002
+
+def benchmark_params(model_type, num_agents, engine, intra_degree=20.0, inter_degree=2.0,
+                     p_intra=None, p_inter=None, seed=0):
+    """Simulation params for one benchmark case."""
+    group_size = max(1, num_agents // 2)
+    return {
+        'model_type': model_type,
+        'num_agents': num_agents,
+        'connection_probability_intra': p_intra if p_intra is not None else min(1.0, intra_degree / group_size),
+        'connection_probability_inter': p_inter if p_inter is not None else min(1.0, inter_degree / group_size),
+        'initial_belief_distribution': 'bimodal',
+        'belief_update_step_size': 0.05,
+        'interaction_chance': 0.5,
+        'trust_threshold': 0.5,
+        'default_outsider_trust': 0.1,
+        'initial_high_trust': 0.9,
+        'initial_trust_setup': 'belief_based',
+        'engine': engine,
+        'seed': seed,
+    }
+
+def measure(fn, repeat=1):
+    """
+    Times fn and measures its peak traced memory.
+
+    fn runs once under tracemalloc for the memory peak, then `repeat` more
+    times untraced (tracing slows allocation-heavy code) for the timing.
+
+    Returns:
+        dict: 'seconds' (median of the untraced runs), 'min_seconds' and 'peak_bytes'.
+    """
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    times = []
+    for _ in range(max(1, repeat)):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return {'seconds': statistics.median(times), 'min_seconds': min(times), 'peak_bytes': int(peak)}
+
+def run_case(params, steps=10, repeat=3, max_render_agents=20000):
+    """
+    Benchmarks every stage for one params dict.
+
+    Returns:
+        dict: Stage name -> measure() result (None for stages that do not apply).
+    """
+    num_agents = params['num_agents']
+    results = dict.fromkeys(STAGES)
+    simulation = Simulation(dict(params))
+    codes = simulation.group_index.codes
+
+    def create_network():
+        u, v = sample_group_aware_edges(codes, params['connection_probability_intra'],
+                                        params['connection_probability_inter'],
+                                        rng=np.random.default_rng(params['seed']))
+        edges_to_csr(num_agents, u, v)
+    results['network'] = measure(create_network, repeat)
+
+    if params['model_type'] == 'chamber':
+        results['trust'] = measure(lambda: TrustStore(
+            simulation.arrays.beliefs, simulation.indptr, simulation.indices,
+            setup_type=params['initial_trust_setup'], high_trust=params['initial_high_trust'],
+            outsider_trust=params['default_outsider_trust'], similarity_threshold=0.3
+        ), repeat)
+
+    results['setup'] = measure(lambda: Simulation(dict(params)), repeat)
+    # Per-step cost, averaged over `steps` steps per timed run
+    step_result = measure(lambda: [simulation.simulation_step() for _ in range(steps)], repeat)
+    results['step'] = {key: value / steps if key != 'peak_bytes' else value
+                       for key, value in step_result.items()}
+    results['metrics'] = measure(simulation.calculate_metrics, max(repeat, 10))
+
+    if num_agents <= max_render_agents:
+        positions = group_clustered_layout(codes)
+        state = simulation.get_simulation_state()
+        results['visualize'] = measure(lambda: visualize_network(state, positions), repeat)
+
+    results['edges'] = int(simulation.indices.size // 2)
+    simulation.close()
+    return results
+
+def run_benchmarks(sizes=DEFAULT_SIZES, models=DEFAULT_MODELS, engines=('array',), steps=10, repeat=3,
+                   max_object_agents=10000, max_render_agents=20000, **param_options):
+    """
+    Runs the full ladder.
+
+    Args:
+        sizes (list): Agent counts.
+        models (list): Model types.
+        engines (list): Stepping engines ('array', 'object', 'parallel').
+        steps (int): Steps per timed step run.
+        repeat (int): Timed runs per stage.
+        max_object_agents (int): Largest size run with the (slow) object engine.
+        max_render_agents (int): Largest size for the visualize stage.
+        **param_options: intra_degree, inter_degree, p_intra, p_inter, seed (see benchmark_params).
+
+    Returns:
+        dict: 'environment' and 'results' (one entry per case).
+    """
+    results = []
+    for engine in engines:
+        for model_type in models:
+            for num_agents in sizes:
+                if engine == 'object' and num_agents > max_object_agents:
+                    continue
+                params = benchmark_params(model_type, num_agents, engine, **param_options)
+                started = time.perf_counter()
+                stages = run_case(params, steps=steps, repeat=repeat, max_render_agents=max_render_agents)
+                edges = stages.pop('edges')
+                results.append({
+                    'model_type': model_type,
+                    'engine': engine,
+                    'num_agents': num_agents,
+                    'edges': edges,
+                    'p_intra': params['connection_probability_intra'],
+                    'p_inter': params['connection_probability_inter'],
+                    'stages': stages,
+                })
+                print(f"{model_type:8s} {engine:8s} N={num_agents:<7d} edges={edges:<9d} "
+                      f"({time.perf_counter() - started:.1f}s)", file=sys.stderr)
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+
+def _case_key(entry):
+    return (entry['model_type'], entry['engine'], entry['num_agents'])
+
+def compare_to_baseline(report, baseline, tolerance=0.25):
+    """
+    Finds stages that regressed against a baseline report.
+
+    A stage regresses when its time exceeds the baseline's by more than
+    tolerance (relative) and NOISE_FLOOR_SECONDS, or its peak memory exceeds
+    the baseline's by more than tolerance.
+
+    Returns:
+        list: One dict per regression ('case', 'stage', 'metric', 'baseline', 'current', 'ratio').
+    """
+    baseline_cases = {_case_key(entry): entry for entry in baseline.get('results', [])}
+    regressions = []
+    for entry in report['results']:
+        old_entry = baseline_cases.get(_case_key(entry))
+        if old_entry is None:
+            continue
+        for stage, current in entry['stages'].items():
+            old = old_entry['stages'].get(stage)
+            if current is None or old is None:
+                continue
+            checks = [('seconds', current['seconds'], old['seconds'], NOISE_FLOOR_SECONDS),
+                      ('peak_bytes', current['peak_bytes'], old['peak_bytes'], 0)]
+            for metric, now, before, floor in checks:
+                if before > 0 and now > before * (1 + tolerance) and now - before > floor:
+                    regressions.append({
+                        'case': '/'.join(str(part) for part in _case_key(entry)),
+                        'stage': stage,
+                        'metric': metric,
+                        'baseline': before,
+                        'current': now,
+                        'ratio': round(now / before, 2),
+                    })
+    return regressions
+
+def format_report(report):
+    """Formats a report as a fixed-width table (milliseconds and MB)."""
+    header = f"{'model':8s} {'engine':8s} {'agents':>7s} " + ' '.join(f"{stage:>16s}" for stage in STAGES)
+    lines = [header, ' ' * 26 + ' '.join(f"{'ms / MB':>16s}" for _ in STAGES)]
+    for entry in report['results']:
+        cells = []
+        for stage in STAGES:
+            result = entry['stages'].get(stage)
+            cells.append(f"{'-':>16s}" if result is None else
+                         f"{result['seconds'] * 1000:>9.2f} / {result['peak_bytes'] / 2**20:<5.1f}")
+        lines.append(f"{entry['model_type']:8s} {entry['engine']:8s} {entry['num_agents']:>7d} " + ' '.join(cells))
+    return '\n'.join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark simulation stages across network sizes.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="Agent counts.")
+    parser.add_argument('--models', nargs='+', default=DEFAULT_MODELS, choices=DEFAULT_MODELS)
+    parser.add_argument('--engines', nargs='+', default=['array'], choices=['array', 'object', 'parallel'])
+    parser.add_argument('--steps', type=int, default=10, help="Steps per timed step run.")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per stage.")
+    parser.add_argument('--intra-degree', type=float, default=20.0, help="Expected same-group neighbors per agent.")
+    parser.add_argument('--inter-degree', type=float, default=2.0, help="Expected other-group neighbors per agent.")
+    parser.add_argument('--p-intra', type=float, default=None, help="Fixed intra-group probability (overrides --intra-degree).")
+    parser.add_argument('--p-inter', type=float, default=None, help="Fixed inter-group probability (overrides --inter-degree).")
+    parser.add_argument('--max-object-agents', type=int, default=10000, help="Largest size for the object engine.")
+    parser.add_argument('--max-render-agents', type=int, default=20000, help="Largest size for visualize_network.")
+    parser.add_argument('--output', '-o', default=None, help="Write the JSON report here.")
+    parser.add_argument('--baseline', default=None, help="JSON report to compare against.")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed relative slowdown before flagging.")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(
+        sizes=args.sizes, models=args.models, engines=args.engines, steps=args.steps, repeat=args.repeat,
+        max_object_agents=args.max_object_agents, max_render_agents=args.max_render_agents,
+        intra_degree=args.intra_degree, inter_degree=args.inter_degree,
+        p_intra=args.p_intra, p_inter=args.p_inter
+    )
+    print(format_report(report))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(report, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression['case']} {regression['stage']} {regression['metric']}: "
+                  f"{regression['baseline']:.6g} -> {regression['current']:.6g} (x{regression['ratio']})")
+        if regressions:
+            return 1
+        print(f"No regressions against {args.baseline}.")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,37 +1,48 @@
 import dash
-from dash import dcc, html, Input, Output, State, callback_context
+from dash import dcc, html, Input, Output, State, Patch, callback_context
 import dash_bootstrap_components as dbc
 import plotly.graph_objects as go
-import networkx as nx
 import copy
 import time
+from urllib.parse import parse_qs
 
 from simulation import Simulation
-from visualization import visualize_network, plot_metrics
+from network_utils import AGENT_COUNT_OPTIONS, network_size_error
+from visualization import visualize_network, network_figure_update, plot_metrics
+from layout_service import LayoutService
+from session_manager import SimulationRegistry
+from background_runner import SimulationRunner
+from batch_runner import get_default_params as get_default_simulation_params
 
-# --- Global variable for simulation state (Simplification for demo) ---
-# WARNING: Not suitable for multi-user production environments!
-simulation_instance = None
-metrics_history = []
-network_pos = None
+# --- Per-session simulation state ---
+# Each browser tab gets its own session id (see serve_layout); its simulation,
+# metrics history and layout live in the registry, not in module globals.
+# Set ECHO_CHAMBER_SESSION_DB to share sessions across gunicorn workers.
+registry = SimulationRegistry.from_env()
+# With in-process sessions each simulation steps in its own background thread
+# and the interval callback only draws its latest snapshot. A shared backend
+# cannot hold threads, so there the interval callback steps the simulation.
+use_background_runners = registry.backend is None
+layout_service = LayoutService()
 
 # --- Helper Functions ---
 def get_default_params():
-    # Consolidate default parameters
-    return {
-        'model_type': 'bubble',
-        'num_agents': 50,
-        'connection_probability_intra': 0.3,
-        'connection_probability_inter': 0.05,
-        'initial_belief_distribution': 'bimodal',
-        'belief_update_step_size': 0.05,
-        'interaction_chance': 0.5,
+    # Simulation defaults shared with the batch runner, plus the app's display settings
+    params = get_default_simulation_params()
+    params.update({
         'step_delay': 0.1,
-        'trust_threshold': 0.5,
-        'default_outsider_trust': 0.1,
-        'initial_high_trust': 0.9,
-        'initial_trust_setup': 'belief_based'
-    }
+        'steps_per_frame': 1,
+        'metrics_sample_rate': 1,
+        'edge_mode': 'all',
+        'engine': 'auto',
+    })
+    return params
+
+def configure_runner(runner, params):
+    # Apply the live speed settings to a background runner
+    runner.configure(steps_per_batch=params.get('steps_per_frame', 1),
+                     metrics_sample_rate=params.get('metrics_sample_rate', 1),
+                     step_delay=params.get('step_delay', 0.1))
 
 def format_metrics_text(metrics):
     if not metrics:
@@ -53,7 +64,7 @@ app.title = "Echo Chamber ABM "
 server = app.server # Expose server for deployment
 
 # --- App Layout ---
-app.layout = dbc.Container([
+main_layout = dbc.Container([
     dbc.Row(dbc.Col(html.H1("Epistemic Bubbles vs. Echo Chambers Model"), width=12)),
     dbc.Row(dbc.Col(html.P("An agent-based model exploring C. Thi Nguyen's distinction."), width=12)),
     
@@ -72,13 +83,31 @@ app.layout = dbc.Container([
             ),
             html.Hr(),
             dbc.Label("Number of Agents:", html_for="num-agents-slider"),
-            dcc.Slider(id="num-agents-slider", min=10, max=200, step=10, value=50, marks={i: str(i) for i in range(10, 201, 30)}),
+            dcc.Slider(id="num-agents-slider", min=0, max=len(AGENT_COUNT_OPTIONS) - 1, step=1,
+                       value=AGENT_COUNT_OPTIONS.index(50),
+                       marks={i: f'{n:,}' for i, n in enumerate(AGENT_COUNT_OPTIONS) if n in (10, 100, 1000, 10000, 100000)}),
+            html.Small(id="num-agents-display"),
             html.Br(),
             dbc.Label("Intra-Group Connection Prob (p_intra):", html_for="p-intra-slider"),
-            dcc.Slider(id="p-intra-slider", min=0, max=1, step=0.01, value=0.3, marks={i/10: f'{i/10:.1f}' for i in range(0, 11, 2)}),
+            dcc.Slider(id="p-intra-slider", min=0, max=1, step=0.001, value=0.3, marks={i/10: f'{i/10:.1f}' for i in range(0, 11, 2)},
+                       tooltip={'placement': 'bottom'}),
             html.Br(),
             dbc.Label("Inter-Group Connection Prob (p_inter):", html_for="p-inter-slider"),
-            dcc.Slider(id="p-inter-slider", min=0, max=1, step=0.01, value=0.05, marks={i/10: f'{i/10:.1f}' for i in range(0, 11, 2)}),
+            dcc.Slider(id="p-inter-slider", min=0, max=1, step=0.001, value=0.05, marks={i/10: f'{i/10:.1f}' for i in range(0, 11, 2)},
+                       tooltip={'placement': 'bottom'}),
+            html.Small("Large networks need small probabilities (e.g. 0.001 for 100,000 agents)."),
+            html.Br(),
+            dbc.Label("Engine:"),
+            dcc.Dropdown(
+                id='engine-select',
+                options=[
+                    {'label': 'Automatic (array engine above 1,000 agents)', 'value': 'auto'},
+                    {'label': 'Object (agent by agent)', 'value': 'object'},
+                    {'label': 'Array (batched, for large networks)', 'value': 'array'},
+                ],
+                value='auto',
+                clearable=False
+            ),
             html.Hr(),
             dbc.Label("Initial Belief Distribution:"),
             dcc.Dropdown(
@@ -99,6 +128,26 @@ app.layout = dbc.Container([
             html.Hr(),
             dbc.Label("Step Delay (seconds):", html_for="step-delay-slider"),
             dcc.Slider(id="step-delay-slider", min=0, max=2, step=0.05, value=0.1, marks={i/2: f'{i/2:.1f}' for i in range(0, 5)}),
+            html.Br(),
+            dbc.Label("Steps per Frame (fast-forward):", html_for="steps-per-frame-slider"),
+            dcc.Slider(id="steps-per-frame-slider", min=1, max=500, step=1, value=1, marks={i: str(i) for i in [1, 100, 200, 300, 400, 500]}),
+            html.Br(),
+            dbc.Label("Record Metrics Every N Steps:", html_for="metrics-sample-slider"),
+            dcc.Slider(id="metrics-sample-slider", min=1, max=100, step=1, value=1, marks={i: str(i) for i in [1, 25, 50, 75, 100]}),
+            html.Br(),
+            dbc.Label("Edge Display:"),
+            dcc.Dropdown(
+                id='edge-mode-select',
+                options=[
+                    {'label': 'All Edges', 'value': 'all'},
+                    {'label': 'Inter-Group Edges Only', 'value': 'inter'},
+                    {'label': 'Intra-Group Edges Only', 'value': 'intra'},
+                    {'label': 'Sampled Edges (10%)', 'value': 'sample'},
+                    {'label': 'Hide Edges', 'value': 'none'},
+                ],
+                value='all',
+                clearable=False
+            ),
             html.Hr(),
             # --- Echo Chamber Specific (Hidden/Shown by Callback) ---
             html.Div([
@@ -122,6 +171,12 @@ app.layout = dbc.Container([
                      value='belief_based',
                      clearable=False
                  ),
+                 html.Br(),
+                 dbc.Switch(id='dynamic-trust-switch', label="Dynamic Trust", value=False),
+                 dbc.Label("Trust Reinforcement (confirming messages):", html_for="trust-reinforcement-slider"),
+                 dcc.Slider(id="trust-reinforcement-slider", min=0, max=0.2, step=0.01, value=0.05, marks={i/20: f'{i/20:.2f}' for i in range(0, 5)}),
+                 dbc.Label("Trust Decay (discredited or disconfirming messages):", html_for="trust-decay-slider"),
+                 dcc.Slider(id="trust-decay-slider", min=0, max=0.2, step=0.01, value=0.05, marks={i/20: f'{i/20:.2f}' for i in range(0, 5)}),
             ], id="echo-chamber-params", style={'display': 'none'}), # Hidden by default
 
         ], width=4),
@@ -144,23 +199,59 @@ app.layout = dbc.Container([
                 dbc.Col([
                     html.H4("Simulation Metrics"),
                     html.Pre(id='metrics-display', children="Setup simulation to view metrics."),
-                    dcc.Graph(id='metrics-plot', figure=go.Figure()) # Placeholder figure
+                    dcc.Graph(id='metrics-plot', figure=go.Figure()), # Placeholder figure
+                    html.Small(id='watch-link', className="text-muted")
                 ], width=5),
             ]),
         ], width=8),
     ]),
     
     # --- Hidden Components ---
-    # Interval timer for simulation steps
+    # Page URL (a ?watch=<session id> query joins another session's run)
+    dcc.Location(id='url'),
+    # Interval timer for redrawing (and, without a background runner, stepping)
     dcc.Interval(id='simulation-interval', interval=1000, n_intervals=0, disabled=True),
     # Store for run state (running or paused)
     dcc.Store(id='run-state-store', data={'running': False}),
     # Store for current parameters (to avoid passing all individually)
     dcc.Store(id='params-store', data=get_default_params()),
+    # Store for the simulation whose full network figure the browser already has
+    dcc.Store(id='network-figure-store', data={'simulation_id': None, 'edge_mode': None, 'layout_version': None}),
 ], fluid=True)
 
+def serve_layout():
+    """Builds the page on every load, giving each tab its own session id."""
+    return html.Div([
+        dcc.Store(id='session-id-store', data=SimulationRegistry.new_session_id()),
+        dcc.Store(id='watch-id-store', data=None), # Session drawn read-only (?watch=<session id>)
+        main_layout,
+    ])
+
+app.layout = serve_layout
+
 # --- Callbacks ---
 
+# Callback to join another session's run from a ?watch=<session id> link
+@app.callback(
+    Output('watch-id-store', 'data'),
+    Output('simulation-interval', 'disabled', allow_duplicate=True),
+    Output('watch-link', 'children'),
+    Input('url', 'href'),
+    Input('url', 'search'),
+    State('session-id-store', 'data'),
+    prevent_initial_call='initial_duplicate'
+)
+def join_watched_session(href, search, session_id):
+    watched_id = parse_qs((search or '').lstrip('?')).get('watch', [None])[0]
+    disabled = dash.no_update
+    if watched_id and watched_id != session_id:
+        disabled = False # Start redrawing the watched run right away
+    else:
+        watched_id = None
+    # The controls keep acting on this tab's own session; only drawing follows watched_id
+    base_url = (href or '').split('?')[0]
+    return watched_id, disabled, f"Watch this run from another browser: {base_url}?watch={session_id}"
+
 # Callback to show/hide Echo Chamber parameters
 @app.callback(
     Output('echo-chamber-params', 'style'),
@@ -173,6 +264,13 @@ def toggle_echo_chamber_params(model_type):
         return {'display': 'none'}
 
 # Callback to store parameters when they change
+@app.callback(
+    Output('num-agents-display', 'children'),
+    Input('num-agents-slider', 'value')
+)
+def show_num_agents(index):
+    return f"{AGENT_COUNT_OPTIONS[index]:,} agents"
+
 @app.callback(
     Output('params-store', 'data'),
     # --- Inputs for ALL parameters ---
@@ -184,27 +282,43 @@ def toggle_echo_chamber_params(model_type):
     Input('belief-step-slider', 'value'),
     Input('interaction-chance-slider', 'value'),
     Input('step-delay-slider', 'value'),
+    Input('steps-per-frame-slider', 'value'),
+    Input('metrics-sample-slider', 'value'),
+    Input('edge-mode-select', 'value'),
+    Input('engine-select', 'value'),
     Input('trust-thresh-slider', 'value'),
     Input('default-trust-slider', 'value'),
     Input('high-trust-slider', 'value'),
-    Input('initial-trust-select', 'value')
+    Input('initial-trust-select', 'value'),
+    Input('dynamic-trust-switch', 'value'),
+    Input('trust-reinforcement-slider', 'value'),
+    Input('trust-decay-slider', 'value')
 )
 def update_params_store(model_type, num_agents, p_intra, p_inter, 
-                        initial_belief, step_size, interaction_chance, delay, 
-                        trust_thresh, default_trust, high_trust, trust_setup):
+                        initial_belief, step_size, interaction_chance, delay,
+                        steps_per_frame, metrics_sample_rate, edge_mode, engine,
+                        trust_thresh, default_trust, high_trust, trust_setup,
+                        dynamic_trust, trust_reinforcement, trust_decay):
     return {
         'model_type': model_type,
-        'num_agents': num_agents,
+        'num_agents': AGENT_COUNT_OPTIONS[num_agents], # The slider selects an index
         'connection_probability_intra': p_intra,
         'connection_probability_inter': p_inter,
         'initial_belief_distribution': initial_belief,
         'belief_update_step_size': step_size,
         'interaction_chance': interaction_chance,
         'step_delay': delay,
+        'steps_per_frame': steps_per_frame,
+        'metrics_sample_rate': metrics_sample_rate,
+        'edge_mode': edge_mode,
+        'engine': engine,
         'trust_threshold': trust_thresh,
         'default_outsider_trust': default_trust,
         'initial_high_trust': high_trust,
-        'initial_trust_setup': trust_setup
+        'initial_trust_setup': trust_setup,
+        'dynamic_trust': bool(dynamic_trust),
+        'trust_reinforcement': trust_reinforcement,
+        'trust_decay': trust_decay
     }
 
 # Callback to handle Setup, Start, Pause buttons
@@ -212,83 +326,125 @@ def update_params_store(model_type, num_agents, p_intra, p_inter,
     Output('run-state-store', 'data'),
     Output('simulation-interval', 'disabled'),
     Output('simulation-interval', 'interval'), # Allow changing speed
+    Output('watch-id-store', 'data', allow_duplicate=True),
     # Need Outputs for initial display on Setup (handled by interval callback)
     Input('setup-button', 'n_clicks'),
     Input('start-button', 'n_clicks'),
     Input('pause-button', 'n_clicks'),
     State('params-store', 'data'),
     State('run-state-store', 'data'),
+    State('session-id-store', 'data'),
     prevent_initial_call=True
 )
-def handle_controls(setup_clicks, start_clicks, pause_clicks, params, run_state):
-    global simulation_instance, metrics_history, network_pos
-    
+def handle_controls(setup_clicks, start_clicks, pause_clicks, params, run_state, session_id):
     triggered_id = callback_context.triggered_id
     running = run_state['running']
     disabled = True
     interval = max(10, int(params.get('step_delay', 0.1) * 1000)) # Interval in ms
+    watched_id = dash.no_update
+    session = registry.get(session_id, create=True)
+
+    size_error = network_size_error(params['num_agents'], params['connection_probability_intra'],
+                                    params['connection_probability_inter'])
+    if triggered_id == 'setup-button' and size_error:
+        session.reset(None)
+        session.error = size_error
+        print(session.error)
+        registry.save(session_id, session, overwrite=True)
+        running = False
 
-    if triggered_id == 'setup-button':
+    elif triggered_id == 'setup-button':
         print("Setup button clicked")
-        simulation_instance = Simulation(copy.deepcopy(params))
-        metrics_history = []
-        network_pos = None # Reset position
+        session.reset(Simulation(copy.deepcopy(params)))
         running = False
         disabled = True
+        watched_id = None # Show this tab's own run from now on
+        # Cached or placeholder positions right away; spring layout finishes in the background
+        session.network_pos, session.network_pos_final = layout_service.layout_for(session.simulation)
+        session.layout_version += 1
         # Add initial metric point
-        sim_state = simulation_instance.get_simulation_state()
-        if sim_state['network']:
-             network_pos = nx.spring_layout(sim_state['network'], seed=42)
-        initial_metrics = simulation_instance.calculate_metrics()
+        initial_metrics = session.simulation.calculate_metrics()
         initial_metrics['time_step'] = 0
-        metrics_history.append(initial_metrics)
-        print("Simulation Setup Complete")
+        session.metrics_history.append(initial_metrics)
+        if use_background_runners:
+            session.runner = SimulationRunner(session.simulation, session.metrics_history)
+        registry.save(session_id, session, overwrite=True) # A new setup replaces whatever was stored
+        if session.error:
+            print(session.error)
+        else:
+            print("Simulation Setup Complete")
         
-    elif triggered_id == 'start-button' and simulation_instance:
+    elif triggered_id == 'start-button' and session.simulation:
         print("Start button clicked")
         running = True
         disabled = False
+        if session.runner is not None:
+            configure_runner(session.runner, params)
+            session.runner.start()
         
     elif triggered_id == 'pause-button':
         print("Pause button clicked")
         running = False
         disabled = True
+        if session.runner is not None:
+            session.runner.pause()
         
-    return {'running': running}, disabled, interval
+    return {'running': running}, disabled, interval, watched_id
 
 # Callback for simulation step and visualization update
 @app.callback(
     Output('network-graph', 'figure'),
     Output('metrics-plot', 'figure'),
     Output('metrics-display', 'children'),
+    Output('network-figure-store', 'data'),
     Input('simulation-interval', 'n_intervals'),
-    Input('setup-button', 'n_clicks'), # Trigger update on setup too
-    State('run-state-store', 'data')
+    # Redraw after Setup/Start/Pause; run-state-store is written once handle_controls has finished
+    Input('run-state-store', 'data'),
+    State('params-store', 'data'), # Live fast-forward settings
+    State('network-figure-store', 'data'),
+    State('session-id-store', 'data'),
+    State('watch-id-store', 'data')
 )
-def run_simulation_step(n_intervals, setup_clicks, run_state):
-    global simulation_instance, metrics_history, network_pos
-    
-    # Determine if update is due to setup or interval
+def run_simulation_step(n_intervals, run_state, params, figure_state, session_id, watched_id=None):
+    # Determine if update is due to a control button or the interval
     ctx = dash.callback_context
     triggered_id = ctx.triggered_id
-    is_setup_trigger = triggered_id == 'setup-button'
+    is_control_trigger = triggered_id == 'run-state-store'
+    changed = False # Whether this request changed the session (otherwise nothing is saved)
+    # A watched run is drawn read-only: never stepped or saved from this tab
+    read_only = watched_id is not None
+    if read_only:
+        session_id = watched_id
 
-    if simulation_instance is None:
-        # No simulation initialized yet
-        return go.Figure(), go.Figure(), "Setup simulation to start."
+    session = registry.get(session_id)
+    if session is None or session.simulation is None:
+        # No simulation initialized yet (or the session expired)
+        message = session.error if session is not None and session.error else "Setup simulation to start."
+        return go.Figure(), go.Figure(), message, {'simulation_id': None, 'edge_mode': None, 'layout_version': None}
     
+    simulation_instance = session.simulation
+    metrics_history = session.metrics_history
     sim_state = simulation_instance.get_simulation_state()
     running = run_state['running']
     
-    # Perform step if running AND triggered by interval (not setup)
-    if running and not is_setup_trigger:
+    if session.runner is not None:
+        # The runner steps on its own; draw its latest snapshot
+        configure_runner(session.runner, params)
+        snapshot = session.runner.latest()
+        sim_state.update(beliefs=snapshot['beliefs'], time_step=snapshot['time_step'])
+    # Otherwise perform steps if running AND triggered by interval (not setup)
+    elif running and not is_control_trigger and not read_only:
         try:
-            simulation_instance.simulation_step()
+            # Fast-forward: several steps per frame, rendering only the final state
+            new_metrics = simulation_instance.advance(
+                params.get('steps_per_frame', 1),
+                sample_every=params.get('metrics_sample_rate', 1)
+            )
             sim_state = simulation_instance.get_simulation_state() # Get updated state
-            current_metrics = simulation_instance.calculate_metrics()
-            current_metrics['time_step'] = sim_state['time_step']
-            if not metrics_history or metrics_history[-1]['time_step'] != current_metrics['time_step']:
-                metrics_history.append(current_metrics)
+            changed = True
+            for current_metrics in new_metrics:
+                if not metrics_history or metrics_history[-1]['time_step'] != current_metrics['time_step']:
+                    metrics_history.append(current_metrics)
         except Exception as e:
             print(f"Error during simulation step: {e}")
             # Stop simulation on error (optional)
@@ -298,24 +454,55 @@ def run_simulation_step(n_intervals, setup_clicks, run_state):
     # Always generate visuals based on the current state
     
     # Network plot
-    if network_pos is None and sim_state['network']:
-         network_pos = nx.spring_layout(sim_state['network'], seed=42)
+    if not session.network_pos_final:
+        # Pick up the background layout once it is ready
+        positions, session.network_pos_final = layout_service.layout_for(simulation_instance)
+        if session.network_pos_final:
+            session.network_pos = positions
+            session.layout_version += 1
+            changed = True
          
-    network_fig = visualize_network(sim_state, network_pos)
-    if network_fig is None:
-        network_fig = go.Figure()
+    edge_mode = params.get('edge_mode', 'all')
+    if (is_control_trigger or figure_state.get('simulation_id') != session.simulation_id
+            or figure_state.get('edge_mode') != edge_mode
+            or figure_state.get('layout_version') != session.layout_version):
+        # New simulation, fresh page, new edge display or new layout: send the full figure once
+        network_fig = visualize_network(sim_state, session.network_pos, edge_mode=edge_mode)
+        if network_fig is None:
+            network_fig = go.Figure()
+        figure_state = {'simulation_id': session.simulation_id, 'edge_mode': edge_mode,
+                        'layout_version': session.layout_version}
+    else:
+        # Edges, positions and groups are unchanged: only patch colors and title
+        update = network_figure_update(sim_state)
+        network_fig = Patch()
+        network_fig['data'][1]['marker']['color'] = update['node_colors']
+        network_fig['layout']['title']['text'] = update['title']
+
+    # May thin metrics_history to respect the memory cap. With a shared backend, a
+    # redraw that changed nothing is not saved, and a stale copy (e.g. loaded
+    # before a Setup in another worker was saved) is rejected instead of overwriting it.
+    if not read_only and (changed or registry.backend is None) and not registry.save(session_id, session):
+        return dash.no_update, dash.no_update, dash.no_update, dash.no_update
+    if session.error:
+        return go.Figure(), go.Figure(), session.error, {'simulation_id': None, 'edge_mode': None, 'layout_version': None}
 
-    # Metrics plot
-    metrics_fig = plot_metrics(metrics_history)
+    with session.locked():
+        # Metrics plot (downsampled, so its cost does not grow with the run)
+        metrics_fig = plot_metrics(session.metrics_history)
+        last_metrics = session.metrics_history[-1] if session.metrics_history else None
     if metrics_fig is None:
         metrics_fig = go.Figure()
         
     # Metrics text
     metrics_text = "No metrics yet." 
-    if metrics_history:
-        metrics_text = format_metrics_text(metrics_history[-1])
+    if last_metrics:
+        metrics_text = format_metrics_text(last_metrics)
+    if session.runner is not None and session.runner.error:
+        # The runner paused itself after a failed step
+        metrics_text = f"Simulation stopped: {session.runner.error}\n\n{metrics_text}"
         
-    return network_fig, metrics_fig, html.Pre(metrics_text) # Use html.Pre for formatted text
+    return network_fig, metrics_fig, html.Pre(metrics_text), figure_state # Use html.Pre for formatted text
 
 # --- Run the app ---
 if __name__ == '__main__':
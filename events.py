@@ -0,0 +1,123 @@
+"""
+Optional log of every message sent during a simulation.
+
+Each event is one record (step, sender, recipient, content, accepted) in a
+preallocated buffer that is flushed in batches to a growable .npy record
+array, so logging costs a small constant factor per message instead of a
+Python object per message. accepted is False when an Echo Chamber recipient
+ignored the message for lack of trust in the sender.
+
+Usage:
+    log = InteractionLog('events.npy').attach(simulation)
+    simulation.run(1000, tol=None)
+    log.close()
+    events = load_events('events.npy')  # memory-mapped record array
+    summarize_events(events, simulation.group_index.codes)
+"""
+import numpy as np
+
+from recorder import GrowableNpy
+
+EVENT_DTYPE = np.dtype([
+    ('step', np.int64),       # Time step the message was sent in (1 = first step)
+    ('sender', np.int64),
+    ('recipient', np.int64),
+    ('content', np.float64),  # Sender's belief, i.e. the message
+    ('accepted', np.bool_),   # False if the recipient discredited the message
+])
+
+class InteractionLog:
+    """
+    Records the messages of a Simulation to an .npy record array of EVENT_DTYPE.
+    """
+    def __init__(self, path, buffer_size=65536):
+        """
+        Args:
+            path (str): Output .npy file (overwritten).
+            buffer_size (int): Events buffered in memory between writes.
+        """
+        self.path = path
+        self._events = GrowableNpy(path, None, dtype=EVENT_DTYPE, buffer_rows=buffer_size)
+        self.simulation = None
+
+    def attach(self, simulation):
+        """
+        Starts logging a simulation's messages.
+
+        Returns:
+            InteractionLog: self, for chaining.
+        """
+        simulation.event_log = self
+        self.simulation = simulation
+        return self
+
+    def record(self, step, sender, recipient, content, accepted):
+        """Logs a single message (object engine)."""
+        self._events.append((step, sender, recipient, content, accepted))
+
+    def record_batch(self, step, senders, recipients, contents, accepted):
+        """Logs all messages of one step (array engine)."""
+        batch = np.empty(len(senders), dtype=EVENT_DTYPE)
+        batch['step'] = step
+        batch['sender'] = senders
+        batch['recipient'] = recipients
+        batch['content'] = contents
+        batch['accepted'] = accepted
+        self._events.extend(batch)
+
+    def flush(self):
+        """Makes all logged events visible to readers."""
+        self._events.flush()
+
+    def close(self):
+        """Stops logging and closes the file."""
+        if self.simulation is not None and self.simulation.event_log is self:
+            self.simulation.event_log = None
+        self.simulation = None
+        self._events.close()
+
+    def __len__(self):
+        return len(self._events)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def load_events(path):
+    """Memory-maps a logged event file as a read-only record array of EVENT_DTYPE."""
+    return np.load(path, mmap_mode='r')
+
+def summarize_events(events, group_codes=None):
+    """
+    Counts how much exposure was accepted versus discredited.
+
+    Args:
+        events (numpy.ndarray): Records of EVENT_DTYPE (e.g. from load_events).
+        group_codes (numpy.ndarray, optional): Group code of every agent; adds
+            the same counts for messages within and between groups.
+
+    Returns:
+        dict: 'messages', 'accepted', 'discredited' and 'discredited_fraction'
+            (None without messages), plus 'intra_group' and 'inter_group' dicts
+            of the same keys when group_codes is given.
+    """
+    def counts(accepted):
+        messages = int(accepted.size)
+        num_accepted = int(np.count_nonzero(accepted))
+        return {
+            'messages': messages,
+            'accepted': num_accepted,
+            'discredited': messages - num_accepted,
+            'discredited_fraction': (messages - num_accepted) / messages if messages else None,
+        }
+
+    accepted = np.asarray(events['accepted'])
+    summary = counts(accepted)
+    if group_codes is not None:
+        group_codes = np.asarray(group_codes)
+        same_group = group_codes[events['sender']] == group_codes[events['recipient']]
+        summary['intra_group'] = counts(accepted[same_group])
+        summary['inter_group'] = counts(accepted[~same_group])
+    return summary
@@ -0,0 +1,53 @@
+import numpy as np
+
+# Canonical order of the two belief groups assigned in Agent.__init__
+DEFAULT_GROUP_LABELS = ('A', 'B')
+
+class GroupIndex:
+    """
+    Fixed group membership of every agent, built once at simulation setup.
+
+    Groups never change during a run, so metrics, visualization and any other
+    per-group analysis can slice these arrays instead of scanning agents.
+
+    Attributes:
+        labels (tuple): Group label for each group code.
+        codes (numpy.ndarray): Group code of every agent, by agent id.
+        members (list): Sorted agent ids of each group, by group code.
+        counts (numpy.ndarray): Number of agents in each group, by group code.
+    """
+    def __init__(self, agent_groups, labels=DEFAULT_GROUP_LABELS):
+        """
+        Args:
+            agent_groups (iterable): Group label of every agent, ordered by agent id.
+            labels (tuple): Known group labels in code order. Labels not listed here
+                are appended in sorted order.
+        """
+        agent_groups = list(agent_groups)
+        extra_labels = sorted(set(agent_groups) - set(labels))
+        self.labels = tuple(labels) + tuple(extra_labels)
+        self._code_of = {label: code for code, label in enumerate(self.labels)}
+
+        self.codes = np.fromiter((self._code_of[group] for group in agent_groups),
+                                 dtype=np.int8, count=len(agent_groups))
+        self.counts = np.bincount(self.codes, minlength=len(self.labels))
+        order = np.argsort(self.codes, kind='stable')
+        boundaries = np.cumsum(self.counts)[:-1]
+        self.members = np.split(order, boundaries)
+
+    @classmethod
+    def from_agents(cls, agents):
+        """Builds the index from a {agent_id: Agent} dict with ids 0..N-1."""
+        return cls(agents[agent_id].group for agent_id in range(len(agents)))
+
+    def code_of(self, label):
+        """Returns the group code of a label."""
+        return self._code_of[label]
+
+    def members_of(self, label):
+        """Returns the agent ids in the group with the given label."""
+        return self.members[self._code_of[label]]
+
+    def label_of(self, agent_id):
+        """Returns the group label of an agent."""
+        return self.labels[self.codes[agent_id]]
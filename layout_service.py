@@ -0,0 +1,211 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import networkx as nx
+import numpy as np
+
+# Bumped whenever the layout algorithms change, so stale disk entries are ignored
+LAYOUT_VERSION = 1
+
+# Networks with more agents skip spring_layout and use group_clustered_layout
+DEFAULT_LARGE_GRAPH_THRESHOLD = 1000
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    'ECHO_CHAMBER_LAYOUT_CACHE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.layout_cache')
+)
+
+def group_clustered_layout(group_codes, seed=42):
+    """
+    O(N) layout that places every group in its own disc.
+
+    Group centers sit on a circle (group A left, group B right) and the members
+    of each group fill their disc in a sunflower spiral, in random order.
+
+    Args:
+        group_codes (numpy.ndarray): Group code of every agent.
+        seed (int): Seed for the member order.
+
+    Returns:
+        numpy.ndarray: (N, 2) positions by agent id, roughly within [-1, 1].
+    """
+    group_codes = np.asarray(group_codes)
+    positions = np.zeros((group_codes.size, 2))
+    num_groups = int(group_codes.max()) + 1 if group_codes.size else 0
+    rng = np.random.default_rng(seed)
+    golden_angle = np.pi * (3 - np.sqrt(5))
+    radius = 0.45 if num_groups > 1 else 1.0
+
+    for code in range(num_groups):
+        members = rng.permutation(np.flatnonzero(group_codes == code))
+        if members.size == 0:
+            continue
+        angle = np.pi + 2 * np.pi * code / num_groups
+        center = (0.55 * np.cos(angle), 0.55 * np.sin(angle)) if num_groups > 1 else (0.0, 0.0)
+        k = np.arange(members.size)
+        r = radius * np.sqrt((k + 0.5) / members.size)
+        theta = k * golden_angle
+        positions[members, 0] = center[0] + r * np.cos(theta)
+        positions[members, 1] = center[1] + r * np.sin(theta)
+    return positions
+
+def spring_positions(network, num_nodes, seed=42):
+    """nx.spring_layout as an (N, 2) array by node id."""
+    pos = nx.spring_layout(network, seed=seed)
+    return np.array([pos[node_id] for node_id in range(num_nodes)], dtype=np.float64).reshape(num_nodes, 2)
+
+class LayoutService:
+    """
+    Computes, caches and serves network positions for the apps.
+
+    Layouts are cached under a fingerprint of the graph, both in memory (LRU)
+    and on disk (.npy files, oldest evicted first). Small graphs get
+    spring_layout, computed in a background thread so setup returns at once
+    with a group-clustered placeholder; large graphs get group_clustered_layout
+    directly.
+    """
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_memory_entries=32, max_disk_entries=256,
+                 large_graph_threshold=DEFAULT_LARGE_GRAPH_THRESHOLD, max_workers=1):
+        """
+        Args:
+            cache_dir (str or None): Directory for the disk cache; None disables it.
+            max_memory_entries (int): Layouts kept in memory.
+            max_disk_entries (int): Layout files kept on disk.
+            large_graph_threshold (int): Above this many agents, use group_clustered_layout.
+            max_workers (int): Background layout threads.
+        """
+        self.cache_dir = cache_dir
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.large_graph_threshold = large_graph_threshold
+        self._memory = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='layout')
+
+    @staticmethod
+    def fingerprint(simulation):
+        """
+        Cache key of a simulation's graph.
+
+        Combines num_agents, p_intra, p_inter and seed with a hash of the
+        adjacency itself, so unseeded runs never share a cached layout.
+        """
+        params = simulation.params
+        digest = hashlib.sha1()
+        digest.update(repr((
+            LAYOUT_VERSION,
+            params['num_agents'],
+            params['connection_probability_intra'],
+            params['connection_probability_inter'],
+            params.get('seed'),
+        )).encode())
+        digest.update(np.ascontiguousarray(simulation.indptr).tobytes())
+        digest.update(np.ascontiguousarray(simulation.indices).tobytes())
+        return digest.hexdigest()[:24]
+
+    def layout_for(self, simulation, background=True):
+        """
+        Returns positions for a simulation's network without blocking on spring_layout.
+
+        Args:
+            simulation (Simulation): The simulation to lay out.
+            background (bool): Compute spring_layout in a background thread (True)
+                or right away (False).
+
+        Returns:
+            tuple: ((N, 2) positions array, final). final is False while a better
+                layout is still being computed; call again later to pick it up.
+        """
+        key = self.fingerprint(simulation)
+        positions = self._lookup(key)
+        if positions is not None:
+            return positions, True
+
+        codes = simulation.group_index.codes
+        if len(codes) > self.large_graph_threshold:
+            positions = group_clustered_layout(codes)
+            self._store(key, positions)
+            return positions, True
+
+        if not background:
+            positions = spring_positions(simulation.network, len(codes))
+            self._store(key, positions)
+            return positions, True
+
+        network = simulation.network # Build the graph here, not in the worker thread
+        with self._lock:
+            if key not in self._pending:
+                self._pending[key] = self._executor.submit(self._compute, key, network, len(codes))
+        return group_clustered_layout(codes), False
+
+    def _compute(self, key, network, num_nodes):
+        """Background task: spring layout, then cache it."""
+        try:
+            positions = spring_positions(network, num_nodes)
+            self._store(key, positions)
+            return positions
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def _lookup(self, key):
+        """Memory cache first, then disk."""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+        path = self._disk_path(key)
+        if path is None or not os.path.exists(path):
+            return None
+        try:
+            positions = np.load(path)
+            os.utime(path) # Mark as recently used for eviction
+        except (OSError, ValueError):
+            return None
+        self._remember(key, positions)
+        return positions
+
+    def _store(self, key, positions):
+        """Saves a layout to memory and disk."""
+        self._remember(key, positions)
+        path = self._disk_path(key)
+        if path is None:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.save(f, positions)
+            os.replace(tmp_path, path)
+            self._evict_disk()
+        except OSError as e:
+            print(f"Warning: Could not write layout cache: {e}")
+
+    def _remember(self, key, positions):
+        with self._lock:
+            self._memory[key] = positions
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+
+    def _disk_path(self, key):
+        if not self.cache_dir:
+            return None
+        return os.path.join(self.cache_dir, f"{key}.npy")
+
+    def _evict_disk(self):
+        """Removes the least recently used layout files beyond max_disk_entries."""
+        files = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir)
+                 if name.endswith('.npy')]
+        if len(files) <= self.max_disk_entries:
+            return
+        files.sort(key=os.path.getmtime)
+        for path in files[:len(files) - self.max_disk_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,216 @@
+import numpy as np
+
+class MetricsAccumulator:
+    """
+    Keeps running per-group belief sums so metrics cost O(changed agents) per step.
+
+    For every group it tracks the count, the sum of (belief - shift) and the sum
+    of (belief - shift)**2, where shift is the group's initial mean (shifting
+    keeps the variance formula numerically stable). Overall metrics combine the
+    groups. Call resync() now and then to discard accumulated rounding error.
+    """
+    def __init__(self, beliefs, group_codes, group_labels=('A', 'B')):
+        """
+        Args:
+            beliefs (numpy.ndarray): Current belief of every agent.
+            group_codes (numpy.ndarray): Fixed group code of every agent (index into group_labels).
+            group_labels (tuple): Group name for each code, used in the metric keys.
+        """
+        self.group_codes = np.asarray(group_codes)
+        self.group_labels = tuple(group_labels)
+        num_groups = len(self.group_labels)
+        self.counts = np.bincount(self.group_codes, minlength=num_groups).astype(np.float64)
+        self.shifts = np.zeros(num_groups)
+        self.sums = np.zeros(num_groups)
+        self.sums_sq = np.zeros(num_groups)
+        self.resync(beliefs)
+
+    def resync(self, beliefs):
+        """Recomputes all sums exactly from the full belief vector."""
+        beliefs = np.asarray(beliefs, dtype=np.float64)
+        num_groups = len(self.group_labels)
+        totals = np.bincount(self.group_codes, weights=beliefs, minlength=num_groups)
+        self.shifts = np.divide(totals, self.counts, out=np.zeros(num_groups), where=self.counts > 0)
+        deviations = beliefs - self.shifts[self.group_codes]
+        self.sums = np.bincount(self.group_codes, weights=deviations, minlength=num_groups)
+        self.sums_sq = np.bincount(self.group_codes, weights=deviations * deviations, minlength=num_groups)
+
+    def update(self, agent_ids, old_beliefs, new_beliefs):
+        """Applies the belief changes of a batch of agents (each agent at most once)."""
+        codes = self.group_codes[agent_ids]
+        shifts = self.shifts[codes]
+        old = np.asarray(old_beliefs) - shifts
+        new = np.asarray(new_beliefs) - shifts
+        num_groups = len(self.group_labels)
+        self.sums += np.bincount(codes, weights=new - old, minlength=num_groups)
+        self.sums_sq += np.bincount(codes, weights=new * new - old * old, minlength=num_groups)
+
+    def update_one(self, agent_id, old_belief, new_belief):
+        """Applies a single agent's belief change."""
+        code = self.group_codes[agent_id]
+        shift = self.shifts[code]
+        old = old_belief - shift
+        new = new_belief - shift
+        self.sums[code] += new - old
+        self.sums_sq[code] += new * new - old * old
+
+    def _mean_std(self, count, shift, total, total_sq):
+        """Population mean and std from shifted sums."""
+        mean = total / count
+        variance = max(total_sq / count - mean * mean, 0.0)
+        return shift + mean, np.sqrt(variance)
+
+    def metrics(self):
+        """
+        Returns:
+            dict: Same keys and conventions as Simulation.calculate_metrics.
+        """
+        total_count = self.counts.sum()
+        metrics = {'avg_belief': None, 'std_dev_belief': None}
+        if total_count > 0:
+            # Combine the groups around the overall mean
+            group_means = self.shifts + np.divide(self.sums, self.counts, out=np.zeros_like(self.sums),
+                                                  where=self.counts > 0)
+            overall_mean = np.dot(self.counts, group_means) / total_count
+            offsets = self.shifts - overall_mean
+            total = np.sum(self.sums + self.counts * offsets)
+            total_sq = np.sum(self.sums_sq + 2 * offsets * self.sums + self.counts * offsets * offsets)
+            metrics['avg_belief'], metrics['std_dev_belief'] = self._mean_std(
+                total_count, overall_mean, total, total_sq)
+
+        for code, label in enumerate(self.group_labels):
+            count = int(self.counts[code])
+            avg, std = None, 0
+            if count > 0:
+                avg, std = self._mean_std(count, self.shifts[code], self.sums[code], self.sums_sq[code])
+                if count <= 1:
+                    std = 0
+            metrics[f'group_{label}_count'] = count
+            metrics[f'group_{label}_avg'] = avg
+            metrics[f'group_{label}_std'] = std
+        return metrics
+
+class MetricsHistory:
+    """
+    Columnar, growable store of metrics rows (calculate_metrics dicts plus 'time_step').
+
+    Every metric lives in its own preallocated NumPy array that doubles in
+    size when full, so appending is amortized O(1) and plotting can read whole
+    columns without building a DataFrame. None values are stored as NaN.
+    Indexing returns row dicts, so code written for a list of dicts still works.
+    """
+    def __init__(self, rows=None, capacity=1024):
+        """
+        Args:
+            rows (iterable, optional): Metrics dicts to start with.
+            capacity (int): Initial number of rows allocated.
+        """
+        self._capacity = max(1, capacity)
+        self._columns = {} # Field name -> array, created from the first row
+        self._length = 0
+        if rows is not None:
+            self.extend(rows)
+
+    @property
+    def fields(self):
+        """Metric names in insertion order."""
+        return list(self._columns)
+
+    @property
+    def nbytes(self):
+        """Memory allocated by the columns, in bytes."""
+        return sum(column.nbytes for column in self._columns.values())
+
+    def _add_field(self, name):
+        # Step numbers and group counts keep an integer column; everything else is float
+        dtype = np.int64 if name == 'time_step' or name.endswith('_count') else np.float64
+        column = np.zeros(self._capacity, dtype=dtype)
+        if dtype == np.float64:
+            column[:self._length] = np.nan
+        self._columns[name] = column
+
+    def append(self, row):
+        """Appends one metrics dict."""
+        if self._length == self._capacity:
+            self._capacity *= 2
+            for name, column in self._columns.items():
+                grown = np.zeros(self._capacity, dtype=column.dtype)
+                grown[:self._length] = column[:self._length]
+                self._columns[name] = grown
+        for name, value in row.items():
+            if name not in self._columns:
+                if value is None:
+                    continue # Wait for a real value to choose the column type
+                self._add_field(name)
+            column = self._columns[name]
+            column[self._length] = np.nan if value is None else value
+        # Fields missing from this row
+        for name, column in self._columns.items():
+            if name not in row and column.dtype == np.float64:
+                column[self._length] = np.nan
+        self._length += 1
+
+    def extend(self, rows):
+        """Appends several metrics dicts."""
+        for row in rows:
+            self.append(row)
+
+    def to_arrays(self):
+        """Returns {field: array} copies of the recorded columns (e.g. for np.savez)."""
+        return {name: column[:self._length].copy() for name, column in self._columns.items()}
+
+    @classmethod
+    def from_arrays(cls, columns):
+        """Builds a history from {field: array} columns of equal length."""
+        length = len(next(iter(columns.values()))) if columns else 0
+        history = cls(capacity=max(1024, length))
+        for name, values in columns.items():
+            history._add_field(name)
+            history._columns[name][:length] = values
+        history._length = length
+        return history
+
+    def column(self, name):
+        """Returns the values of one metric (a read-only view), or None if never recorded."""
+        column = self._columns.get(name)
+        if column is None:
+            return None
+        view = column[:self._length]
+        view.flags.writeable = False
+        return view
+
+    def thin(self):
+        """Drops every other row in place, keeping the first and the latest ones."""
+        if self._length <= 2:
+            return
+        keep = np.arange(0, self._length - 1, 2)
+        keep = np.append(keep, self._length - 1)
+        for column in self._columns.values():
+            column[:keep.size] = column[keep]
+        self._length = keep.size
+
+    def clear(self):
+        """Removes all rows (the allocated columns are kept)."""
+        self._length = 0
+
+    def __len__(self):
+        return self._length
+
+    def __bool__(self):
+        return self._length > 0
+
+    def __getitem__(self, index):
+        """Returns row `index` as a dict (negative indices count from the end)."""
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("MetricsHistory index out of range")
+        row = {}
+        for name, column in self._columns.items():
+            value = column[index].item()
+            row[name] = None if value != value else value # NaN -> None
+        return row
+
+    def __iter__(self):
+        for index in range(self._length):
+            yield self[index]
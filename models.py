@@ -1,5 +1,6 @@
 from agent import Agent
 import random
+import numpy as np
 
 # --- Helper function for simple belief update (from pseudocode) ---
 def update_belief_simple(current_belief, message_content, step_size=0.1):
@@ -35,6 +36,9 @@ def receive_message_bubble(recipient_agent: Agent, message_content: float, sende
         message_content (float): The belief content of the message.
         sender_agent (Agent): The agent sending the message.
         **kwargs: Catches potential extra arguments like step_size.
+
+    Returns:
+        bool: True (bubble recipients accept every message they receive).
     """
     step_size = kwargs.get('belief_update_step_size', 0.1) # Use provided step size or default
 
@@ -44,6 +48,7 @@ def receive_message_bubble(recipient_agent: Agent, message_content: float, sende
     # if the simulation loop only sends messages between connected agents.
     new_belief = update_belief_simple(recipient_agent.belief_state, message_content, step_size)
     recipient_agent.update_belief(new_belief) # Use agent's method to handle bounds
+    return True
 
 # --- Message Handling for Model C (Echo Chamber) ---
 def receive_message_chamber(recipient_agent: Agent, message_content: float, sender_agent: Agent, **kwargs):
@@ -55,30 +60,146 @@ def receive_message_chamber(recipient_agent: Agent, message_content: float, send
         recipient_agent (Agent): The agent receiving the message.
         message_content (float): The belief content of the message.
         sender_agent (Agent): The agent sending the message.
-        **kwargs: Catches potential extra arguments like trust_threshold, step_size, default_trust.
+        **kwargs: Catches potential extra arguments like trust_threshold, step_size, default_trust,
+            and sender_trusted (bool), the precomputed threshold test for this sender.
+
+    Returns:
+        bool: True if the message was accepted, False if it was discredited.
     """
     trust_threshold = kwargs.get('trust_threshold', 0.5)
     default_trust = kwargs.get('default_outsider_trust', 0.1)
     step_size = kwargs.get('belief_update_step_size', 0.1)
 
-    # Get the trust score for the sender from the recipient's perspective
-    sender_trust = recipient_agent.get_trust_score(sender_agent.id, default_trust=default_trust)
+    # Precomputed by the simulation from the acceptance mask when available
+    sender_trusted = kwargs.get('sender_trusted')
+    if sender_trusted is None:
+        # Get the trust score for the sender from the recipient's perspective
+        sender_trust = recipient_agent.get_trust_score(sender_agent.id, default_trust=default_trust)
+        sender_trusted = sender_trust >= trust_threshold
+
+    if kwargs.get('dynamic_trust', False):
+        # Judge the message against the belief it arrives at, before any update
+        confirming = is_confirming(recipient_agent, message_content)
+        update_trust(recipient_agent, sender_agent, bool(sender_trusted) and confirming,
+                     reinforcement=kwargs.get('trust_reinforcement', 0.05),
+                     decay=kwargs.get('trust_decay', 0.05),
+                     edge=kwargs.get('trust_edge'))
 
-    if sender_trust >= trust_threshold:
+    if sender_trusted:
         # Sender is trusted: Update belief based on message content
         new_belief = update_belief_simple(recipient_agent.belief_state, message_content, step_size)
         recipient_agent.update_belief(new_belief)
-        # Optional: Implement trust reinforcement here if desired
-        # update_trust(recipient_agent, sender_agent, "confirming")
+        return True
     else:
         # Sender is distrusted: Ignore the message (active discrediting)
-        pass
-        # Optional: Implement belief update away from the message or trust decrease
-        # update_trust(recipient_agent, sender_agent, "disconfirming")
-
-# --- Placeholder for optional trust update logic ---
-# def update_trust(agent, sender, message_type):
-#     # Logic for how trust changes based on interactions
-#     # e.g., increase trust if sender is already trusted and sends confirming message
-#     # e.g., decrease trust if sender is distrusted or sends disconfirming message
-#     pass 
\ No newline at end of file
+        return False
+
+# --- Dynamic trust (opt-in for the Echo Chamber model) ---
+# With params['dynamic_trust'], an accepted message whose content is close to
+# the recipient's belief (a confirming message) raises the recipient's trust in
+# the sender by trust_reinforcement; a discredited or disconfirming message
+# lowers it by trust_decay. Scores stay within [0, 1]. "Close" uses the
+# similarity threshold of the initial trust setup (TrustStore.similarity_threshold).
+def is_confirming(recipient_agent, message_content):
+    """Whether a message is close enough to the recipient's current belief to confirm it."""
+    similarity = recipient_agent.trust_store.similarity_threshold if recipient_agent.trust_store is not None else 0.3
+    return abs(message_content - recipient_agent.belief_state) < similarity
+
+def update_trust(recipient_agent, sender_agent, reinforced, reinforcement=0.05, decay=0.05, edge=None):
+    """
+    Updates the trust recipient_agent places in sender_agent after one message.
+
+    Args:
+        recipient_agent (Agent): The agent whose trust changes.
+        sender_agent (Agent): The agent it (dis)trusts.
+        reinforced (bool): True for an accepted, confirming message; False otherwise.
+        reinforcement (float): Trust gained on reinforcement.
+        decay (float): Trust lost otherwise.
+        edge (int, optional): CSR position of the recipient -> sender edge, if known.
+    """
+    delta = reinforcement if reinforced else -decay
+    if recipient_agent.has_trust_scores() and sender_agent.id in recipient_agent.trust_scores:
+        score = recipient_agent.trust_scores[sender_agent.id]
+        recipient_agent.trust_scores[sender_agent.id] = min(1.0, max(0.0, score + delta))
+        return
+    trust_store = recipient_agent.trust_store
+    if trust_store is None:
+        return
+    if edge is None:
+        edge = trust_store.edge_position(recipient_agent.id, sender_agent.id)
+        if edge is None:
+            return # Only trust along network edges can change
+    trust_store.adjust([edge], delta)
+
+def update_trust_batch(trust_store, trust_edges, reinforced, reinforcement=0.05, decay=0.05):
+    """
+    Vectorized update_trust for all messages of a step.
+
+    Args:
+        trust_store (trust.TrustStore): Trust updated in place (its acceptance mask is patched).
+        trust_edges (numpy.ndarray): CSR position of the recipient -> sender edge of each
+            message (unique: every agent sends at most one message per step).
+        reinforced (numpy.ndarray): Boolean mask of accepted, confirming messages.
+        reinforcement (float): Trust gained on reinforcement.
+        decay (float): Trust lost otherwise.
+    """
+    if trust_edges.size == 0:
+        return
+    trust_store.adjust(trust_edges, np.where(reinforced, reinforcement, -decay))
+
+# --- Batched counterparts used by the array engine ---
+def update_beliefs_batch(beliefs, recipients, message_contents, step_size=0.1):
+    """
+    Vectorized version of update_belief_simple for a whole batch of messages.
+
+    Every message is compared against the recipient's belief at the start of
+    the batch. A recipient's net movement is step_size times (messages above
+    its belief - messages below it), clipped once to [0, 1]. Counting instead
+    of summing floats keeps the result independent of message order.
+
+    Args:
+        beliefs (numpy.ndarray): Belief of every agent, updated in place.
+        recipients (numpy.ndarray): Recipient index of each message.
+        message_contents (numpy.ndarray): Belief content of each message.
+        step_size (float): How much belief shifts per message.
+    """
+    if recipients.size == 0:
+        return
+    current = beliefs[recipients]
+    n = beliefs.size
+    net = (np.bincount(recipients[message_contents > current], minlength=n)
+           - np.bincount(recipients[message_contents < current], minlength=n))
+    changed = net != 0
+    beliefs[changed] = np.clip(beliefs[changed] + net[changed] * step_size, 0.0, 1.0)
+
+def receive_messages_bubble(beliefs, recipients, message_contents, sender_trust=None, **kwargs):
+    """
+    Batched Epistemic Bubble handler: every delivered message is accepted.
+
+    Returns:
+        numpy.ndarray: Boolean mask of accepted messages (all True).
+    """
+    step_size = kwargs.get('belief_update_step_size', 0.1)
+    update_beliefs_batch(beliefs, recipients, message_contents, step_size)
+    return np.ones(recipients.size, dtype=bool)
+
+def receive_messages_chamber(beliefs, recipients, message_contents, sender_trust=None, **kwargs):
+    """
+    Batched Echo Chamber handler: only messages from trusted senders move beliefs.
+
+    Args:
+        sender_trust (numpy.ndarray): Each recipient's trust score for the sender of its message.
+        **kwargs: trust_threshold, belief_update_step_size, and optionally sender_trusted
+            (boolean array), the precomputed threshold test that replaces sender_trust.
+
+    Returns:
+        numpy.ndarray: Boolean mask of accepted messages.
+    """
+    trust_threshold = kwargs.get('trust_threshold', 0.5)
+    step_size = kwargs.get('belief_update_step_size', 0.1)
+
+    accepted = kwargs.get('sender_trusted')
+    if accepted is None:
+        accepted = sender_trust >= trust_threshold
+    update_beliefs_batch(beliefs, recipients[accepted], message_contents[accepted], step_size)
+    return accepted
@@ -1,7 +1,7 @@
 import networkx as nx
-import random
+import numpy as np
 
-def create_group_aware_network(agents_dict, p_intra, p_inter):
+def create_group_aware_network(agents_dict, p_intra, p_inter, rng=None):
     """
     Creates a network with different connection probabilities within and between groups.
 
@@ -10,33 +10,109 @@ def create_group_aware_network(agents_dict, p_intra, p_inter):
                           Agents must have a 'group' attribute ('A' or 'B').
         p_intra (float): Probability of connection between agents in the same group.
         p_inter (float): Probability of connection between agents in different groups.
+        rng (numpy.random.Generator, optional): Random generator used for sampling.
 
     Returns:
         networkx.Graph: The generated network graph.
     """
+    agent_ids = np.array(list(agents_dict.keys()))
+    groups = [agent.group for agent in agents_dict.values()]
+    u, v = sample_group_aware_edges(groups, p_intra, p_inter, rng)
+
+    G = nx.Graph()
+    G.add_nodes_from(agent_ids.tolist())
+    G.add_edges_from(zip(agent_ids[u].tolist(), agent_ids[v].tolist()))
+    return G
+
+# --- Stochastic block model sampling in O(N + E) ---
+def sample_group_aware_edges(groups, p_intra, p_inter, rng=None):
+    """
+    Samples the edges of a group-aware (stochastic block model) network.
+
+    Every pair of agents is connected independently with probability p_intra
+    (same group) or p_inter (different groups), exactly as in a pair-by-pair
+    loop, but only the selected pairs are ever generated: each block of pairs
+    is walked with geometric skips between successive edges.
+
+    Args:
+        groups (array-like): Group label of every agent, by position.
+        p_intra (float): Probability of connection between agents in the same group.
+        p_inter (float): Probability of connection between agents in different groups.
+        rng (numpy.random.Generator, optional): Random generator. Defaults to a fresh one.
+
+    Returns:
+        tuple: (u, v) int64 arrays of agent positions with u < v for every edge.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    labels, codes = np.unique(np.asarray(groups), return_inverse=True)
+    members = [np.flatnonzero(codes == code) for code in range(labels.size)]
+
+    u_parts, v_parts = [], []
+    for a in range(len(members)):
+        # Pairs inside group a: upper triangle of an n x n block
+        n = members[a].size
+        t = _sample_bernoulli_positions(n * (n - 1) // 2, p_intra, rng)
+        i, j = _triangle_pairs(t, n)
+        u_parts.append(members[a][i])
+        v_parts.append(members[a][j])
+
+        for b in range(a + 1, len(members)):
+            # Pairs between groups a and b: full n_a x n_b rectangle
+            n_b = members[b].size
+            t = _sample_bernoulli_positions(n * n_b, p_inter, rng)
+            u_parts.append(members[a][t // n_b])
+            v_parts.append(members[b][t % n_b])
+
+    if not u_parts:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    u = np.concatenate(u_parts).astype(np.int64)
+    v = np.concatenate(v_parts).astype(np.int64)
+    return np.minimum(u, v), np.maximum(u, v)
+
+def _sample_bernoulli_positions(num_trials, p, rng):
+    """Returns the sorted positions in range(num_trials) that succeed with probability p each."""
+    if num_trials <= 0 or p <= 0:
+        return np.empty(0, dtype=np.int64)
+    if p >= 1:
+        return np.arange(num_trials, dtype=np.int64)
+
+    chunks = []
+    last = -1
+    remaining = num_trials
+    while True:
+        # Draw a little more than the expected number of remaining successes
+        expected = remaining * p
+        batch = int(expected + 4 * np.sqrt(expected) + 16)
+        positions = last + np.cumsum(rng.geometric(p, size=batch))
+        if positions[-1] >= num_trials:
+            chunks.append(positions[positions < num_trials])
+            break
+        chunks.append(positions)
+        last = int(positions[-1])
+        remaining = num_trials - last - 1
+    return np.concatenate(chunks)
+
+def _triangle_pairs(t, n):
+    """Maps linear indices of the strict upper triangle of an n x n matrix to (row, col)."""
+    t = t.astype(np.int64)
+    # Row i starts at offset i * (2n - i - 1) / 2; invert with the quadratic formula
+    b = 2 * n - 1
+    i = np.floor((b - np.sqrt(np.maximum(b * b - 8 * t, 0).astype(np.float64))) / 2).astype(np.int64)
+    # Correct any floating point rounding of the square root
+    i = np.where(_triangle_row_offset(i, n) > t, i - 1, i)
+    i = np.where(_triangle_row_offset(i + 1, n) <= t, i + 1, i)
+    j = t - _triangle_row_offset(i, n) + i + 1
+    return i, j
+
+def _triangle_row_offset(row, n):
+    """Linear index of the first upper-triangle entry in the given row."""
+    return row * (2 * n - row - 1) // 2
+
+def edges_to_network(num_nodes, u, v):
+    """Builds a networkx graph with nodes 0..num_nodes-1 from an edge list."""
     G = nx.Graph()
-    agent_ids = list(agents_dict.keys())
-    G.add_nodes_from(agent_ids)
-
-    agent_list = list(agents_dict.values()) # For easier iteration
-
-    for i in range(len(agent_list)):
-        for j in range(i + 1, len(agent_list)):
-            agent_i = agent_list[i]
-            agent_j = agent_list[j]
-
-            # Determine connection probability based on groups
-            if agent_i.group == agent_j.group:
-                # Intra-group connection
-                connection_probability = p_intra
-            else:
-                # Inter-group connection
-                connection_probability = p_inter
-            
-            # Add edge based on the determined probability
-            if random.random() < connection_probability:
-                G.add_edge(agent_i.id, agent_j.id)
-                
+    G.add_nodes_from(range(num_nodes))
+    G.add_edges_from(zip(np.asarray(u).tolist(), np.asarray(v).tolist()))
     return G
 
 # --- Helper function from pseudocode (adapted for networkx) ---
@@ -44,4 +120,66 @@ def get_neighbors(network, agent_id):
     """Gets the neighbors of an agent from the networkx graph."""
     if agent_id in network:
         return list(network.neighbors(agent_id))
-    return [] 
\ No newline at end of file
+    return [] 
+
+# --- Interactive size limits (shared by the apps) ---
+# Roughly logarithmic choices for the apps' agent count controls
+AGENT_COUNT_OPTIONS = [10, 20, 30, 50, 75, 100, 150, 200, 300, 500, 750, 1000, 2000, 3000, 5000,
+                       7500, 10000, 20000, 30000, 50000, 75000, 100000]
+# Setups expected to create more edges than this are refused before sampling the network
+MAX_INTERACTIVE_EDGES = 5_000_000
+
+def expected_edge_count(num_agents, p_intra, p_inter):
+    """Expected number of edges for num_agents split into two equal groups."""
+    group_size = num_agents / 2
+    return p_intra * group_size * (group_size - 1) + p_inter * group_size * group_size
+
+def network_size_error(num_agents, p_intra, p_inter, max_edges=MAX_INTERACTIVE_EDGES):
+    """
+    Checks whether a network is small enough to set up interactively.
+
+    Returns:
+        str or None: A message for the user if the expected edge count exceeds
+            max_edges, otherwise None.
+    """
+    edges = expected_edge_count(num_agents, p_intra, p_inter)
+    if edges <= max_edges:
+        return None
+    return (f"These settings would create about {edges:,.0f} connections (limit {max_edges:,}). "
+            "Lower the connection probabilities or the number of agents.")
+
+# --- Array (CSR) representation of the network ---
+def edges_to_csr(num_nodes, u, v):
+    """
+    Builds a symmetric CSR adjacency from an undirected edge list.
+
+    Args:
+        num_nodes (int): Number of nodes; ids must be 0..num_nodes-1.
+        u, v (array-like): Endpoints of each undirected edge.
+
+    Returns:
+        tuple: (indptr, indices). Neighbors of node i are indices[indptr[i]:indptr[i+1]],
+            sorted ascending.
+    """
+    u = np.asarray(u, dtype=np.int64)
+    v = np.asarray(v, dtype=np.int64)
+    rows = np.concatenate([u, v])
+    cols = np.concatenate([v, u])
+    order = np.lexsort((cols, rows))
+    indices = cols[order]
+    indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=num_nodes), out=indptr[1:])
+    return indptr, indices
+
+def reverse_edge_index(indptr, indices):
+    """
+    For a symmetric CSR adjacency, maps each edge position (i -> j) to the
+    position of its reverse edge (j -> i).
+    """
+    num_nodes = indptr.size - 1
+    rows = np.repeat(np.arange(num_nodes, dtype=np.int64), np.diff(indptr))
+    # Edges sorted by (column, row) are the reverse edges in CSR (row, column) order
+    by_column = np.argsort(indices.astype(np.int64) * num_nodes + rows) # Keys are unique
+    reverse = np.empty(indices.size, dtype=np.int64)
+    reverse[by_column] = np.arange(indices.size, dtype=np.int64)
+    return reverse
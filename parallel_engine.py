@@ -0,0 +1,356 @@
+"""
+Multi-core stepping for a single large simulation.
+
+ParallelEngine runs the array engine's synchronous step across worker
+processes. Beliefs, the CSR adjacency and (for the chamber model) per-edge
+trust live in multiprocessing.shared_memory blocks that every worker maps, so
+nothing is copied per step. The agents are split into contiguous partitions,
+one per worker, and each step runs in two phases separated by a barrier:
+
+1. Send: each worker draws the messages of its own senders (from random
+   numbers the main process drew, so the stream matches ArrayEngine), decides
+   acceptance, and posts every accepted message that moves a belief (its
+   recipient and direction) to an outbox, bucketed by the partition that owns
+   the recipient.
+2. Apply: each worker reads the buckets addressed to its partition from all
+   outboxes and moves its recipients' beliefs, exactly as
+   models.update_beliefs_batch does.
+
+Each phase costs a worker O(its messages + workers^2), so per-worker time and
+memory shrink as workers are added.
+
+Cross-partition messages are therefore resolved at the step boundary, and a
+run produces bit-for-bit the same beliefs (and metrics) as the array engine
+with the same seed.
+
+Usage:
+    sim = Simulation({**params, 'engine': 'parallel', 'workers': 8})
+    sim.run(1000, tol=None)
+    sim.close()  # stops the worker processes
+
+Workers are started with the 'spawn' method, so scripts that use this engine
+need the usual `if __name__ == '__main__':` guard. batch_runner's pool
+workers are not daemonic, so sweeps can use this engine too; each run then
+starts its own workers, so keep the pool size times params['workers'] within
+the CPU count.
+"""
+import multiprocessing
+import os
+import traceback
+import weakref
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from array_engine import ArrayEngine
+
+def _shared_ndarray(block, shape, dtype):
+    """
+    An array over a shared memory block that owns the block's mapping.
+
+    NumPy does not hold the block's buffer export, so closing the block while
+    the array (or a view of it) is alive would leave it pointing at unmapped
+    memory. The block is closed, unmapping it and closing its file descriptor,
+    once the array and all its views have been collected.
+    """
+    array = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+    weakref.finalize(array, block.close).atexit = False
+    return array
+
+class SharedArrays:
+    """
+    NumPy arrays in named shared memory blocks, attachable from other processes.
+    """
+    def __init__(self):
+        self.blocks = {} # name -> (SharedMemory, shape, dtype)
+
+    def create(self, name, shape, dtype):
+        """Allocates a shared array (contents uninitialized)."""
+        dtype = np.dtype(dtype)
+        nbytes = int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+        block = shared_memory.SharedMemory(create=True, size=max(1, nbytes))
+        self.blocks[name] = (block, tuple(shape), dtype)
+        return _shared_ndarray(block, shape, dtype)
+
+    def copy(self, name, array):
+        """Allocates a shared array holding a copy of array."""
+        array = np.asarray(array)
+        shared = self.create(name, array.shape, array.dtype)
+        shared[...] = array
+        return shared
+
+    def layout(self):
+        """Picklable description of the blocks for attach_shared_arrays."""
+        return {name: (block.name, shape, dtype.str) for name, (block, shape, dtype) in self.blocks.items()}
+
+    def unlink(self):
+        """Removes the block names; memory is freed once no process maps it."""
+        for block, _, _ in self.blocks.values():
+            try:
+                block.unlink()
+            except FileNotFoundError:
+                pass
+        self.blocks = {}
+
+def attach_shared_arrays(layout):
+    """Maps the arrays described by SharedArrays.layout() in this process."""
+    arrays = {}
+    for name, (block_name, shape, dtype) in layout.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        arrays[name] = _shared_ndarray(block, shape, np.dtype(dtype))
+    return arrays
+
+def partition_bounds(num_agents, num_parts):
+    """Splits agent ids 0..num_agents-1 into num_parts contiguous (start, end) ranges."""
+    edges = np.linspace(0, num_agents, num_parts + 1).astype(np.int64)
+    return list(zip(edges[:-1].tolist(), edges[1:].tolist()))
+
+# --- Worker side ---
+def _send_phase(arrays, worker_id, start, end, degree, partition_starts, settings):
+    """Phase 1: draws and filters the messages of senders start..end-1 and posts them by partition."""
+    beliefs = arrays['beliefs']
+    acting = (arrays['act_draws'][start:end] < settings['interaction_chance']) & (degree > 0)
+    local = np.flatnonzero(acting)
+    senders = start + local
+    edges = arrays['indptr'][senders] + (arrays['choice_draws'][senders] * degree[local]).astype(np.int64)
+    recipients = arrays['indices'][edges]
+    message_contents = beliefs[senders]
+    current = beliefs[recipients]
+
+    if 'acceptance_mask' in arrays:
+        accepted = arrays['acceptance_mask'][edges]
+    else:
+        accepted = np.ones(senders.size, dtype=bool)
+
+    # Per-sender message record, read back by the main process
+    message_recipients = arrays['message_recipients']
+    message_recipients[start:end] = -1
+    message_recipients[senders] = recipients
+    arrays['message_accepted'][senders] = accepted
+    # Stamping with the step number marks this step's recipients without a reset
+    arrays['received_step'][recipients] = settings['step_id']
+
+    # Accepted messages that move their recipient: +1 up, -1 down. Each sender sends at
+    # most one message, so they fit in this worker's sender range of the outbox.
+    direction = np.sign(message_contents - current).astype(np.int8)
+    posted = accepted & (direction != 0)
+    posted_recipients = recipients[posted]
+    partitions = np.searchsorted(partition_starts, posted_recipients, side='right') - 1
+    order = np.argsort(partitions, kind='stable')
+    count = order.size
+    arrays['outbox_recipients'][start:start + count] = posted_recipients[order]
+    arrays['outbox_directions'][start:start + count] = direction[posted][order]
+    offsets = arrays['outbox_offsets'][worker_id]
+    offsets[0] = 0
+    np.cumsum(np.bincount(partitions, minlength=partition_starts.size), out=offsets[1:])
+
+    if settings['dynamic_trust'] and senders.size:
+        # Every message owns its edge pair, so workers never write the same positions
+        trust_edges = arrays['reverse_edges'][edges]
+        reinforced = accepted & (np.abs(message_contents - current) < settings['similarity_threshold'])
+        edge_trust = arrays['edge_trust']
+        scores = np.clip(edge_trust[trust_edges]
+                         + np.where(reinforced, settings['trust_reinforcement'], -settings['trust_decay']),
+                         0.0, 1.0)
+        edge_trust[trust_edges] = scores
+        arrays['acceptance_mask'][edges] = scores >= settings['trust_threshold']
+
+def _apply_phase(arrays, worker_id, start, end, partition_starts, step_size):
+    """Phase 2: applies the messages all workers posted to recipients start..end-1."""
+    beliefs = arrays['beliefs'][start:end]
+    arrays['previous_beliefs'][start:end] = beliefs
+    outbox_recipients = arrays['outbox_recipients']
+    outbox_directions = arrays['outbox_directions']
+    net = np.zeros(end - start, dtype=np.int64)
+    for sender_worker, (lower, upper) in enumerate(arrays['outbox_offsets'][:, worker_id:worker_id + 2].tolist()):
+        # This worker's bucket in the outbox of sender_worker
+        base = partition_starts[sender_worker]
+        recipients = outbox_recipients[base + lower:base + upper] - start
+        directions = outbox_directions[base + lower:base + upper]
+        net += np.bincount(recipients[directions > 0], minlength=end - start)
+        net -= np.bincount(recipients[directions < 0], minlength=end - start)
+    changed = net != 0
+    beliefs[changed] = np.clip(beliefs[changed] + net[changed] * step_size, 0.0, 1.0)
+
+def _worker_main(conn, layout, worker_id, partition_starts):
+    """Worker process loop: runs phases on request until told to stop."""
+    arrays = attach_shared_arrays(layout)
+    partition_starts = np.asarray(partition_starts, dtype=np.int64)
+    start = int(partition_starts[worker_id])
+    end = int(partition_starts[worker_id + 1]) if worker_id + 1 < partition_starts.size else arrays['beliefs'].size
+    indptr = arrays['indptr']
+    degree = np.diff(indptr[start:end + 1])
+    while True:
+        command, payload = conn.recv()
+        if command == 'stop':
+            break
+        try:
+            if command == 'send':
+                _send_phase(arrays, worker_id, start, end, degree, partition_starts, payload)
+            elif command == 'apply':
+                _apply_phase(arrays, worker_id, start, end, partition_starts, payload)
+            conn.send(None)
+        except Exception:
+            conn.send(traceback.format_exc())
+    conn.close()
+
+def _shutdown(processes, connections, shared):
+    """Stops the workers and releases the shared memory names."""
+    for conn in connections:
+        try:
+            conn.send(('stop', None))
+        except (OSError, ValueError):
+            pass
+    for process in processes:
+        process.join(timeout=5)
+        if process.is_alive():
+            process.terminate()
+    for conn in connections:
+        conn.close()
+    shared.unlink()
+
+# --- Main side ---
+class ParallelEngine(ArrayEngine):
+    """
+    ArrayEngine whose steps run in worker processes over shared memory.
+
+    Same constructor and interface as ArrayEngine, plus `workers` (default:
+    params['workers'] or the CPU count). The engine moves beliefs, adjacency
+    and trust into shared memory; use from_arrays so the simulation's
+    AgentArrays and TrustStore are rebound to the shared copies.
+    Workers start on the first step; call close() to stop them.
+    """
+    def __init__(self, beliefs, groups, indptr, indices, params, edge_trust=None, rng=None,
+                 trust_store=None, workers=None):
+        super().__init__(beliefs, groups, indptr, indices, params, edge_trust=edge_trust, rng=rng,
+                         trust_store=trust_store)
+        num_agents = self.beliefs.size
+        if workers is None:
+            workers = params.get('workers') or os.cpu_count() or 1
+        self.workers = max(1, min(int(workers), max(1, num_agents)))
+
+        self.shared = SharedArrays()
+        self.beliefs = self.shared.copy('beliefs', self.beliefs)
+        self.indptr = self.shared.copy('indptr', np.asarray(indptr, dtype=np.int64))
+        self.indices = self.shared.copy('indices', np.asarray(indices, dtype=np.int64))
+        self._previous_beliefs = self.shared.copy('previous_beliefs', self.beliefs)
+        self._act_draws = self.shared.create('act_draws', (num_agents,), np.float64)
+        self._choice_draws = self.shared.create('choice_draws', (num_agents,), np.float64)
+        self._message_recipients = self.shared.create('message_recipients', (num_agents,), np.int64)
+        self._message_recipients.fill(-1)
+        self._message_accepted = self.shared.create('message_accepted', (num_agents,), bool)
+        self._received_step = self.shared.create('received_step', (num_agents,), np.int64)
+        self._received_step.fill(0)
+        # Messages posted in the send phase, bucketed by recipient partition (see _send_phase)
+        self.shared.create('outbox_recipients', (num_agents,), np.int64)
+        self.shared.create('outbox_directions', (num_agents,), np.int8)
+        self.shared.create('outbox_offsets', (self.workers, self.workers + 1), np.int64)
+
+        self._mask = None
+        self._mask_key = None
+        if self.trust_store is not None:
+            store = self.trust_store
+            store.reverse_edges # Build it from the original adjacency before rebinding
+            store._reverse_edges = self.shared.copy('reverse_edges', store.reverse_edges)
+            store.edge_trust = self.shared.copy('edge_trust', store.edge_trust)
+            store.indptr, store.indices = self.indptr, self.indices
+            self.edge_trust = store.edge_trust
+            self._mask = self.shared.create('acceptance_mask', (self.indices.size,), bool)
+
+        self._step_id = 0
+        self._processes = []
+        self._connections = []
+        # Stops the workers and unlinks the shared memory on close() or when the engine is collected
+        self._finalizer = weakref.finalize(self, _shutdown, self._processes, self._connections, self.shared)
+
+    @classmethod
+    def from_arrays(cls, arrays, group_index, params, trust_store=None, rng=None):
+        """
+        Builds an engine over a Simulation's AgentArrays and moves them into shared memory.
+
+        arrays.beliefs, arrays.indptr and arrays.indices (and the trust store's
+        arrays) are rebound to the shared copies, so Agent views created
+        afterwards read the beliefs the workers write.
+        """
+        engine = super().from_arrays(arrays, group_index, params, trust_store=trust_store, rng=rng)
+        arrays.beliefs, arrays.indptr, arrays.indices = engine.beliefs, engine.indptr, engine.indices
+        return engine
+
+    def start(self):
+        """Starts the worker processes (done automatically by the first step)."""
+        if not self._finalizer.alive:
+            raise RuntimeError("The parallel engine has been closed.")
+        if self._processes:
+            return
+        context = multiprocessing.get_context('spawn')
+        layout = self.shared.layout()
+        partition_starts = [start for start, _ in partition_bounds(self.beliefs.size, self.workers)]
+        for worker_id in range(self.workers):
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(target=_worker_main, args=(child_conn, layout, worker_id, partition_starts),
+                                      name=f'simulation-worker-{worker_id}', daemon=True)
+            process.start()
+            child_conn.close()
+            self._processes.append(process)
+            self._connections.append(parent_conn)
+
+    def close(self):
+        """Stops the workers and releases the shared memory (the arrays stay readable here)."""
+        self._finalizer()
+
+    def _run_phase(self, command, payload):
+        """Sends one phase to every worker and waits for all of them (the barrier)."""
+        for conn in self._connections:
+            conn.send((command, payload))
+        errors = [conn.recv() for conn in self._connections]
+        errors = [error for error in errors if error is not None]
+        if errors:
+            raise RuntimeError(f"Parallel worker failed:\n{errors[0]}")
+
+    def step(self):
+        """
+        Executes one simulation step across the worker processes.
+
+        Returns:
+            int: Number of messages sent during the step.
+        """
+        num_agents = self.beliefs.size
+        if num_agents == 0:
+            return super().step()
+        self.start()
+
+        # Same draws, in the same order, as ArrayEngine.step
+        self.rng.random(out=self._act_draws)
+        self.rng.random(out=self._choice_draws)
+
+        trust_threshold = self.params.get('trust_threshold', 0.5)
+        dynamic_trust = self.trust_store is not None and self.params.get('dynamic_trust', False)
+        if self.trust_store is not None:
+            key = (self.trust_store.version, trust_threshold)
+            if self._mask_key != key:
+                np.copyto(self._mask, self.trust_store.acceptance_mask(trust_threshold))
+                self._mask_key = key
+
+        self._step_id += 1
+        self._run_phase('send', {
+            'step_id': self._step_id,
+            'interaction_chance': self.params.get('interaction_chance', 0.5),
+            'dynamic_trust': dynamic_trust,
+            'trust_threshold': trust_threshold,
+            'trust_reinforcement': self.params.get('trust_reinforcement', 0.05),
+            'trust_decay': self.params.get('trust_decay', 0.05),
+            'similarity_threshold': self.trust_store.similarity_threshold if self.trust_store is not None else 0.0,
+        })
+        self._run_phase('apply', self.params.get('belief_update_step_size', 0.1))
+
+        if dynamic_trust:
+            # Workers patched edge_trust and the mask; keep the mask instead of rebuilding it
+            self.trust_store.invalidate()
+            self._mask_key = (self.trust_store.version, trust_threshold)
+
+        touched = np.flatnonzero(self._received_step == self._step_id)
+        self.last_changes = (touched, self._previous_beliefs[touched])
+        senders = np.flatnonzero(self._message_recipients >= 0)
+        self.last_messages = (senders, self._message_recipients[senders],
+                              self._previous_beliefs[senders], self._message_accepted[senders])
+        return senders.size
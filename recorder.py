@@ -0,0 +1,195 @@
+"""
+Streams per-agent belief trajectories to disk.
+
+A TrajectoryRecorder hooked into a Simulation appends the full belief vector
+every k steps to a growable .npy file (<name>.npy, shape (snapshots, agents))
+and the matching time steps to <name>_steps.npy. Both are ordinary .npy files,
+so readers memory-map them and slice by time or agent range without copying:
+
+    steps, beliefs = load_trajectory('run.npy')
+    beliefs[100:200, :500]  # snapshots 100-199 of agents 0-499, read lazily
+
+Usage:
+    recorder = TrajectoryRecorder('run.npy', every=10).attach(simulation)
+    simulation.run(10000, tol=None)
+    recorder.close()
+"""
+import os
+
+import numpy as np
+
+# Fixed .npy header size: leaves room to rewrite the shape as rows are appended
+NPY_HEADER_BYTES = 256
+
+class GrowableNpy:
+    """
+    A .npy file that grows along its first axis (2-D rows, or a 1-D record array).
+
+    The header is padded to a fixed size so the shape can be rewritten in
+    place after every flush; rows are appended to the end of the file. Rows
+    are buffered in memory and written in batches. Readers opening the file
+    see every flushed row.
+    """
+    def __init__(self, path, row_length, dtype=np.float64, buffer_rows=None):
+        """
+        Args:
+            path (str): Output .npy file (overwritten).
+            row_length (int or None): Values per row; None for a 1-D array (e.g. of records).
+            dtype: Value type on disk (may be a structured dtype).
+            buffer_rows (int, optional): Rows buffered between writes; defaults to about 8 MB.
+        """
+        self.path = path
+        self.row_length = row_length
+        self.dtype = np.dtype(dtype)
+        row_shape = () if row_length is None else (row_length,)
+        row_bytes = max(1, (row_length or 1) * self.dtype.itemsize)
+        self.buffer_rows = buffer_rows or max(1, (8 * 2**20) // row_bytes)
+        self._buffer = np.empty((self.buffer_rows,) + row_shape, dtype=self.dtype)
+        self._buffered = 0
+        self.rows_written = 0
+        self._file = open(path, 'wb+')
+        self._write_header()
+        self._file.flush()
+
+    def _write_header(self):
+        header = {
+            'descr': np.lib.format.dtype_to_descr(self.dtype),
+            'fortran_order': False,
+            'shape': (self.rows_written,) if self.row_length is None else (self.rows_written, self.row_length),
+        }
+        text = repr(header).encode('latin1')
+        # Magic (6) + version (2) + header length (2) + padded dict ending in a newline
+        padding = NPY_HEADER_BYTES - 10 - len(text) - 1
+        if padding < 0:
+            raise ValueError("Array shape too large for the fixed .npy header.")
+        self._file.seek(0)
+        self._file.write(np.lib.format.MAGIC_PREFIX + bytes([1, 0]))
+        self._file.write((NPY_HEADER_BYTES - 10).to_bytes(2, 'little'))
+        self._file.write(text + b' ' * padding + b'\n')
+
+    def append(self, row):
+        """Appends one row (copied into the write buffer)."""
+        self._buffer[self._buffered] = row
+        self._buffered += 1
+        if self._buffered == self.buffer_rows:
+            self.flush()
+
+    def extend(self, rows):
+        """Appends a batch of rows, copied into the write buffer in chunks."""
+        start = 0
+        while start < len(rows):
+            count = min(len(rows) - start, self.buffer_rows - self._buffered)
+            self._buffer[self._buffered:self._buffered + count] = rows[start:start + count]
+            self._buffered += count
+            start += count
+            if self._buffered == self.buffer_rows:
+                self.flush()
+
+    def flush(self):
+        """Writes buffered rows, then updates the header so readers see them."""
+        if self._buffered == 0:
+            return
+        self._file.seek(0, os.SEEK_END)
+        self._file.write(self._buffer[:self._buffered].tobytes())
+        self.rows_written += self._buffered
+        self._buffered = 0
+        self._write_header()
+        self._file.flush()
+
+    def close(self):
+        """Flushes and closes the file."""
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+
+    def __len__(self):
+        return self.rows_written + self._buffered
+
+class TrajectoryRecorder:
+    """
+    Records every agent's belief every `every` steps via a Simulation step hook.
+    """
+    def __init__(self, path, every=1, dtype=np.float64, buffer_rows=None):
+        """
+        Args:
+            path (str): Belief file (.npy); time steps go to <name>_steps.npy.
+            every (int): Record time steps divisible by this.
+            dtype: Belief type on disk (np.float32 halves the file size).
+            buffer_rows (int, optional): Snapshots buffered between writes.
+        """
+        self.path = path
+        self.steps_path = steps_path_for(path)
+        self.every = max(1, int(every))
+        self.dtype = dtype
+        self.buffer_rows = buffer_rows
+        self.simulation = None
+        self._beliefs = None
+        self._steps = None
+
+    def attach(self, simulation):
+        """
+        Starts recording a simulation (its current state is the first snapshot).
+
+        Returns:
+            TrajectoryRecorder: self, for chaining.
+        """
+        num_agents = simulation.arrays.beliefs.size
+        self.simulation = simulation
+        self._beliefs = GrowableNpy(self.path, num_agents, dtype=self.dtype, buffer_rows=self.buffer_rows)
+        self._steps = GrowableNpy(self.steps_path, 1, dtype=np.int64, buffer_rows=self._beliefs.buffer_rows)
+        self.record(simulation)
+        simulation.add_step_hook(self.on_step)
+        return self
+
+    def on_step(self, simulation):
+        """Step hook: records the beliefs on every `every`-th step."""
+        if simulation.time_step % self.every == 0:
+            self.record(simulation)
+
+    def record(self, simulation):
+        """Appends the simulation's current beliefs."""
+        self._beliefs.append(simulation.arrays.beliefs)
+        self._steps.append(simulation.time_step)
+
+    def flush(self):
+        """Makes all recorded snapshots visible to readers."""
+        self._beliefs.flush()
+        self._steps.flush()
+
+    def close(self):
+        """Stops recording and closes the files."""
+        if self.simulation is not None:
+            self.simulation.remove_step_hook(self.on_step)
+            self.simulation = None
+        if self._beliefs is not None:
+            self._beliefs.close()
+            self._steps.close()
+
+    def __len__(self):
+        return len(self._beliefs) if self._beliefs is not None else 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def steps_path_for(path):
+    """Path of the time-step file recorded next to a belief file."""
+    root, ext = os.path.splitext(path)
+    return f"{root}_steps{ext or '.npy'}"
+
+def load_trajectory(path):
+    """
+    Memory-maps a recorded trajectory.
+
+    Returns:
+        tuple: (steps, beliefs): a read-only (snapshots,) array of time steps and a
+            read-only (snapshots, agents) memory-mapped belief array.
+    """
+    beliefs = np.load(path, mmap_mode='r')
+    steps = np.load(steps_path_for(path), mmap_mode='r')[:, 0]
+    # A reader racing the writer may see one file flushed further than the other
+    count = min(len(beliefs), len(steps))
+    return steps[:count], beliefs[:count]
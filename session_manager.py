@@ -0,0 +1,388 @@
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import nullcontext
+
+import numpy as np
+
+from metrics import MetricsHistory
+from simulation import Simulation
+
+# Rough per-object sizes used by SimulationSession.memory_bytes
+AGENT_VIEW_BYTES = 120 # Slotted Agent view plus its dict entry
+GRAPH_EDGE_BYTES = 400 # networkx adjacency entries for one undirected edge
+
+class SimulationSession:
+    """
+    Everything the Dash app keeps for one browser session.
+
+    Attributes:
+        simulation (Simulation or None): The session's simulation.
+        simulation_id (int): Incremented on every setup; tells which simulation a drawn figure shows.
+        metrics_history (metrics.MetricsHistory): Metrics recorded so far.
+        network_pos (numpy.ndarray or None): Node positions for the network plot.
+        network_pos_final (bool): False while a better layout is computed in the background.
+        layout_version (int): Incremented whenever network_pos changes.
+        error (str or None): Message to show instead of the simulation (e.g. memory cap exceeded).
+        runner (background_runner.SimulationRunner or None): Background stepping thread, if any.
+            Process-local: it is not stored in a shared backend.
+        last_access (float): time.time() of the last request.
+        version (int): Version of the backend row this session was loaded from (0 if never stored).
+    """
+    def __init__(self):
+        self.simulation = None
+        self.simulation_id = 0
+        self.metrics_history = MetricsHistory()
+        self.network_pos = None
+        self.network_pos_final = False
+        self.layout_version = 0
+        self.error = None
+        self.runner = None
+        self.last_access = time.time()
+        self.version = 0
+
+    def reset(self, simulation):
+        """Replaces the simulation and clears everything derived from the old one."""
+        self.close()
+        self.simulation = simulation
+        self.simulation_id += 1
+        self.metrics_history = MetricsHistory()
+        self.network_pos = None
+        self.network_pos_final = False
+        self.error = None
+
+    def to_bytes(self):
+        """
+        Serializes the session as an .npz payload: the simulation checkpoint
+        (Simulation.save, including metrics history), the positions and a JSON
+        header. The runner is not included.
+        """
+        meta = {
+            'simulation_id': self.simulation_id,
+            'layout_version': self.layout_version,
+            'network_pos_final': self.network_pos_final,
+            'error': self.error,
+            'last_access': self.last_access,
+        }
+        arrays = {'meta': np.array(json.dumps(meta))}
+        if self.simulation is not None:
+            checkpoint = io.BytesIO()
+            with self.locked():
+                self.simulation.save(checkpoint, metrics_history=self.metrics_history)
+            arrays['checkpoint'] = np.frombuffer(checkpoint.getvalue(), dtype=np.uint8)
+        if self.network_pos is not None:
+            arrays['network_pos'] = self.network_pos
+        payload = io.BytesIO()
+        np.savez(payload, **arrays)
+        return payload.getvalue()
+
+    @classmethod
+    def from_bytes(cls, payload):
+        """Restores a session serialized by to_bytes()."""
+        session = cls()
+        with np.load(io.BytesIO(payload), allow_pickle=False) as data:
+            meta = json.loads(data['meta'].item())
+            session.simulation_id = meta['simulation_id']
+            session.layout_version = meta['layout_version']
+            session.network_pos_final = meta['network_pos_final']
+            session.error = meta['error']
+            session.last_access = meta['last_access']
+            if 'checkpoint' in data:
+                checkpoint = data['checkpoint'].tobytes()
+                session.simulation = Simulation.load(io.BytesIO(checkpoint))
+                history = Simulation.load_metrics_history(io.BytesIO(checkpoint))
+                if history is not None:
+                    session.metrics_history = history
+            if 'network_pos' in data:
+                session.network_pos = data['network_pos']
+        return session
+
+    def close(self):
+        """Stops the session's background runner and releases its simulation's engine resources."""
+        if self.runner is not None:
+            self.runner.stop()
+            self.runner = None
+        if self.simulation is not None:
+            self.simulation.close()
+
+    def locked(self):
+        """Context manager guarding the simulation and metrics_history against the runner thread."""
+        return self.runner.lock if self.runner is not None else nullcontext()
+
+    def memory_bytes(self):
+        """Estimated memory held by this session, in bytes."""
+        total = self.metrics_history.nbytes
+        if self.network_pos is not None:
+            total += self.network_pos.nbytes
+        sim = self.simulation
+        if sim is None:
+            return total
+
+        arrays = [sim.arrays.beliefs, sim.indptr, sim.indices, sim.group_index.codes]
+        if sim._edges is not None:
+            arrays.extend(sim._edges)
+        if sim.trust_store is not None:
+            arrays.extend(value for value in vars(sim.trust_store).values() if isinstance(value, np.ndarray))
+        if sim.engine is not None:
+            arrays.extend(value for value in vars(sim.engine).values() if isinstance(value, np.ndarray))
+        # Arrays shared between components are counted once
+        seen = {}
+        for array in arrays:
+            seen.setdefault(id(array), array.nbytes)
+        total += sum(seen.values())
+
+        total += len(sim.agents) * AGENT_VIEW_BYTES
+        if sim._network is not None and sim._edges is not None:
+            total += len(sim._edges[0]) * GRAPH_EDGE_BYTES
+        return total
+
+    def enforce_memory_cap(self, max_bytes):
+        """
+        Keeps the session under max_bytes by thinning metrics_history.
+
+        Every other recorded point is dropped (the first and latest are kept), so
+        the metrics plot keeps its shape at a coarser resolution.
+
+        Returns:
+            bool: False if the session is over the cap even without metrics history.
+        """
+        with self.locked():
+            while self.memory_bytes() > max_bytes and len(self.metrics_history) > 2:
+                self.metrics_history.thin() # In place: the runner appends to this history
+            return self.memory_bytes() <= max_bytes
+
+class SQLiteSessionBackend:
+    """
+    Stores sessions in a SQLite file so every gunicorn worker sees the same state.
+
+    Sessions are stored as SimulationSession.to_bytes() checkpoints (flat
+    arrays, no pickling); a worker loads the session at the start of a request
+    and saves it back at the end. Every row carries a version, and save() is a
+    compare-and-swap against the version the session was loaded with, so a
+    request working on a stale copy cannot overwrite a newer save (e.g. a
+    redraw racing the Setup button in another worker).
+    """
+    def __init__(self, path):
+        """
+        Args:
+            path (str): SQLite database file (created if missing).
+        """
+        self.path = path
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS session_checkpoints ("
+                "session_id TEXT PRIMARY KEY, payload BLOB NOT NULL, last_access REAL NOT NULL, "
+                "version INTEGER NOT NULL DEFAULT 0)"
+            )
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(session_checkpoints)")]
+            if 'version' not in columns: # Database created before versioning
+                conn.execute("ALTER TABLE session_checkpoints ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+
+    def _connect(self):
+        # One short-lived connection per call: safe across threads and processes
+        return sqlite3.connect(self.path, timeout=30)
+
+    def load(self, session_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT payload, version FROM session_checkpoints WHERE session_id = ?",
+                               (session_id,)).fetchone()
+        if not row:
+            return None
+        session = SimulationSession.from_bytes(row[0])
+        session.version = row[1]
+        return session
+
+    def save(self, session_id, session, overwrite=False):
+        """
+        Stores a session if nobody saved it since it was loaded.
+
+        Args:
+            overwrite (bool): Store it regardless of newer saves (e.g. a fresh setup).
+
+        Returns:
+            bool: True if stored; False if the stored row is newer (session.version is left unchanged).
+        """
+        payload = session.to_bytes()
+        with self._connect() as conn:
+            if overwrite:
+                row = conn.execute("SELECT version FROM session_checkpoints WHERE session_id = ?",
+                                   (session_id,)).fetchone()
+                version = (row[0] if row else 0) + 1
+                conn.execute(
+                    "INSERT OR REPLACE INTO session_checkpoints (session_id, payload, last_access, version) "
+                    "VALUES (?, ?, ?, ?)",
+                    (session_id, payload, session.last_access, version)
+                )
+            elif session.version == 0:
+                version = 1
+                inserted = conn.execute(
+                    "INSERT OR IGNORE INTO session_checkpoints (session_id, payload, last_access, version) "
+                    "VALUES (?, ?, ?, ?)",
+                    (session_id, payload, session.last_access, version)
+                ).rowcount
+                if not inserted:
+                    return False
+            else:
+                version = session.version + 1
+                updated = conn.execute(
+                    "UPDATE session_checkpoints SET payload = ?, last_access = ?, version = ? "
+                    "WHERE session_id = ? AND version = ?",
+                    (payload, session.last_access, version, session_id, session.version)
+                ).rowcount
+                if not updated:
+                    return False
+        session.version = version
+        return True
+
+    def delete(self, session_id):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM session_checkpoints WHERE session_id = ?", (session_id,))
+
+    def evict(self, max_sessions, ttl_seconds, now):
+        """Deletes sessions idle longer than ttl_seconds, then the least recently used beyond max_sessions."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM session_checkpoints WHERE last_access < ?", (now - ttl_seconds,))
+            conn.execute(
+                "DELETE FROM session_checkpoints WHERE session_id NOT IN "
+                "(SELECT session_id FROM session_checkpoints ORDER BY last_access DESC LIMIT ?)",
+                (max_sessions,)
+            )
+
+    def __len__(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM session_checkpoints").fetchone()[0]
+
+class SimulationRegistry:
+    """
+    Session-keyed store of SimulationSession objects for the Dash server.
+
+    Idle sessions are evicted after ttl_seconds, and the least recently used
+    ones once more than max_sessions exist. Each session is held under
+    max_session_bytes. Sessions live in this process unless a backend
+    (e.g. SQLiteSessionBackend) is given.
+    """
+    def __init__(self, max_sessions=32, ttl_seconds=3600, max_session_bytes=256 * 2**20, backend=None):
+        """
+        Args:
+            max_sessions (int): Sessions kept before the least recently used is evicted.
+            ttl_seconds (float): Idle time after which a session is evicted.
+            max_session_bytes (int): Estimated memory cap per session.
+            backend (SQLiteSessionBackend, optional): Shared store for multi-worker servers.
+        """
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_session_bytes = max_session_bytes
+        self.backend = backend
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """
+        Builds a registry configured by environment variables.
+
+        ECHO_CHAMBER_SESSION_DB (SQLite path, enables the shared backend),
+        ECHO_CHAMBER_MAX_SESSIONS, ECHO_CHAMBER_SESSION_TTL (seconds) and
+        ECHO_CHAMBER_SESSION_MB (per-session memory cap).
+        """
+        db_path = os.environ.get('ECHO_CHAMBER_SESSION_DB')
+        return cls(
+            max_sessions=int(os.environ.get('ECHO_CHAMBER_MAX_SESSIONS', 32)),
+            ttl_seconds=float(os.environ.get('ECHO_CHAMBER_SESSION_TTL', 3600)),
+            max_session_bytes=int(float(os.environ.get('ECHO_CHAMBER_SESSION_MB', 256)) * 2**20),
+            backend=SQLiteSessionBackend(db_path) if db_path else None
+        )
+
+    @staticmethod
+    def new_session_id():
+        """Returns a fresh random session id."""
+        return uuid.uuid4().hex
+
+    def get(self, session_id, create=False):
+        """
+        Returns the session for session_id.
+
+        Args:
+            session_id (str): Session id from the browser's dcc.Store.
+            create (bool): Create an empty session if none exists (or it was evicted).
+
+        Returns:
+            SimulationSession or None: None if the session does not exist and create is False.
+        """
+        if session_id is None:
+            return None
+        if self.backend is not None:
+            session = self.backend.load(session_id)
+        else:
+            with self._lock:
+                session = self._sessions.get(session_id)
+        if session is None and create:
+            session = SimulationSession()
+            if not self.save(session_id, session):
+                session = self.backend.load(session_id) # Another worker created it first
+        if session is not None:
+            session.last_access = time.time()
+        return session
+
+    def save(self, session_id, session, overwrite=False):
+        """
+        Stores a session after a request, enforcing the memory cap and evicting idle sessions.
+
+        A simulation that alone exceeds max_session_bytes is dropped and the
+        session's error message set instead.
+
+        Args:
+            overwrite (bool): With a backend, store the session even if another
+                request saved it since it was loaded (see SQLiteSessionBackend.save).
+
+        Returns:
+            bool: False if a backend rejected the save because the stored session is newer.
+        """
+        if not session.enforce_memory_cap(self.max_session_bytes):
+            session.error = (f"Simulation needs about {session.memory_bytes() / 2**20:.0f} MB, more than the "
+                             f"per-session limit of {self.max_session_bytes / 2**20:.0f} MB. "
+                             "Reduce the number of agents or connection probabilities.")
+            session.close()
+            session.simulation = None
+            session.metrics_history = MetricsHistory()
+            session.network_pos = None
+        session.last_access = time.time()
+
+        if self.backend is not None:
+            saved = self.backend.save(session_id, session, overwrite=overwrite)
+            self.backend.evict(self.max_sessions, self.ttl_seconds, session.last_access)
+            return saved
+        with self._lock:
+            self._sessions[session_id] = session
+            self._sessions.move_to_end(session_id)
+            self._evict_locked(session.last_access)
+        return True
+
+    def remove(self, session_id):
+        """Deletes a session."""
+        if self.backend is not None:
+            self.backend.delete(session_id)
+            return
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is not None:
+            session.close()
+
+    def _evict_locked(self, now):
+        expired = [sid for sid, session in self._sessions.items()
+                   if now - session.last_access > self.ttl_seconds]
+        for sid in expired:
+            self._sessions.pop(sid).close()
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)[1].close()
+
+    def __len__(self):
+        if self.backend is not None:
+            return len(self.backend)
+        with self._lock:
+            return len(self._sessions)
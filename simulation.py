@@ -1,11 +1,27 @@
+import json
 import random
 import networkx as nx
-from agent import Agent
-from network_utils import create_group_aware_network
-from models import receive_message_bubble, receive_message_chamber
+from agent import Agent, AgentArrays
+from network_utils import sample_group_aware_edges, edges_to_csr, edges_to_network
+from models import (receive_message_bubble, receive_message_chamber, receive_messages_bubble,
+                    receive_messages_chamber)
+from array_engine import ArrayEngine, deliver_messages
+from parallel_engine import ParallelEngine
+from groups import GroupIndex
+from metrics import MetricsAccumulator, MetricsHistory
+from trust import TrustStore
 import numpy as np # For metrics calculation
 # from scipy.stats import kurtosis # No longer needed
 
+# Steps between exact recomputations of the running metric sums
+METRICS_RESYNC_INTERVAL = 1000
+
+# Version of the Simulation.save checkpoint layout
+CHECKPOINT_FORMAT = 1
+
+# engine='auto' uses the array engine above this many agents
+AUTO_ARRAY_ENGINE_AGENTS = 1000
+
 class Simulation:
     """Manages the simulation state and execution."""
     def __init__(self, params):
@@ -26,39 +42,83 @@ class Simulation:
                 initial_trust_setup ('uniform_high', 'belief_based', for chamber)
                 step_delay (float)
                 initial_high_trust (float, for chamber belief_based setup)
+                dynamic_trust (bool, optional, for chamber): Let trust evolve; confirming
+                    accepted messages raise it by trust_reinforcement (default 0.05),
+                    discredited or disconfirming ones lower it by trust_decay (default 0.05).
+                engine ('object', 'array', 'parallel' or 'auto', optional): 'object'
+                    (default) steps Agent objects one message at a time; 'array' runs
+                    batched NumPy steps for large networks; 'parallel' runs the array
+                    step across worker processes (see parallel_engine); 'auto' picks
+                    'array' above AUTO_ARRAY_ENGINE_AGENTS agents and 'object' otherwise.
+                workers (int, optional): Worker processes of the parallel engine
+                    (default: CPU count).
+                update_mode ('async' or 'sync', optional): 'async' (object engine default)
+                    delivers messages one by one in shuffled order, so later senders see
+                    beliefs already changed in the same step. 'sync' (the array engine's
+                    only mode) reads all messages from the beliefs at the start of the
+                    step and applies them together, independent of agent order.
+                seed (int, optional): Seed for this simulation's random generators.
+                    Runs with the same params and seed are identical.
         """
         self.params = params
+        # Per-simulation random generators, so simulations never share random streams
+        seed = params.get('seed')
+        self.random = random.Random(seed) # Agent-by-agent draws (object engine, beliefs)
+        self.rng = np.random.default_rng(seed) # Array draws (network sampling, array engine)
         self.agents = {} # Dictionary {agent_id: Agent object}
-        self.network = None
+        self.arrays = None # AgentArrays shared by the Agent views and the engine
+        self.group_index = None # GroupIndex of the fixed agent groups
+        self.indptr = None # CSR adjacency: neighbors of i are indices[indptr[i]:indptr[i+1]]
+        self.indices = None
+        self._edges = None # (u, v) edge list the networkx graph is built from on demand
+        self._network = None
         self.receive_message_func = None
+        self.trust_store = None # TrustStore for the chamber model
+        self.engine = None # ArrayEngine (or ParallelEngine) unless params['engine'] == 'object'
+        self.update_mode = None # 'async' or 'sync'
+        self.receive_messages_func = None # Batched handler for object-engine sync steps
+        self.metrics_accumulator = None # Running per-group sums behind calculate_metrics
         self.time_step = 0
+        self.step_hooks = [] # Callables run after every step (see add_step_hook)
+        self.event_log = None # events.InteractionLog recording every message, if attached
 
         self._setup_simulation()
 
     def _setup_simulation(self):
         """Sets up the agents and network based on initial parameters."""
-        # Create Agents
+        # Draw initial beliefs
         agent_ids = list(range(self.params['num_agents']))
-        for agent_id in agent_ids:
-            initial_belief = self._get_initial_belief()
-            self.agents[agent_id] = Agent(agent_id, initial_belief)
+        initial_beliefs = np.array([self._get_initial_belief() for _ in agent_ids], dtype=np.float64)
 
-        # Create Network
-        self.network = create_group_aware_network(
-            self.agents,
+        # Groups are fixed from the initial beliefs, so index them once
+        self.group_index = GroupIndex(Agent.group_for_belief(belief) for belief in initial_beliefs.tolist())
+
+        # Create Network (edge list + CSR; the networkx graph is built lazily)
+        self._edges = sample_group_aware_edges(
+            self.group_index.codes,
             self.params['connection_probability_intra'],
-            self.params['connection_probability_inter']
+            self.params['connection_probability_inter'],
+            rng=self.rng
         )
+        self._network = None
+        self.indptr, self.indices = edges_to_csr(len(agent_ids), *self._edges)
+        self._build(initial_beliefs)
 
-        # Assign connections to Agents and initialize trust (if chamber)
-        for agent_id in self.agents:
-            agent = self.agents[agent_id]
-            neighbors = list(self.network.neighbors(agent_id))
-            agent.connections = set(neighbors)
+    def _build(self, beliefs, trust_store=None):
+        """
+        Creates everything derived from the beliefs, groups and adjacency: agent
+        views, trust, message handler, engine and metrics.
 
-            if self.params['model_type'] == 'chamber':
-                trust_scores = self._initialize_trust(agent, agent_ids)
-                agent.set_trust_scores(trust_scores)
+        Args:
+            beliefs (numpy.ndarray): Current belief of every agent.
+            trust_store (TrustStore, optional): Existing trust (e.g. from a checkpoint);
+                by default the chamber model initializes trust from the beliefs.
+        """
+        self.arrays = AgentArrays(beliefs, self.indptr, self.indices)
+
+        # Initialize trust (if chamber)
+        if self.params['model_type'] == 'chamber':
+            self.trust_store = trust_store if trust_store is not None else self._initialize_trust()
 
         # Select the correct message handling function
         if self.params['model_type'] == 'bubble':
@@ -68,88 +128,309 @@ class Simulation:
         else:
             raise ValueError(f"Unknown model type: {self.params['model_type']}")
 
+        # Select the stepping engine
+        engine_type = self.params.get('engine', 'object')
+        if engine_type == 'auto':
+            engine_type = 'array' if self.params['num_agents'] > AUTO_ARRAY_ENGINE_AGENTS else 'object'
+        if engine_type == 'array':
+            self.engine = ArrayEngine.from_arrays(self.arrays, self.group_index, self.params,
+                                                  trust_store=self.trust_store, rng=self.rng)
+        elif engine_type == 'parallel':
+            # Moves the beliefs and adjacency into shared memory, so views are created afterwards
+            self.engine = ParallelEngine.from_arrays(self.arrays, self.group_index, self.params,
+                                                     trust_store=self.trust_store, rng=self.rng)
+            self.indptr, self.indices = self.arrays.indptr, self.arrays.indices
+        elif engine_type != 'object':
+            raise ValueError(f"Unknown engine: {engine_type}")
+
+        # Create Agents as views over the shared arrays
+        labels = self.group_index.labels
+        for agent_id, code in enumerate(self.group_index.codes.tolist()):
+            self.agents[agent_id] = Agent.view(agent_id, self.arrays, labels[code], self.trust_store)
+
+        # Select the update mode
+        self.update_mode = self.params.get('update_mode', 'sync' if self.engine is not None else 'async')
+        if self.update_mode not in ('async', 'sync'):
+            raise ValueError(f"Unknown update mode: {self.update_mode}")
+        if self.engine is not None and self.update_mode != 'sync':
+            raise ValueError("The array engine only supports update_mode 'sync'.")
+        if self.update_mode == 'sync' and self.engine is None:
+            self.receive_messages_func = (receive_messages_chamber if self.params['model_type'] == 'chamber'
+                                          else receive_messages_bubble)
+
+        # Metrics are kept up to date incrementally from here on
+        self.metrics_accumulator = MetricsAccumulator(self._belief_array(), self.group_index.codes,
+                                                      self.group_index.labels)
+
+    def save(self, path, metrics_history=None):
+        """
+        Writes a checkpoint of the full simulation state to an .npz file.
+
+        Stored as flat arrays (beliefs, groups, CSR adjacency, edge list,
+        per-edge trust, running metric sums, optional metrics history) plus a
+        JSON header with params, time_step and both random generator states,
+        so Simulation.load resumes the run exactly.
+
+        Args:
+            path (str or file): Destination (np.savez adds '.npz' to names without it).
+            metrics_history (metrics.MetricsHistory or list, optional): History to store with the run.
+        """
+        random_state = self.random.getstate()
+        header = {
+            'format': CHECKPOINT_FORMAT,
+            'params': self.params,
+            'time_step': self.time_step,
+            'group_labels': list(self.group_index.labels),
+            'random_state': [random_state[0], list(random_state[1]), random_state[2]],
+            'rng_state': self.rng.bit_generator.state,
+        }
+        arrays = {
+            'beliefs': self.arrays.beliefs,
+            'group_codes': self.group_index.codes,
+            'indptr': self.indptr,
+            'indices': self.indices,
+            'edges_u': self._edges[0],
+            'edges_v': self._edges[1],
+            'metrics_shifts': self.metrics_accumulator.shifts,
+            'metrics_sums': self.metrics_accumulator.sums,
+            'metrics_sums_sq': self.metrics_accumulator.sums_sq,
+        }
+        if self.trust_store is not None:
+            header['trust'] = {
+                'setup_type': self.trust_store.setup_type,
+                'high_trust': self.trust_store.high_trust,
+                'outsider_trust': self.trust_store.outsider_trust,
+                'similarity_threshold': self.trust_store.similarity_threshold,
+            }
+            arrays['trust_initial_beliefs'] = self.trust_store.initial_beliefs
+            arrays['edge_trust'] = self.trust_store.edge_trust
+        if metrics_history is not None:
+            if not isinstance(metrics_history, MetricsHistory):
+                metrics_history = MetricsHistory(metrics_history)
+            header['metrics_fields'] = metrics_history.fields
+            for name, values in metrics_history.to_arrays().items():
+                arrays[f'history_{name}'] = values
+        np.savez(path, header=np.array(json.dumps(header)), **arrays)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Restores a simulation written by save().
+
+        Args:
+            path (str or file): The .npz checkpoint.
+
+        Returns:
+            Simulation: The simulation, ready to continue from its saved time step.
+        """
+        with np.load(path, allow_pickle=False) as data:
+            header = json.loads(data['header'].item())
+            if header.get('format') != CHECKPOINT_FORMAT:
+                raise ValueError(f"Unsupported checkpoint format: {header.get('format')}")
+
+            simulation = cls.__new__(cls)
+            simulation.params = header['params']
+            simulation.random = random.Random()
+            state = header['random_state']
+            simulation.random.setstate((state[0], tuple(state[1]), state[2]))
+            simulation.rng = np.random.default_rng()
+            simulation.rng.bit_generator.state = header['rng_state']
+            simulation.agents = {}
+            simulation.trust_store = None
+            simulation.engine = None
+            simulation.time_step = header['time_step']
+            simulation.step_hooks = []
+            simulation.event_log = None
+
+            codes = data['group_codes']
+            labels = header['group_labels']
+            simulation.group_index = GroupIndex((labels[code] for code in codes.tolist()), labels=labels)
+            simulation.indptr = data['indptr']
+            simulation.indices = data['indices']
+            simulation._edges = (data['edges_u'], data['edges_v'])
+            simulation._network = None
+
+            trust_store = None
+            if 'trust' in header:
+                trust = header['trust']
+                trust_store = TrustStore(
+                    data['trust_initial_beliefs'], simulation.indptr, simulation.indices,
+                    setup_type=trust['setup_type'], high_trust=trust['high_trust'],
+                    outsider_trust=trust['outsider_trust'],
+                    similarity_threshold=trust['similarity_threshold'],
+                    edge_trust=data['edge_trust']
+                )
+            simulation._build(np.array(data['beliefs'], dtype=np.float64), trust_store=trust_store)
+
+            # Continue the running sums exactly where the saved run left them
+            accumulator = simulation.metrics_accumulator
+            accumulator.shifts = np.array(data['metrics_shifts'])
+            accumulator.sums = np.array(data['metrics_sums'])
+            accumulator.sums_sq = np.array(data['metrics_sums_sq'])
+        return simulation
+
+    @staticmethod
+    def load_metrics_history(path):
+        """
+        Returns the metrics history stored in a checkpoint, or None if it has none.
+        """
+        with np.load(path, allow_pickle=False) as data:
+            header = json.loads(data['header'].item())
+            fields = header.get('metrics_fields')
+            if fields is None:
+                return None
+            return MetricsHistory.from_arrays({name: data[f'history_{name}'] for name in fields})
+
+    @property
+    def network(self):
+        """The networkx graph of agent connections, built on first access."""
+        if self._network is None and self._edges is not None:
+            self._network = edges_to_network(len(self.agents), *self._edges)
+        return self._network
+
     def _get_initial_belief(self):
         """Determines the initial belief for an agent based on distribution type."""
         dist_type = self.params.get('initial_belief_distribution', 'random')
         if dist_type == 'uniform':
             # Placeholder for uniform - let's use random for now
-            return random.random()
+            return self.random.random()
         elif dist_type == 'bimodal':
             # Simple bimodal: half near 0, half near 1
-            return random.choice([random.uniform(0, 0.2), random.uniform(0.8, 1.0)])
+            return self.random.choice([self.random.uniform(0, 0.2), self.random.uniform(0.8, 1.0)])
         elif dist_type == 'random':
-            return random.random() # Default: random between 0 and 1
+            return self.random.random() # Default: random between 0 and 1
         else:
             print(f"Warning: Unknown initial_belief_distribution '{dist_type}'. Using random.")
-            return random.random()
-
-    def _initialize_trust(self, agent, all_agent_ids):
-        """Initializes trust scores for an agent in the Echo Chamber model."""
-        setup_type = self.params.get('initial_trust_setup', 'uniform_high')
-        trust_scores = {}
-        default_trust = self.params.get('default_outsider_trust', 0.1)
-        # Get high trust value from params, defaulting if not present
-        high_trust_value = self.params.get('initial_high_trust', 0.9) # Use param
-
-        if setup_type == 'uniform_high':
-            # In uniform_high, *all* others get high trust initially
-            for other_id in all_agent_ids:
-                if other_id != agent.id:
-                    trust_scores[other_id] = high_trust_value 
-        elif setup_type == 'belief_based':
-             # Trust others more if their initial belief is similar
-             belief_similarity_threshold = 0.3 # Example threshold
-             for other_id in all_agent_ids:
-                 if other_id != agent.id:
-                     other_agent = self.agents[other_id]
-                     if abs(agent.belief_state - other_agent.belief_state) < belief_similarity_threshold:
-                         trust_scores[other_id] = high_trust_value
-                     else:
-                         trust_scores[other_id] = default_trust # Lower trust if belief differs
-        else:
-            print(f"Warning: Unknown initial_trust_setup '{setup_type}'. Using uniform_high.")
-            for other_id in all_agent_ids:
-                if other_id != agent.id:
-                    trust_scores[other_id] = high_trust_value
+            return self.random.random()
 
-        return trust_scores
+    def _initialize_trust(self):
+        """
+        Initializes trust for the Echo Chamber model.
+
+        Scores are stored only for actual connections; trust in any other agent
+        follows the initial_trust_setup rule and is evaluated when requested.
+        """
+        return TrustStore(
+            self.arrays.beliefs, self.indptr, self.indices,
+            setup_type=self.params.get('initial_trust_setup', 'uniform_high'),
+            high_trust=self.params.get('initial_high_trust', 0.9),
+            outsider_trust=self.params.get('default_outsider_trust', 0.1),
+            similarity_threshold=0.3 # Example threshold
+        )
 
     def simulation_step(self):
         """Executes one step of the simulation where each agent interacts."""
         if not self.agents:
             return # No agents to process
 
+        if self.engine is not None:
+            self.engine.step()
+            changed_ids, old_beliefs = self.engine.last_changes
+            self.metrics_accumulator.update(changed_ids, old_beliefs, self.engine.beliefs[changed_ids])
+            if self.event_log is not None:
+                self.event_log.record_batch(self.time_step + 1, *self.engine.last_messages)
+            self._finish_step()
+            return
+
+        if self.update_mode == 'sync':
+            self._sync_step()
+            self._finish_step()
+            return
+
         # --- Agent Interaction Logic (Modified) ---
         # Process agents in a random order to avoid bias
         agent_ids_to_process = list(self.agents.keys())
-        random.shuffle(agent_ids_to_process)
+        self.random.shuffle(agent_ids_to_process)
 
         interaction_count = 0
         for agent_id in agent_ids_to_process:
             acting_agent = self.agents[agent_id]
 
             # Check if interaction occurs based on chance (per agent)
-            if random.random() < self.params.get('interaction_chance', 0.5):
-                neighbors = list(acting_agent.connections)
-                if neighbors:
-                    # Choose a random neighbor to interact with
-                    recipient_agent_id = random.choice(neighbors)
+            if self.random.random() < self.params.get('interaction_chance', 0.5):
+                neighbors = self.arrays.neighbors(agent_id)
+                if len(neighbors) > 0:
+                    # Choose a random neighbor to interact with (same draw as random.choice)
+                    offset = self.random.randrange(len(neighbors))
+                    recipient_agent_id = int(neighbors[offset])
                     recipient_agent = self.agents[recipient_agent_id]
+                    edge = int(self.indptr[agent_id]) + offset # CSR position of the edge
 
                     # Message content is simply the sender's current belief state
                     message_content = acting_agent.belief_state
 
                     # Send the message (call the appropriate receive function)
-                    self.send_message(recipient_agent, message_content, acting_agent)
+                    old_belief = recipient_agent.belief_state
+                    accepted = self.send_message(recipient_agent, message_content, acting_agent, edge=edge)
+                    if self.event_log is not None:
+                        self.event_log.record(self.time_step + 1, agent_id, recipient_agent_id,
+                                              message_content, accepted)
+                    if recipient_agent.belief_state != old_belief:
+                        self.metrics_accumulator.update_one(recipient_agent_id, old_belief,
+                                                            recipient_agent.belief_state)
                     interaction_count += 1
 
-        self.time_step += 1
+        self._finish_step()
         # print(f"Step {self.time_step}: {interaction_count} interactions occurred.") # Optional debug print
 
-    def send_message(self, recipient_agent, message_content, sender_agent):
+    def _sync_step(self):
+        """
+        One synchronous (Jacobi) step of the object engine.
+
+        Agents draw whether and to whom to send exactly as in async mode; the
+        messages are then delivered together by array_engine.deliver_messages,
+        the same rule the array engine applies, so the result does not depend
+        on agent order.
+        """
+        interaction_chance = self.params.get('interaction_chance', 0.5)
+        degree = np.diff(self.indptr)
+        senders, edges = [], []
+        for agent_id, agent_degree in enumerate(degree.tolist()):
+            if self.random.random() < interaction_chance and agent_degree > 0:
+                senders.append(agent_id)
+                edges.append(int(self.indptr[agent_id]) + self.random.randrange(agent_degree))
+        (touched, old_beliefs), messages = deliver_messages(
+            self.arrays.beliefs, self.indices, np.array(senders, dtype=np.int64),
+            np.array(edges, dtype=np.int64), self.params, self.receive_messages_func, self.trust_store
+        )
+        self.metrics_accumulator.update(touched, old_beliefs, self.arrays.beliefs[touched])
+        if self.event_log is not None:
+            self.event_log.record_batch(self.time_step + 1, *messages)
+
+    def close(self):
+        """Releases engine resources (the parallel engine's worker processes and shared memory)."""
+        if self.engine is not None:
+            self.engine.close()
+
+    def _finish_step(self):
+        """Advances the step counter, periodically resyncs the running metrics and runs the step hooks."""
+        self.time_step += 1
+        if self.time_step % METRICS_RESYNC_INTERVAL == 0:
+            self.metrics_accumulator.resync(self._belief_array())
+        for hook in self.step_hooks:
+            hook(self)
+
+    def add_step_hook(self, hook):
+        """
+        Registers hook(simulation) to run after every step (e.g. recorder.TrajectoryRecorder).
+        """
+        self.step_hooks.append(hook)
+
+    def remove_step_hook(self, hook):
+        """Unregisters a hook added with add_step_hook."""
+        self.step_hooks.remove(hook)
+
+    def send_message(self, recipient_agent, message_content, sender_agent, edge=None):
         """
         Handles the delivery of a message using the model-specific logic.
         Passes necessary simulation parameters to the handling function.
+
+        Args:
+            edge (int, optional): CSR position of the sender -> recipient edge; lets the
+                chamber model read the cached acceptance mask instead of looking up trust.
+
+        Returns:
+            bool: Whether the recipient accepted the message.
         """
         if self.receive_message_func:
             # Pass relevant parameters from self.params using **kwargs
@@ -160,12 +441,105 @@ class Simulation:
                 'trust_threshold': self.params.get('trust_threshold', 0.5),
                 'default_outsider_trust': self.params.get('default_outsider_trust', 0.1)
             }
-            self.receive_message_func(
+            if edge is not None and self.trust_store is not None and not recipient_agent.has_trust_scores():
+                mask = self.trust_store.acceptance_mask(handler_params['trust_threshold'])
+                handler_params['sender_trusted'] = bool(mask[edge])
+            if self.trust_store is not None and self.params.get('dynamic_trust', False):
+                handler_params['dynamic_trust'] = True
+                handler_params['trust_reinforcement'] = self.params.get('trust_reinforcement', 0.05)
+                handler_params['trust_decay'] = self.params.get('trust_decay', 0.05)
+                if edge is not None:
+                    handler_params['trust_edge'] = int(self.trust_store.reverse_edges[edge])
+            return self.receive_message_func(
                 recipient_agent, message_content, sender_agent, **handler_params
             )
+        return False
+
+    def run(self, max_steps, tol=1e-4, window=50, callback=None):
+        """
+        Steps the simulation without rendering until beliefs settle.
+
+        The run stops early once every group's average and standard deviation
+        (from calculate_metrics) has moved by less than tol across the last
+        window steps.
+
+        Args:
+            max_steps (int): Maximum number of steps to run.
+            tol (float or None): Convergence tolerance. None disables early stopping.
+            window (int): Number of consecutive steps the metrics must stay within tol.
+            callback (callable, optional): Called as callback(metrics) after every step,
+                with metrics['time_step'] set (e.g. to stream metrics to disk).
+
+        Returns:
+            dict: 'steps_run', 'converged', 'convergence_step' (time step at which
+                convergence was detected, or None) and the final 'metrics'.
+        """
+        window = max(1, int(window))
+        keys = [f'group_{label}_{stat}' for label in self.group_index.labels for stat in ('avg', 'std')]
+        recent = np.empty((window + 1, len(keys))) # Ring buffer of the last window + 1 values
+        filled = 0
+
+        metrics = self.calculate_metrics()
+        metrics['time_step'] = self.time_step
+        converged = False
+        convergence_step = None
+        steps_run = 0
+        while steps_run < max_steps:
+            self.simulation_step()
+            steps_run += 1
+            metrics = self.calculate_metrics()
+            metrics['time_step'] = self.time_step
+            if callback is not None:
+                callback(metrics)
+
+            if tol is None:
+                continue
+            # Empty groups report None; they never change, so count them as 0
+            recent[filled % (window + 1)] = [metrics[key] if metrics[key] is not None else 0.0 for key in keys]
+            filled += 1
+            if filled > window and np.all(np.ptp(recent, axis=0) < tol):
+                converged = True
+                convergence_step = self.time_step
+                break
+
+        return {
+            'steps_run': steps_run,
+            'converged': converged,
+            'convergence_step': convergence_step,
+            'metrics': metrics,
+        }
+
+    def advance(self, num_steps, sample_every=1):
+        """
+        Advances the simulation several steps between renders (fast-forward).
+
+        Args:
+            num_steps (int): Number of steps to run.
+            sample_every (int): Record metrics only for time steps divisible by this.
+
+        Returns:
+            list: Metric dicts (with 'time_step') of the sampled steps; the final
+                step is always included.
+        """
+        sample_every = max(1, int(sample_every))
+        samples = []
+
+        def record(metrics):
+            if metrics['time_step'] % sample_every == 0:
+                samples.append(metrics)
+
+        result = self.run(num_steps, tol=None, callback=record)
+        if result['steps_run'] and (not samples or samples[-1]['time_step'] != self.time_step):
+            samples.append(result['metrics'])
+        return samples
 
     def calculate_metrics(self):
-        """Calculates metrics about the current simulation state, using fixed agent groups."""
+        """
+        Calculates metrics about the current simulation state, using fixed agent groups.
+
+        Served from running per-group sums that each step updates only for the
+        agents whose belief changed.
+        """
         if not self.agents:
             return {
                 'avg_belief': None, 'std_dev_belief': None,
@@ -173,35 +547,19 @@ class Simulation:
                 'group_B_count': 0, 'group_B_avg': None, 'group_B_std': None,
             }
 
-        # Separate agents by their fixed group attribute
-        group_A_agents = [agent for agent in self.agents.values() if agent.group == 'A']
-        group_B_agents = [agent for agent in self.agents.values() if agent.group == 'B']
-
-        # Extract beliefs for calculation
-        all_beliefs = np.array([agent.belief_state for agent in self.agents.values()])
-        group_A_beliefs = np.array([agent.belief_state for agent in group_A_agents])
-        group_B_beliefs = np.array([agent.belief_state for agent in group_B_agents])
-
-        metrics = {
-            'avg_belief': np.mean(all_beliefs) if all_beliefs.size > 0 else None,
-            'std_dev_belief': np.std(all_beliefs) if all_beliefs.size > 0 else None,
-            
-            'group_A_count': len(group_A_agents),
-            'group_A_avg': np.mean(group_A_beliefs) if group_A_beliefs.size > 0 else None,
-            'group_A_std': np.std(group_A_beliefs) if group_A_beliefs.size > 1 else 0,
-
-            'group_B_count': len(group_B_agents),
-            'group_B_avg': np.mean(group_B_beliefs) if group_B_beliefs.size > 0 else None,
-            'group_B_std': np.std(group_B_beliefs) if group_B_beliefs.size > 1 else 0,
-        }
-        
-        return metrics
+        return self.metrics_accumulator.metrics()
+
+    def _belief_array(self):
+        """Returns the current beliefs of all agents as an array, ordered by agent id."""
+        return self.arrays.beliefs
 
     def get_simulation_state(self):
          """Returns the current state needed for visualization."""
          return {
              'agents': self.agents,
-             'network': self.network,
+             'group_index': self.group_index,
+             'beliefs': self.arrays.beliefs,
+             'edges': self._edges,
              'time_step': self.time_step,
              'model_type': self.params.get('model_type')
          } 
\ No newline at end of file
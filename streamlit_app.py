@@ -1,5 +1,4 @@
 import streamlit as st
-import networkx as nx
 # No longer need plotly imports here if figs come from visualization.py
 # import plotly.graph_objects as go 
 # import plotly.express as px 
@@ -8,8 +7,16 @@ import copy
 import pandas as pd
 
 from simulation import Simulation
+from network_utils import AGENT_COUNT_OPTIONS, network_size_error
 # Import visualization functions
-from visualization import visualize_network, plot_metrics 
+from visualization import visualize_network, update_network_figure, plot_metrics
+from layout_service import LayoutService
+from metrics import MetricsHistory
+
+@st.cache_resource
+def get_layout_service():
+    """One layout cache and background worker shared by all sessions."""
+    return LayoutService()
 
 # --- Visualization Function Definitions Removed ---
 # (visualize_network and plot_metrics moved to visualization.py)
@@ -29,13 +36,15 @@ if 'simulation_instance' not in st.session_state:
     st.session_state.simulation_instance = None
 if 'running' not in st.session_state:
     st.session_state.running = False
-if 'layout' not in st.session_state:
+if 'pos' not in st.session_state:
     st.session_state.pos = None
+if 'pos_final' not in st.session_state:
+    st.session_state.pos_final = False # False while the background layout is still computing
 if 'layout_params_changed' not in st.session_state:
     st.session_state.layout_params_changed = True # Initially true to compute layout
 # Add session state for metrics history
 if 'metrics_history' not in st.session_state:
-    st.session_state.metrics_history = []
+    st.session_state.metrics_history = MetricsHistory()
 
 # --- Model Selection ---
 # ... (remains the same) ...
@@ -48,10 +57,18 @@ model_type = st.sidebar.radio(
 
 # --- Core Parameters (Updated Network Params) ---
 # ... (remains the same) ...
-num_agents = st.sidebar.slider("Number of Agents", 10, 200, 50, key='num_agents_slider')
+num_agents = st.sidebar.select_slider("Number of Agents", AGENT_COUNT_OPTIONS, 50, key='num_agents_slider')
+engine = st.sidebar.selectbox(
+    "Engine",
+    ('auto', 'object', 'array'),
+    format_func=lambda name: {'auto': 'Automatic (array above 1,000 agents)',
+                              'object': 'Object (agent by agent)',
+                              'array': 'Array (batched, for large networks)'}[name],
+    key='engine_select'
+)
 st.sidebar.markdown("--- Network Connectivity ---")
-connection_probability_intra = st.sidebar.slider("Intra-Group Connection Prob (p_intra)", 0.0, 1.0, 0.3, 0.01, key='p_intra_slider')
-connection_probability_inter = st.sidebar.slider("Inter-Group Connection Prob (p_inter)", 0.0, 1.0, 0.05, 0.01, key='p_inter_slider')
+connection_probability_intra = st.sidebar.slider("Intra-Group Connection Prob (p_intra)", 0.0, 1.0, 0.3, 0.001, format="%.3f", key='p_intra_slider')
+connection_probability_inter = st.sidebar.slider("Inter-Group Connection Prob (p_inter)", 0.0, 1.0, 0.05, 0.001, format="%.3f", key='p_inter_slider')
 
 initial_belief_distribution = st.sidebar.selectbox(
     "Initial Belief Distribution",
@@ -70,6 +87,27 @@ step_delay = st.sidebar.slider(
     help="Pause between simulation steps for visualization.",
     key='step_delay_slider'
 )
+steps_per_frame = st.sidebar.slider(
+    "Steps per Frame (fast-forward)",
+    1, 500, 1,
+    help="Simulation steps to run between redraws. Higher values make long runs much faster.",
+    key='steps_per_frame_slider'
+)
+metrics_sample_rate = st.sidebar.slider(
+    "Record Metrics Every N Steps",
+    1, 100, 1,
+    help="How often to store metrics for the plot while fast-forwarding.",
+    key='metrics_sample_slider'
+)
+edge_mode = st.sidebar.selectbox(
+    "Edge Display",
+    ('all', 'inter', 'intra', 'sample', 'none'),
+    format_func=lambda x: {'all': 'All Edges', 'inter': 'Inter-Group Edges Only',
+                           'intra': 'Intra-Group Edges Only', 'sample': 'Sampled Edges (10%)',
+                           'none': 'Hide Edges'}[x],
+    help="Large networks render faster with fewer edges. Networks above 1,000 agents use WebGL.",
+    key='edge_mode_select'
+)
 
 # --- Echo Chamber Specific Parameters (Conditional) ---
 # ... (remains the same) ...
@@ -77,6 +115,9 @@ default_outsider_trust = 0.1 # Define defaults here
 trust_threshold = 0.5
 initial_trust_setup = 'belief_based'
 initial_high_trust = 0.9 # Define default value BEFORE the if block
+dynamic_trust = False
+trust_reinforcement = 0.05
+trust_decay = 0.05
 
 if model_type == 'chamber':
     st.sidebar.markdown("--- Echo Chamber Settings ---")
@@ -91,6 +132,14 @@ if model_type == 'chamber':
         help="'belief_based': Trust agents with similar initial beliefs more. 'uniform_high': Initially trust everyone highly.",
         key='initial_trust_select'
     )
+    dynamic_trust = st.sidebar.checkbox(
+        "Dynamic Trust", value=False,
+        help="Confirming messages from trusted agents raise trust; discredited or disconfirming messages lower it.",
+        key='dynamic_trust_checkbox'
+    )
+    if dynamic_trust:
+        trust_reinforcement = st.sidebar.slider("Trust Reinforcement", 0.0, 0.2, 0.05, 0.01, key='trust_reinforcement_slider')
+        trust_decay = st.sidebar.slider("Trust Decay", 0.0, 0.2, 0.05, 0.01, key='trust_decay_slider')
 
 # Store parameters in a dictionary (Updated)
 # ... (remains the same) ...
@@ -100,13 +149,19 @@ params = {
     'connection_probability_intra': connection_probability_intra, # Added
     'connection_probability_inter': connection_probability_inter, # Added
     'initial_belief_distribution': initial_belief_distribution,
+    'engine': engine,
     'belief_update_step_size': belief_update_step_size,
     'interaction_chance': interaction_chance,
     'step_delay': step_delay,
+    'steps_per_frame': steps_per_frame,
+    'metrics_sample_rate': metrics_sample_rate,
     'trust_threshold': trust_threshold,
     'default_outsider_trust': default_outsider_trust,
     'initial_high_trust': initial_high_trust,
-    'initial_trust_setup': initial_trust_setup
+    'initial_trust_setup': initial_trust_setup,
+    'dynamic_trust': dynamic_trust,
+    'trust_reinforcement': trust_reinforcement,
+    'trust_decay': trust_decay
 }
 
 # --- Define Control Buttons FIRST ---
@@ -116,36 +171,40 @@ control_cols = st.columns(3)
 
 with control_cols[0]:
     if st.button("Setup / Reset Simulation", key='setup_button'):
-        # Indicate that layout needs recalculation if N or connection prob changes
-        if st.session_state.simulation_instance:
-            old_params = st.session_state.simulation_instance.params
-            # Check against new parameters for layout change
-            if old_params['num_agents'] != num_agents or \
-               old_params.get('connection_probability_intra', -1) != connection_probability_intra or \
-               old_params.get('connection_probability_inter', -1) != connection_probability_inter:
-                st.session_state.layout_params_changed = True
-            # Also recalculate layout if structure params change
-            st.session_state.pos = None # Force layout recalculation
+        size_error = network_size_error(num_agents, connection_probability_intra, connection_probability_inter)
+        if size_error:
+            st.error(size_error)
         else:
-             st.session_state.layout_params_changed = True # First setup
-             st.session_state.pos = None # Ensure layout calculated on first setup
+            # Indicate that layout needs recalculation if N or connection prob changes
+            if st.session_state.simulation_instance:
+                old_params = st.session_state.simulation_instance.params
+                # Check against new parameters for layout change
+                if old_params['num_agents'] != num_agents or \
+                   old_params.get('connection_probability_intra', -1) != connection_probability_intra or \
+                   old_params.get('connection_probability_inter', -1) != connection_probability_inter:
+                    st.session_state.layout_params_changed = True
+                # Also recalculate layout if structure params change
+                st.session_state.pos = None # Force layout recalculation
+            else:
+                 st.session_state.layout_params_changed = True # First setup
+                 st.session_state.pos = None # Ensure layout calculated on first setup
 
-        st.session_state.simulation_instance = Simulation(copy.deepcopy(params))
-        st.session_state.running = False
-        st.session_state.metrics_history = [] # Reset metrics history
-        st.success("Simulation Initialized/Reset!")
+            st.session_state.simulation_instance = Simulation(copy.deepcopy(params))
+            st.session_state.running = False
+            st.session_state.metrics_history = MetricsHistory() # Reset metrics history
+            st.success("Simulation Initialized/Reset!")
 
-        # Calculate initial metrics (but don't display text here yet)
-        sim_state = st.session_state.simulation_instance.get_simulation_state()
-        # Calculate positions for the first draw
-        if st.session_state.pos is None and sim_state['network']:
-             st.session_state.pos = nx.spring_layout(sim_state['network'], seed=42)
-             st.session_state.layout_params_changed = False
+            # Calculate initial metrics (but don't display text here yet)
+            sim_state = st.session_state.simulation_instance.get_simulation_state()
+            # Cached or placeholder positions for the first draw; spring layout finishes in the background
+            st.session_state.pos, st.session_state.pos_final = get_layout_service().layout_for(
+                st.session_state.simulation_instance)
+            st.session_state.layout_params_changed = False
 
-        current_metrics = st.session_state.simulation_instance.calculate_metrics()
-        current_metrics['time_step'] = sim_state['time_step']
-        st.session_state.metrics_history.append(current_metrics)
-        # Display text will happen in the main loop display section
+            current_metrics = st.session_state.simulation_instance.calculate_metrics()
+            current_metrics['time_step'] = sim_state['time_step']
+            st.session_state.metrics_history.append(current_metrics)
+            # Display text will happen in the main loop display section
 
 with control_cols[1]:
     if st.button("Start / Resume", key='start_button'):
@@ -183,15 +242,14 @@ if st.session_state.simulation_instance:
     # Logic to determine the state to display *before* drawing
     if st.session_state.running:
         try:
-            # Run step and update state
-            sim.simulation_step()
+            # Run steps (fast-forward) and update state; only the final state is drawn
+            new_metrics = sim.advance(steps_per_frame, sample_every=metrics_sample_rate)
             sim_state = sim.get_simulation_state()
 
-            # Calculate and store metrics for the *new* state
-            current_metrics = sim.calculate_metrics()
-            current_metrics['time_step'] = sim_state['time_step']
-            if not st.session_state.metrics_history or st.session_state.metrics_history[-1]['time_step'] != current_metrics['time_step']:
-                st.session_state.metrics_history.append(current_metrics)
+            # Store the sampled metrics
+            for current_metrics in new_metrics:
+                if not st.session_state.metrics_history or st.session_state.metrics_history[-1]['time_step'] != current_metrics['time_step']:
+                    st.session_state.metrics_history.append(current_metrics)
 
             # Schedule a rerun for the next step
             needs_rerun = True
@@ -205,13 +263,24 @@ if st.session_state.simulation_instance:
 
     # --- Drawing happens once per script run, *after* state is determined ---
     if sim_state:
-        # Ensure layout exists for visualization function
-        if st.session_state.pos is None and sim_state['network']:
-             st.session_state.pos = nx.spring_layout(sim_state['network'], seed=42)
-             st.session_state.layout_params_changed = False # Should be false now
-
-        # Visualize Network based on the determined state using imported function
-        network_fig = visualize_network(sim_state, st.session_state.pos) 
+        # Pick up the background layout once it is ready (forces a full redraw)
+        if st.session_state.pos is None or not st.session_state.pos_final:
+            positions, st.session_state.pos_final = get_layout_service().layout_for(sim)
+            if st.session_state.pos is None or st.session_state.pos_final:
+                # First positions, or the final layout replacing the placeholder
+                st.session_state.pos = positions
+                st.session_state.network_fig = None
+            st.session_state.layout_params_changed = False # Should be false now
+
+        # Visualize Network: build the figure once per simulation, then only update node colors
+        if (st.session_state.get('network_fig_simulation') is sim and st.session_state.get('network_fig') is not None
+                and st.session_state.get('network_fig_edge_mode') == edge_mode):
+            network_fig = update_network_figure(st.session_state.network_fig, sim_state)
+        else:
+            network_fig = visualize_network(sim_state, st.session_state.pos, edge_mode=edge_mode)
+            st.session_state.network_fig = network_fig
+            st.session_state.network_fig_simulation = sim
+            st.session_state.network_fig_edge_mode = edge_mode
         if network_fig:
             vis_placeholder.plotly_chart(network_fig, use_container_width=True, key="network_plot")
         else:
@@ -249,6 +318,10 @@ Group B (Initial >=0.5): {last_metrics['group_B_count']} agents
         sleep_duration = sim.params.get('step_delay', 0.1)
         time.sleep(sleep_duration)
         st.rerun()
+    elif not st.session_state.pos_final:
+        # Paused, but the layout is still computing: poll until it can be drawn
+        time.sleep(0.5)
+        st.rerun()
 
 else:
     # Initial message when no simulation is set up
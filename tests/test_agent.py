@@ -0,0 +1,57 @@
+import pytest
+
+from agent import Agent
+from simulation import Simulation
+
+def make_simulation(model_type='chamber', **overrides):
+    params = {
+        'model_type': model_type,
+        'num_agents': 60,
+        'connection_probability_intra': 0.2,
+        'connection_probability_inter': 0.05,
+        'initial_belief_distribution': 'bimodal',
+        'seed': 1,
+    }
+    params.update(overrides)
+    return Simulation(params)
+
+def test_standalone_agent_keeps_mutable_collections():
+    agent = Agent(1, 0.3, connections=[2])
+    agent.add_connection(3)
+    agent.trust_scores[2] = 0.7
+    assert agent.connections == {2, 3}
+    assert agent.get_trust_score(2) == 0.7
+    assert agent.average_trust() == 0.7
+
+def test_view_agent_reads_shared_storage():
+    simulation = make_simulation()
+    agent = simulation.agents[0]
+    assert agent.connections == frozenset(simulation.arrays.neighbors(0).tolist())
+
+    agent.belief_state = 0.25
+    assert simulation.arrays.beliefs[0] == 0.25
+    assert not agent.has_trust_scores()
+
+def test_view_agent_connections_cannot_change():
+    simulation = make_simulation()
+    agent = simulation.agents[0]
+    with pytest.raises(ValueError):
+        agent.add_connection(5)
+    with pytest.raises(ValueError):
+        agent.connections = [1, 2]
+    # The network is untouched, so stepping still works
+    simulation.run(3, tol=None)
+    assert simulation.time_step == 3
+
+def test_shared_adjacency_is_read_only():
+    simulation = make_simulation(model_type='bubble', engine='array')
+    with pytest.raises(ValueError):
+        simulation.arrays.neighbors(0)[:] = 0
+
+def test_explicit_trust_overrides_trust_store():
+    simulation = make_simulation(initial_trust_setup='belief_based')
+    agent = simulation.agents[0]
+    other = int(simulation.arrays.neighbors(0)[0])
+    agent.trust_scores = {other: 0.42}
+    assert agent.get_trust_score(other) == 0.42
+    assert agent.has_trust_scores()
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from simulation import Simulation
+from test_simulation import make_params
+
+def step_with_snapshot(simulation):
+    before = simulation.arrays.beliefs.copy()
+    simulation.simulation_step()
+    return before
+
+def test_array_engine_is_reproducible():
+    first = Simulation(make_params('chamber', 'array'))
+    second = Simulation(make_params('chamber', 'array'))
+    first.run(25, tol=None)
+    second.run(25, tol=None)
+    np.testing.assert_array_equal(first.arrays.beliefs, second.arrays.beliefs)
+
+@pytest.mark.parametrize('model_type', ['bubble', 'chamber'])
+def test_array_engine_step_records(model_type):
+    simulation = Simulation(make_params(model_type, 'array'))
+    engine = simulation.engine
+    mask = engine.trust_store.acceptance_mask(0.5).copy() if model_type == 'chamber' else None
+    before = step_with_snapshot(simulation)
+
+    senders, recipients, contents, accepted = engine.last_messages
+    assert senders.size > 0
+    # Each sender sends at most once, to one of its neighbors, with its start-of-step belief
+    assert np.unique(senders).size == senders.size
+    for sender, recipient in zip(senders.tolist(), recipients.tolist()):
+        assert recipient in simulation.arrays.neighbors(sender)
+    np.testing.assert_array_equal(contents, before[senders])
+
+    if model_type == 'bubble':
+        assert accepted.all()
+    else:
+        edges = [simulation.indptr[s] + np.searchsorted(simulation.arrays.neighbors(s), r)
+                 for s, r in zip(senders.tolist(), recipients.tolist())]
+        np.testing.assert_array_equal(accepted, mask[edges])
+
+    # last_changes lists every recipient with its belief before the step
+    touched, old_beliefs = engine.last_changes
+    np.testing.assert_array_equal(touched, np.unique(recipients))
+    np.testing.assert_array_equal(old_beliefs, before[touched])
+    unchanged = np.setdiff1d(np.arange(before.size), touched)
+    np.testing.assert_array_equal(simulation.arrays.beliefs[unchanged], before[unchanged])
+
+def test_unknown_engine_is_rejected():
+    with pytest.raises(ValueError):
+        Simulation(make_params(engine='gpu'))
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from events import EVENT_DTYPE, InteractionLog, load_events, summarize_events
+from models import update_belief_simple
+from simulation import Simulation
+from test_simulation import make_params
+
+# --- Interaction event log ---
+
+def test_async_log_replays_to_final_beliefs(tmp_path):
+    path = str(tmp_path / 'events.npy')
+    simulation = Simulation(make_params('chamber', 'object'))
+    beliefs = simulation.arrays.beliefs.copy()
+    with InteractionLog(path, buffer_size=16).attach(simulation):
+        simulation.run(10, tol=None)
+    events = load_events(path)
+
+    assert events.size > 0
+    np.testing.assert_array_equal(np.unique(events['step']), np.arange(1, 11))
+    # Messages are applied one at a time, so replaying the accepted ones in order
+    # reproduces the run; every message carries its sender's belief at send time
+    for event in events:
+        assert event['content'] == beliefs[event['sender']]
+        if event['accepted']:
+            beliefs[event['recipient']] = update_belief_simple(beliefs[event['recipient']], event['content'], 0.05)
+    np.testing.assert_array_equal(beliefs, simulation.arrays.beliefs)
+
+@pytest.mark.parametrize('model_type', ['bubble', 'chamber'])
+def test_array_log_matches_engine_messages(tmp_path, model_type):
+    path = str(tmp_path / 'events.npy')
+    simulation = Simulation(make_params(model_type, 'array'))
+    logged = []
+    with InteractionLog(path).attach(simulation):
+        for _ in range(5):
+            before = simulation.arrays.beliefs.copy()
+            simulation.simulation_step()
+            senders, recipients, contents, accepted = simulation.engine.last_messages
+            np.testing.assert_array_equal(contents, before[senders])
+            logged.append((senders, recipients, accepted))
+    events = load_events(path)
+
+    np.testing.assert_array_equal(events['sender'], np.concatenate([s for s, _, _ in logged]))
+    np.testing.assert_array_equal(events['recipient'], np.concatenate([r for _, r, _ in logged]))
+    np.testing.assert_array_equal(events['accepted'], np.concatenate([a for _, _, a in logged]))
+    np.testing.assert_array_equal(np.bincount(events['step'])[1:], [s.size for s, _, _ in logged])
+    if model_type == 'bubble':
+        assert events['accepted'].all()
+
+def test_summarize_events():
+    events = np.zeros(5, dtype=EVENT_DTYPE)
+    events['sender'] = [0, 0, 1, 2, 3]
+    events['recipient'] = [1, 2, 0, 3, 2]
+    events['accepted'] = [True, False, True, False, True]
+    summary = summarize_events(events, group_codes=np.array([0, 0, 1, 1]))
+
+    assert summary['messages'] == 5
+    assert summary['accepted'] == 3
+    assert summary['discredited_fraction'] == pytest.approx(0.4)
+    assert summary['intra_group'] == {'messages': 4, 'accepted': 3, 'discredited': 1, 'discredited_fraction': 0.25}
+    assert summary['inter_group']['messages'] == 1
+    assert summary['inter_group']['discredited'] == 1
+    assert summarize_events(events[:0])['discredited_fraction'] is None
+
+def test_closed_log_detaches(tmp_path):
+    path = str(tmp_path / 'events.npy')
+    simulation = Simulation(make_params('bubble', 'array'))
+    log = InteractionLog(path).attach(simulation)
+    simulation.run(2, tol=None)
+    log.close()
+    assert simulation.event_log is None
+    count = load_events(path).size
+    simulation.run(2, tol=None)
+    assert load_events(path).size == count
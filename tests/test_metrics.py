@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+from metrics import MetricsAccumulator, MetricsHistory
+from simulation import Simulation
+from test_simulation import assert_metrics_match_beliefs, make_params
+
+# --- MetricsAccumulator ---
+
+def recomputed_metrics(beliefs, codes, labels=('A', 'B')):
+    metrics = {'avg_belief': beliefs.mean(), 'std_dev_belief': beliefs.std()}
+    for code, label in enumerate(labels):
+        members = beliefs[codes == code]
+        metrics[f'group_{label}_count'] = members.size
+        metrics[f'group_{label}_avg'] = members.mean() if members.size else None
+        metrics[f'group_{label}_std'] = members.std() if members.size > 1 else 0
+    return metrics
+
+def assert_metrics_close(actual, expected):
+    assert actual.keys() == expected.keys()
+    for key, value in expected.items():
+        if value is None:
+            assert actual[key] is None
+        else:
+            assert actual[key] == pytest.approx(value, abs=1e-9), key
+
+def test_accumulator_tracks_batched_and_single_changes():
+    rng = np.random.default_rng(0)
+    beliefs = rng.random(1000)
+    codes = np.repeat([0, 1], 500)
+    accumulator = MetricsAccumulator(beliefs, codes)
+    assert_metrics_close(accumulator.metrics(), recomputed_metrics(beliefs, codes))
+
+    for _ in range(500):
+        agent_ids = rng.choice(beliefs.size, size=50, replace=False)
+        old = beliefs[agent_ids].copy()
+        beliefs[agent_ids] = np.clip(old + rng.normal(0, 0.05, agent_ids.size), 0, 1)
+        accumulator.update(agent_ids, old, beliefs[agent_ids])
+
+        agent_id = int(rng.integers(beliefs.size))
+        old_belief = beliefs[agent_id]
+        beliefs[agent_id] = rng.random()
+        accumulator.update_one(agent_id, old_belief, beliefs[agent_id])
+    assert_metrics_close(accumulator.metrics(), recomputed_metrics(beliefs, codes))
+
+    accumulator.resync(beliefs)
+    assert_metrics_close(accumulator.metrics(), recomputed_metrics(beliefs, codes))
+
+def test_accumulator_handles_empty_and_single_member_groups():
+    beliefs = np.array([0.2, 0.4, 0.9])
+    codes = np.array([0, 0, 1])
+    metrics = MetricsAccumulator(beliefs, codes, group_labels=('A', 'B', 'C')).metrics()
+    assert_metrics_close(metrics, recomputed_metrics(beliefs, codes, ('A', 'B', 'C')))
+    assert metrics['group_B_std'] == 0
+    assert metrics['group_C_count'] == 0
+
+@pytest.mark.parametrize('engine', ['object', 'array'])
+@pytest.mark.parametrize('model_type', ['bubble', 'chamber'])
+def test_simulation_metrics_match_recomputed(model_type, engine):
+    simulation = Simulation(make_params(model_type, engine))
+    for _ in range(4):
+        simulation.run(25, tol=None)
+        assert_metrics_match_beliefs(simulation)
+
+# --- MetricsHistory ---
+
+def make_rows(count):
+    return [{'time_step': t, 'avg_belief': t / 10, 'group_A_count': 5, 'group_A_avg': None if t == 1 else 0.25}
+            for t in range(count)]
+
+def test_history_rows_round_trip():
+    rows = make_rows(3000) # Grows past the initial capacity
+    history = MetricsHistory(rows)
+    assert len(history) == 3000
+    assert history[1] == rows[1] # None survives as NaN -> None
+    assert history[-1] == rows[-1]
+    assert list(history)[:3] == rows[:3]
+    with pytest.raises(IndexError):
+        history[3000]
+
+def test_history_columns():
+    history = MetricsHistory(make_rows(10))
+    np.testing.assert_array_equal(history.column('time_step'), np.arange(10))
+    assert history.column('time_step').dtype == np.int64
+    assert np.isnan(history.column('group_A_avg')[1])
+    assert history.column('missing') is None
+    with pytest.raises(ValueError):
+        history.column('avg_belief')[0] = 1.0
+
+def test_history_arrays_round_trip():
+    history = MetricsHistory(make_rows(10))
+    restored = MetricsHistory.from_arrays(history.to_arrays())
+    assert list(restored) == list(history)
+
+def test_history_thin_keeps_first_and_latest():
+    history = MetricsHistory(make_rows(11))
+    history.thin()
+    np.testing.assert_array_equal(history.column('time_step'), [0, 2, 4, 6, 8, 10])
+    history.append({'time_step': 11, 'avg_belief': 1.1})
+    assert history[-1]['time_step'] == 11
+    assert history[-1]['group_A_avg'] is None
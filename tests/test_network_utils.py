@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+
+from network_utils import (AGENT_COUNT_OPTIONS, _sample_bernoulli_positions, _triangle_pairs, edges_to_csr,
+                           expected_edge_count, network_size_error, reverse_edge_index,
+                           sample_group_aware_edges)
+
+# --- Interactive size limits ---
+
+def test_expected_edge_count():
+    # Two groups of 300: 2 * 300 * 299 / 2 same-group pairs and 300 * 300 cross pairs
+    assert expected_edge_count(600, 0.05, 0.005) == pytest.approx(89700 * 0.05 + 90000 * 0.005)
+    assert expected_edge_count(600, 0.0, 0.0) == 0
+
+def test_network_size_error():
+    assert network_size_error(50, 0.3, 0.05) is None
+    assert network_size_error(max(AGENT_COUNT_OPTIONS), 0.0002, 0.00002) is None
+    message = network_size_error(max(AGENT_COUNT_OPTIONS), 0.3, 0.05)
+    assert 'connections' in message
+    assert network_size_error(1000, 0.3, 0.05, max_edges=100) is not None
+
+# --- CSR adjacency ---
+
+def sample_csr(num_agents=200, seed=1):
+    u, v = sample_group_aware_edges(np.repeat([0, 1], num_agents // 2), 0.1, 0.02,
+                                    rng=np.random.default_rng(seed))
+    indptr, indices = edges_to_csr(num_agents, u, v)
+    return u, v, indptr, indices
+
+def test_edges_to_csr_is_symmetric_and_sorted():
+    u, v, indptr, indices = sample_csr()
+    rows = np.repeat(np.arange(200), np.diff(indptr))
+    assert indices.size == 2 * u.size
+    assert set(zip(rows.tolist(), indices.tolist())) == set(zip(u.tolist(), v.tolist())) | set(zip(v.tolist(), u.tolist()))
+    for node in range(200):
+        assert np.all(np.diff(indices[indptr[node]:indptr[node + 1]]) > 0)
+
+def test_reverse_edge_index():
+    _, _, indptr, indices = sample_csr()
+    reverse = reverse_edge_index(indptr, indices)
+    rows = np.repeat(np.arange(200), np.diff(indptr))
+
+    # Edge k is (rows[k] -> indices[k]); its reverse is (indices[k] -> rows[k])
+    np.testing.assert_array_equal(rows[reverse], indices)
+    np.testing.assert_array_equal(indices[reverse], rows)
+    np.testing.assert_array_equal(reverse[reverse], np.arange(indices.size))
+
+# --- Block-wise network sampling ---
+
+@pytest.mark.parametrize('n', [2, 3, 7, 50, 1001])
+def test_triangle_pairs_matches_triu_indices(n):
+    rows, cols = np.triu_indices(n, k=1)
+    i, j = _triangle_pairs(np.arange(rows.size), n)
+    np.testing.assert_array_equal(i, rows)
+    np.testing.assert_array_equal(j, cols)
+
+def test_triangle_pairs_row_ends_for_large_n():
+    # Rounding of the square root matters most at the ends of long rows
+    n = 200_000
+    total = n * (n - 1) // 2
+    t = np.array([0, 1, n - 2, n - 1, total - 2, total - 1], dtype=np.int64)
+    i, j = _triangle_pairs(t, n)
+    np.testing.assert_array_equal(i, [0, 0, 0, 1, n - 3, n - 2])
+    np.testing.assert_array_equal(j, [1, 2, n - 1, 2, n - 1, n - 1])
+
+def test_bernoulli_positions_distribution():
+    rng = np.random.default_rng(2)
+    num_trials, p, runs = 10_000, 0.01, 200
+    counts = np.zeros(10)
+    totals = []
+    for _ in range(runs):
+        positions = _sample_bernoulli_positions(num_trials, p, rng)
+        assert np.all(np.diff(positions) > 0)
+        assert positions.min(initial=0) >= 0 and positions.max(initial=0) < num_trials
+        totals.append(positions.size)
+        counts += np.bincount(positions * 10 // num_trials, minlength=10)
+
+    expected = num_trials * p
+    # Mean count within 5 standard errors of the binomial mean
+    assert abs(np.mean(totals) - expected) < 5 * np.sqrt(expected * (1 - p) / runs)
+    # Successes are spread evenly over the trials
+    assert counts.max() / counts.min() < 1.15
+
+def test_bernoulli_positions_edge_cases():
+    rng = np.random.default_rng(3)
+    assert _sample_bernoulli_positions(100, 0.0, rng).size == 0
+    assert _sample_bernoulli_positions(0, 0.5, rng).size == 0
+    np.testing.assert_array_equal(_sample_bernoulli_positions(5, 1.0, rng), np.arange(5))
+
+def test_group_aware_edges_distribution():
+    rng = np.random.default_rng(4)
+    groups = np.repeat([0, 1], 300)
+    p_intra, p_inter, runs = 0.05, 0.005, 30
+    intra_counts, inter_counts = [], []
+    for _ in range(runs):
+        u, v = sample_group_aware_edges(groups, p_intra, p_inter, rng=rng)
+        assert np.all(u < v)
+        assert np.unique(u * groups.size + v).size == u.size
+        same = groups[u] == groups[v]
+        intra_counts.append(np.count_nonzero(same))
+        inter_counts.append(np.count_nonzero(~same))
+
+    for counts, pairs, p in [(intra_counts, 300 * 299, p_intra), (inter_counts, 300 * 300, p_inter)]:
+        assert abs(np.mean(counts) - pairs * p) < 5 * np.sqrt(pairs * p * (1 - p) / runs)
+
+def test_group_aware_edges_reproducible():
+    groups = np.repeat([0, 1], 100)
+    first = sample_group_aware_edges(groups, 0.1, 0.01, rng=np.random.default_rng(5))
+    second = sample_group_aware_edges(groups, 0.1, 0.01, rng=np.random.default_rng(5))
+    np.testing.assert_array_equal(first[0], second[0])
+    np.testing.assert_array_equal(first[1], second[1])
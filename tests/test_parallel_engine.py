@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from parallel_engine import partition_bounds
+from simulation import Simulation
+from test_simulation import make_params
+
+def test_partition_bounds_cover_agents():
+    bounds = partition_bounds(10, 3)
+    assert bounds[0][0] == 0 and bounds[-1][1] == 10
+    assert all(end == next_start for (_, end), (next_start, _) in zip(bounds, bounds[1:]))
+
+@pytest.mark.parametrize('model_type,dynamic_trust,workers', [
+    ('bubble', False, 2),
+    ('chamber', False, 3),
+    ('chamber', True, 3),
+])
+def test_parallel_engine_matches_array_engine(model_type, dynamic_trust, workers):
+    # 401 agents do not split evenly, so partitions differ in size
+    array_sim = Simulation(make_params(model_type, 'array', num_agents=401, dynamic_trust=dynamic_trust))
+    parallel_sim = Simulation(make_params(model_type, 'parallel', num_agents=401, dynamic_trust=dynamic_trust,
+                                          workers=workers))
+    try:
+        array_sim.run(30, tol=None)
+        parallel_sim.run(30, tol=None)
+        np.testing.assert_array_equal(parallel_sim.arrays.beliefs, array_sim.arrays.beliefs)
+        assert parallel_sim.calculate_metrics() == array_sim.calculate_metrics()
+        if model_type == 'chamber':
+            np.testing.assert_array_equal(parallel_sim.trust_store.edge_trust, array_sim.trust_store.edge_trust)
+    finally:
+        parallel_sim.close()
+        array_sim.close()
+
+def test_closed_engine_keeps_beliefs_readable():
+    simulation = Simulation(make_params('bubble', 'parallel', num_agents=100, workers=2))
+    simulation.run(3, tol=None)
+    simulation.close()
+    assert simulation.arrays.beliefs.size == 100
+    assert simulation.agents[0].belief_state == simulation.arrays.beliefs[0]
+    with pytest.raises(RuntimeError):
+        simulation.simulation_step()
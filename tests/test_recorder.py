@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from recorder import GrowableNpy, TrajectoryRecorder, load_trajectory
+from simulation import Simulation
+from test_simulation import make_params
+
+# --- Trajectory recording ---
+
+@pytest.mark.parametrize('engine', ['object', 'array'])
+def test_trajectory_round_trip(tmp_path, engine):
+    path = str(tmp_path / 'run.npy')
+    simulation = Simulation(make_params('chamber', engine))
+    expected_steps, expected = [0], [simulation.arrays.beliefs.copy()]
+    # A tiny buffer forces many appends to the file
+    recorder = TrajectoryRecorder(path, every=3, buffer_rows=2).attach(simulation)
+    for _ in range(20):
+        simulation.simulation_step()
+        if simulation.time_step % 3 == 0:
+            expected_steps.append(simulation.time_step)
+            expected.append(simulation.arrays.beliefs.copy())
+    recorder.close()
+
+    steps, beliefs = load_trajectory(path)
+    np.testing.assert_array_equal(steps, expected_steps)
+    np.testing.assert_array_equal(beliefs, np.array(expected))
+    assert len(recorder) == len(expected_steps)
+
+    # Closing detaches the step hook
+    simulation.run(3, tol=None)
+    assert len(load_trajectory(path)[0]) == len(expected_steps)
+
+def test_trajectory_float32(tmp_path):
+    path = str(tmp_path / 'run.npy')
+    simulation = Simulation(make_params('bubble', 'array'))
+    with TrajectoryRecorder(path, dtype=np.float32).attach(simulation):
+        simulation.run(5, tol=None)
+    _, beliefs = load_trajectory(path)
+    assert beliefs.dtype == np.float32
+    assert beliefs.shape == (6, 200)
+    np.testing.assert_allclose(beliefs[-1], simulation.arrays.beliefs, rtol=1e-6)
+
+def test_growable_npy_flushed_rows_are_readable(tmp_path):
+    path = str(tmp_path / 'rows.npy')
+    rows = GrowableNpy(path, 4, buffer_rows=10)
+    rows.extend(np.arange(12.0).reshape(3, 4))
+    rows.flush()
+    np.testing.assert_array_equal(np.load(path, mmap_mode='r'), np.arange(12.0).reshape(3, 4))
+    rows.extend(np.ones((25, 4)))
+    rows.close()
+    assert np.load(path).shape == (28, 4)
@@ -0,0 +1,75 @@
+import sqlite3
+
+import numpy as np
+
+from session_manager import SimulationRegistry, SimulationSession, SQLiteSessionBackend
+from simulation import Simulation
+from test_simulation import make_params
+
+def make_registry(tmp_path, **kwargs):
+    return SimulationRegistry(backend=SQLiteSessionBackend(str(tmp_path / 'sessions.db')), **kwargs)
+
+# --- Shared SQLite backend ---
+
+def test_session_round_trips_through_backend(tmp_path):
+    registry = make_registry(tmp_path)
+    session = registry.get('a', create=True)
+    session.reset(Simulation(make_params('chamber', 'array', num_agents=60)))
+    session.simulation.run(5, tol=None)
+    session.metrics_history.append(session.simulation.calculate_metrics())
+    assert registry.save('a', session)
+
+    loaded = registry.get('a')
+    assert loaded.version == session.version
+    assert loaded.simulation_id == session.simulation_id
+    assert loaded.simulation.time_step == 5
+    np.testing.assert_array_equal(loaded.simulation.arrays.beliefs, session.simulation.arrays.beliefs)
+    assert list(loaded.metrics_history) == list(session.metrics_history)
+
+def test_stale_save_is_rejected(tmp_path):
+    registry = make_registry(tmp_path)
+    registry.get('a', create=True)
+    stale = registry.get('a') # e.g. a redraw in another worker
+    setup = registry.get('a')
+    setup.reset(Simulation(make_params('bubble', 'array', num_agents=60)))
+    assert registry.save('a', setup, overwrite=True)
+
+    # The stale copy must not undo the setup
+    stale_version = stale.version
+    assert not registry.save('a', stale)
+    assert stale.version == stale_version
+    current = registry.get('a')
+    assert current.simulation is not None
+    assert current.simulation_id == setup.simulation_id
+
+    # A save from the current version succeeds and bumps the version
+    current.simulation.run(2, tol=None)
+    assert registry.save('a', current)
+    assert current.version == setup.version + 1
+    assert registry.get('a').simulation.time_step == 2
+
+def test_overwrite_wins_over_newer_row(tmp_path):
+    registry = make_registry(tmp_path)
+    first = registry.get('a', create=True)
+    second = registry.get('a')
+    assert registry.save('a', first)
+    assert registry.save('a', second, overwrite=True)
+    assert registry.get('a').version == first.version + 1
+
+def test_backend_migrates_unversioned_table(tmp_path):
+    path = str(tmp_path / 'old.db')
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE session_checkpoints (session_id TEXT PRIMARY KEY, payload BLOB NOT NULL, "
+                 "last_access REAL NOT NULL)")
+    conn.commit()
+    conn.close()
+    backend = SQLiteSessionBackend(path)
+    assert backend.save('a', SimulationSession())
+    assert backend.load('a').version == 1
+
+def test_backend_evicts_least_recently_used(tmp_path):
+    registry = make_registry(tmp_path, max_sessions=2)
+    for session_id in ['a', 'b', 'c']:
+        registry.get(session_id, create=True)
+    assert len(registry) == 2
+    assert registry.get('a') is None
@@ -0,0 +1,150 @@
+import numpy as np
+import pytest
+
+from agent import Agent
+from events import InteractionLog, load_events
+from models import update_belief_simple, update_beliefs_batch, update_trust
+from simulation import Simulation
+
+def make_params(model_type='chamber', engine='object', num_agents=200, **overrides):
+    params = {
+        'model_type': model_type,
+        'num_agents': num_agents,
+        'connection_probability_intra': 20 / (num_agents / 2),
+        'connection_probability_inter': 2 / (num_agents / 2),
+        'initial_belief_distribution': 'bimodal',
+        'belief_update_step_size': 0.05,
+        'interaction_chance': 0.5,
+        'trust_threshold': 0.5,
+        'default_outsider_trust': 0.1,
+        'initial_high_trust': 0.9,
+        'initial_trust_setup': 'belief_based',
+        'engine': engine,
+        'seed': 7,
+    }
+    params.update(overrides)
+    return params
+
+def assert_metrics_match_beliefs(simulation):
+    """The incrementally kept metrics equal metrics recomputed from the beliefs."""
+    beliefs = simulation.arrays.beliefs
+    metrics = simulation.calculate_metrics()
+    assert metrics['avg_belief'] == pytest.approx(beliefs.mean(), abs=1e-12)
+    assert metrics['std_dev_belief'] == pytest.approx(beliefs.std(), abs=1e-9)
+    for code, label in enumerate(simulation.group_index.labels):
+        members = beliefs[simulation.group_index.codes == code]
+        assert metrics[f'group_{label}_count'] == members.size
+        assert metrics[f'group_{label}_avg'] == pytest.approx(members.mean(), abs=1e-12)
+
+# --- Update modes ---
+
+@pytest.mark.parametrize('model_type', ['bubble', 'chamber'])
+def test_sync_step_applies_messages_from_start_of_step(tmp_path, model_type):
+    simulation = Simulation(make_params(model_type, update_mode='sync'))
+    simulation.run(5, tol=None)
+    before = simulation.arrays.beliefs.copy()
+    with InteractionLog(tmp_path / 'events.npy').attach(simulation):
+        simulation.simulation_step()
+    events = load_events(tmp_path / 'events.npy')
+
+    # Every message carries its sender's belief from before the step ...
+    np.testing.assert_array_equal(events['content'], before[events['sender']])
+    # ... and the accepted ones move the recipients together
+    expected = before.copy()
+    accepted = events['accepted']
+    update_beliefs_batch(expected, events['recipient'][accepted], events['content'][accepted], 0.05)
+    np.testing.assert_array_equal(simulation.arrays.beliefs, expected)
+    assert_metrics_match_beliefs(simulation)
+
+def test_sync_mode_is_reproducible_and_differs_from_async():
+    sync_a = Simulation(make_params(update_mode='sync'))
+    sync_b = Simulation(make_params(update_mode='sync'))
+    async_run = Simulation(make_params(update_mode='async'))
+    for simulation in (sync_a, sync_b, async_run):
+        simulation.run(20, tol=None)
+    np.testing.assert_array_equal(sync_a.arrays.beliefs, sync_b.arrays.beliefs)
+    assert not np.array_equal(sync_a.arrays.beliefs, async_run.arrays.beliefs)
+
+def test_update_mode_validation():
+    with pytest.raises(ValueError):
+        Simulation(make_params(update_mode='gauss-seidel'))
+    with pytest.raises(ValueError):
+        Simulation(make_params(engine='array', update_mode='async'))
+    assert Simulation(make_params(engine='array')).update_mode == 'sync'
+    assert Simulation(make_params()).update_mode == 'async'
+
+# --- Checkpoints ---
+
+@pytest.mark.parametrize('engine', ['object', 'array'])
+@pytest.mark.parametrize('model_type', ['bubble', 'chamber'])
+def test_checkpoint_round_trip_continues_run(tmp_path, model_type, engine):
+    path = tmp_path / 'run.npz'
+    simulation = Simulation(make_params(model_type, engine, dynamic_trust=True))
+    history = simulation.advance(40)
+    simulation.save(path, metrics_history=history)
+
+    restored = Simulation.load(path)
+    assert restored.time_step == simulation.time_step
+    assert list(Simulation.load_metrics_history(path)) == history
+    np.testing.assert_array_equal(restored.arrays.beliefs, simulation.arrays.beliefs)
+
+    # The restored run continues exactly like the uninterrupted one
+    assert restored.advance(60) == simulation.advance(60)
+    np.testing.assert_array_equal(restored.arrays.beliefs, simulation.arrays.beliefs)
+    if model_type == 'chamber':
+        np.testing.assert_array_equal(restored.trust_store.edge_trust, simulation.trust_store.edge_trust)
+
+# --- Dynamic trust ---
+
+def test_update_trust_reinforces_and_decays_within_bounds():
+    recipient = Agent(0, 0.5, connections=[1, 2], trust_scores={1: 0.98, 2: 0.03})
+    update_trust(recipient, Agent(1, 0.5), reinforced=True, reinforcement=0.05)
+    update_trust(recipient, Agent(2, 0.9), reinforced=False, decay=0.05)
+    assert recipient.trust_scores == {1: 1.0, 2: 0.0}
+    update_trust(recipient, Agent(1, 0.5), reinforced=False, decay=0.25)
+    assert recipient.trust_scores[1] == pytest.approx(0.75)
+
+def test_object_engine_dynamic_trust_replays_from_event_log(tmp_path):
+    simulation = Simulation(make_params(dynamic_trust=True, trust_reinforcement=0.1, trust_decay=0.2))
+    trust_store = simulation.trust_store
+    beliefs = simulation.arrays.beliefs.copy()
+    trust = trust_store.edge_trust.copy()
+    with InteractionLog(tmp_path / 'events.npy').attach(simulation):
+        simulation.run(5, tol=None)
+    events = load_events(tmp_path / 'events.npy')
+
+    # Each message is judged with the trust left by the messages before it
+    for event in events:
+        recipient, sender, content = int(event['recipient']), int(event['sender']), event['content']
+        edge = trust_store.edge_position(recipient, sender)
+        trusted = trust[edge] >= 0.5
+        assert event['accepted'] == trusted
+        confirming = abs(content - beliefs[recipient]) < trust_store.similarity_threshold
+        trust[edge] = min(1.0, max(0.0, trust[edge] + (0.1 if trusted and confirming else -0.2)))
+        if trusted:
+            beliefs[recipient] = update_belief_simple(beliefs[recipient], content, 0.05)
+
+    assert not np.array_equal(trust, Simulation(make_params()).trust_store.edge_trust)
+    np.testing.assert_array_equal(trust_store.edge_trust, trust)
+    np.testing.assert_array_equal(simulation.arrays.beliefs, beliefs)
+    assert_metrics_match_beliefs(simulation)
+
+@pytest.mark.parametrize('engine', ['object', 'array'])
+def test_static_trust_is_unchanged(engine):
+    simulation = Simulation(make_params(engine=engine))
+    initial = simulation.trust_store.edge_trust.copy()
+    simulation.run(20, tol=None)
+    np.testing.assert_array_equal(simulation.trust_store.edge_trust, initial)
+
+@pytest.mark.parametrize('engine,update_mode', [('object', 'sync'), ('array', 'sync')])
+def test_batched_dynamic_trust_keeps_acceptance_mask_current(engine, update_mode):
+    simulation = Simulation(make_params(engine=engine, update_mode=update_mode, dynamic_trust=True))
+    trust_store = simulation.trust_store
+    initial = trust_store.edge_trust.copy()
+    simulation.run(20, tol=None)
+
+    edge_trust = trust_store.edge_trust
+    assert not np.array_equal(edge_trust, initial)
+    assert edge_trust.min() >= 0.0 and edge_trust.max() <= 1.0
+    # The mask patched by each step equals one rebuilt from the current trust
+    np.testing.assert_array_equal(trust_store.acceptance_mask(0.5), edge_trust[trust_store.reverse_edges] >= 0.5)
@@ -0,0 +1,49 @@
+import numpy as np
+
+from metrics import MetricsHistory
+from visualization import downsample_minmax, plot_metrics
+
+# --- Metrics plot downsampling ---
+
+def test_downsample_minmax_keeps_short_series():
+    x = np.arange(10)
+    y = np.linspace(0, 1, 10)
+    kept_x, kept_y = downsample_minmax(x, y, max_points=50)
+    np.testing.assert_array_equal(kept_x, x)
+    np.testing.assert_array_equal(kept_y, y)
+
+def test_downsample_minmax_keeps_envelope():
+    rng = np.random.default_rng(0)
+    x = np.arange(100_000)
+    y = rng.random(x.size) * 0.5
+    y[12_345] = 1.0 # A spike
+    y[77_777] = -1.0 # A dip
+    kept_x, kept_y = downsample_minmax(x, y, max_points=500)
+
+    assert len(kept_x) <= 500
+    assert np.all(np.diff(kept_x) > 0)
+    assert kept_x[0] == 0 and kept_x[-1] == x[-1]
+    assert 12_345 in kept_x and 77_777 in kept_x
+    np.testing.assert_array_equal(kept_y, y[kept_x])
+
+    # Every bucket keeps its own minimum and maximum
+    buckets = np.array_split(np.arange(x.size), 10)
+    for bucket in buckets:
+        inside = (kept_x >= bucket[0]) & (kept_x <= bucket[-1])
+        assert kept_y[inside].max() == y[bucket].max()
+        assert kept_y[inside].min() == y[bucket].min()
+
+def test_downsample_minmax_ignores_nan():
+    x = np.arange(1000)
+    y = np.full(x.size, np.nan)
+    y[500] = 0.3
+    kept_x, kept_y = downsample_minmax(x, y, max_points=20)
+    assert 500 in kept_x
+    assert np.nanmax(kept_y) == 0.3
+
+def test_plot_metrics_size_is_bounded():
+    history = MetricsHistory({'time_step': t, 'group_A_avg': 0.2, 'group_B_avg': 0.8} for t in range(50_000))
+    fig = plot_metrics(history, max_points=400)
+    assert len(fig.data) == 2
+    assert all(len(trace.x) <= 400 for trace in fig.data)
+    assert plot_metrics(MetricsHistory()) is None
@@ -0,0 +1,192 @@
+import numpy as np
+
+from network_utils import reverse_edge_index
+
+class TrustStore:
+    """
+    Trust scores for the Echo Chamber model without an N x N table.
+
+    Only actual network edges hold explicit scores (one float per CSR edge
+    position, so they can change during a run). Trust in any other agent is
+    derived on demand from the initial-trust rule: 'uniform_high' trusts
+    everyone with high_trust; 'belief_based' gives high_trust to agents whose
+    initial belief differs by less than similarity_threshold and
+    outsider_trust to the rest.
+
+    Whether each message would pass the trust threshold is cached as a
+    per-edge acceptance mask (see acceptance_mask), rebuilt only after the
+    scores or the threshold change.
+    """
+    def __init__(self, initial_beliefs, indptr, indices, setup_type='uniform_high',
+                 high_trust=0.9, outsider_trust=0.1, similarity_threshold=0.3, edge_trust=None):
+        """
+        Args:
+            initial_beliefs (array-like): Initial belief of every agent, by agent id.
+            indptr, indices (numpy.ndarray): Symmetric CSR adjacency of the network.
+            setup_type (str): 'uniform_high' or 'belief_based'.
+            high_trust (float): Trust given to agents the rule considers trustworthy.
+            outsider_trust (float): Trust given to dissimilar agents under 'belief_based'.
+            similarity_threshold (float): Max initial belief difference for high trust.
+            edge_trust (numpy.ndarray, optional): Explicit per-edge scores to start from
+                (e.g. from a checkpoint) instead of the setup rule.
+        """
+        if setup_type not in ('uniform_high', 'belief_based'):
+            print(f"Warning: Unknown initial_trust_setup '{setup_type}'. Using uniform_high.")
+            setup_type = 'uniform_high'
+        self.setup_type = setup_type
+        self.high_trust = high_trust
+        self.outsider_trust = outsider_trust
+        self.similarity_threshold = similarity_threshold
+        self.initial_beliefs = np.array(initial_beliefs, dtype=np.float64)
+        self.indptr = indptr
+        self.indices = indices
+
+        # Explicit scores for edges only: edge_trust[k] is agent i's trust in indices[k]
+        if edge_trust is not None:
+            self.edge_trust = np.array(edge_trust, dtype=np.float64)
+        else:
+            self.edge_trust = self._rule_edge_trust()
+
+        # Sorted initial beliefs answer "how many agents are similar to x" for averages
+        self._sorted_beliefs = np.sort(self.initial_beliefs)
+
+        # Bumped on every change to edge_trust; the acceptance mask is cached per (version, threshold)
+        self.version = 0
+        self._reverse_edges = None
+        self._mask_key = None
+        self._mask = None
+
+    def _rule_edge_trust(self):
+        """Setup-rule trust for every CSR edge position, computed over all edges at once."""
+        rows = np.repeat(np.arange(self.initial_beliefs.size), np.diff(self.indptr))
+        return self.rule_values(rows, self.indices)
+
+    def rule(self, agent_id, other_id):
+        """Initial trust agent_id places in other_id according to the setup rule."""
+        if self.setup_type == 'belief_based':
+            difference = abs(self.initial_beliefs[agent_id] - self.initial_beliefs[other_id])
+            if difference < self.similarity_threshold:
+                return self.high_trust
+            return self.outsider_trust
+        return self.high_trust
+
+    def rule_values(self, agent_ids, other_ids):
+        """Vectorized rule(): initial trust for arrays of (agent_id, other_id) pairs."""
+        if self.setup_type == 'belief_based':
+            difference = np.abs(self.initial_beliefs[agent_ids] - self.initial_beliefs[other_ids])
+            return np.where(difference < self.similarity_threshold, self.high_trust, self.outsider_trust)
+        return np.full(np.shape(other_ids), self.high_trust, dtype=np.float64)
+
+    def edge_position(self, agent_id, other_id):
+        """Returns the CSR position of edge (agent_id -> other_id), or None if not connected."""
+        start, end = self.indptr[agent_id], self.indptr[agent_id + 1]
+        k = start + np.searchsorted(self.indices[start:end], other_id)
+        if k < end and self.indices[k] == other_id:
+            return int(k)
+        return None
+
+    def get(self, agent_id, other_id, default_trust=0.1):
+        """
+        Retrieves the trust agent_id places in other_id.
+
+        Returns default_trust for the agent itself (agents hold no self-trust),
+        the explicit score for connected agents and the rule value otherwise.
+        """
+        if agent_id == other_id or not 0 <= other_id < self.initial_beliefs.size:
+            return default_trust
+        k = self.edge_position(agent_id, other_id)
+        if k is not None:
+            return float(self.edge_trust[k])
+        return self.rule(agent_id, other_id)
+
+    def set(self, agent_id, other_id, score):
+        """Sets the explicit trust score on an existing edge."""
+        k = self.edge_position(agent_id, other_id)
+        if k is None:
+            raise KeyError(f"Agents {agent_id} and {other_id} are not connected.")
+        self.edge_trust[k] = score
+        self.invalidate()
+
+    def invalidate(self):
+        """Marks edge_trust as changed; call after writing to edge_trust directly."""
+        self.version += 1
+
+    def adjust(self, positions, deltas):
+        """
+        Adds deltas to the scores at the given (unique) edge positions, clipped to [0, 1].
+
+        A cached acceptance mask is patched in place for just those edges
+        instead of being rebuilt.
+        """
+        positions = np.asarray(positions)
+        scores = np.clip(self.edge_trust[positions] + deltas, 0.0, 1.0)
+        self.edge_trust[positions] = scores
+        mask_current = self._mask_key is not None and self._mask_key[0] == self.version
+        self.version += 1
+        if mask_current:
+            trust_threshold = self._mask_key[1]
+            self._mask.flags.writeable = True
+            self._mask[self.reverse_edges[positions]] = scores >= trust_threshold
+            self._mask.flags.writeable = False
+            self._mask_key = (self.version, trust_threshold)
+
+    @property
+    def reverse_edges(self):
+        """CSR position of the reverse edge (j -> i) for every edge position (i -> j), built on first use."""
+        if self._reverse_edges is None:
+            self._reverse_edges = reverse_edge_index(self.indptr, self.indices)
+        return self._reverse_edges
+
+    def acceptance_mask(self, trust_threshold):
+        """
+        Whether the message sent along each edge passes the recipient's trust threshold.
+
+        mask[k] is True if agent indices[k] trusts the row agent of edge k (the
+        sender) at least trust_threshold, so a message sent along edge k is
+        accepted iff mask[k]. The mask is cached until the scores or the
+        threshold change.
+
+        Returns:
+            numpy.ndarray: Read-only boolean array, one entry per CSR edge position.
+        """
+        key = (self.version, trust_threshold)
+        if self._mask_key != key:
+            mask = self.edge_trust[self.reverse_edges] >= trust_threshold
+            mask.flags.writeable = False
+            self._mask, self._mask_key = mask, key
+        return self._mask
+
+    def average(self, agent_id):
+        """Average trust agent_id gives to all other agents."""
+        num_others = self.initial_beliefs.size - 1
+        if num_others <= 0:
+            return 0
+        if self.setup_type == 'belief_based':
+            num_similar = self._count_similar(self.initial_beliefs[agent_id])
+            if self.similarity_threshold > 0:
+                num_similar -= 1 # The agent itself is always within the window
+            total = num_similar * self.high_trust + (num_others - num_similar) * self.outsider_trust
+        else:
+            total = num_others * self.high_trust
+
+        # Replace the rule value by the explicit score on every edge
+        start, end = self.indptr[agent_id], self.indptr[agent_id + 1]
+        neighbors = self.indices[start:end]
+        total += float(np.sum(self.edge_trust[start:end] - self.rule_values(agent_id, neighbors)))
+        return total / num_others
+
+    def _count_similar(self, belief):
+        """Counts agents with abs(belief - initial belief) < similarity_threshold."""
+        values = self._sorted_beliefs
+        threshold = self.similarity_threshold
+        # Window bounds with a small margin; only values inside the margins need the exact test
+        margin = 1e-9
+        outer_low = np.searchsorted(values, belief - threshold - margin, side='left')
+        inner_low = np.searchsorted(values, belief - threshold + margin, side='right')
+        inner_high = np.searchsorted(values, belief + threshold - margin, side='left')
+        outer_high = np.searchsorted(values, belief + threshold + margin, side='right')
+        if inner_low >= inner_high:
+            candidates = values[outer_low:outer_high]
+            return int(np.count_nonzero(np.abs(belief - candidates) < threshold))
+        edges = np.concatenate([values[outer_low:inner_low], values[inner_high:outer_high]])
+        return int(inner_high - inner_low) + int(np.count_nonzero(np.abs(belief - edges) < threshold))
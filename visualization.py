@@ -1,80 +1,165 @@
 import plotly.graph_objects as go
 import plotly.express as px
 import networkx as nx
-import pandas as pd
+import numpy as np
 
-# --- Network Visualization Function ---
-def visualize_network(sim_state, pos):
+from groups import GroupIndex
+from metrics import MetricsHistory
+
+# Marker symbol per group code (group A = circle, group B = square, ...)
+GROUP_SYMBOLS = ["circle", "square", "diamond", "triangle-up", "cross", "star"]
+
+# Above either size, render_mode='auto' switches to WebGL (Scattergl) traces
+WEBGL_NODE_THRESHOLD = 1000
+WEBGL_EDGE_THRESHOLD = 20000
+# Edges drawn at most; larger edge sets are sampled down uniformly
+DEFAULT_MAX_EDGES = 50000
+# Points drawn per line of the metrics plot; longer histories are downsampled
+DEFAULT_MAX_PLOT_POINTS = 2000
+EDGE_MODES = ('all', 'inter', 'intra', 'sample', 'none')
+
+# --- Network Visualization Functions ---
+# The network figure is split into a static part (edges, positions, symbols,
+# hover labels) built once per setup and a dynamic part (node colors = beliefs,
+# title) that changes every step. visualize_network builds the whole figure;
+# network_figure_update returns only the dynamic part, so apps can patch an
+# existing figure instead of rebuilding and re-sending it.
+
+def _title_text(sim_state):
+    """Figure title for the current time step."""
+    return f"Network State at Time Step: {sim_state['time_step']} ({sim_state['model_type'].capitalize()})"
+
+def _belief_array(sim_state):
+    """Current beliefs of all agents, ordered by agent id."""
+    if sim_state.get('beliefs') is not None:
+        return np.asarray(sim_state['beliefs'])
+    agents = sim_state['agents']
+    return np.array([agents[agent_id].belief_state for agent_id in range(len(agents))])
+
+def _positions_array(pos, num_nodes):
+    """Converts a {node_id: (x, y)} layout (or an (N, 2) array) to an (N, 2) array."""
+    if isinstance(pos, np.ndarray):
+        return pos
+    return np.array([pos[node_id] for node_id in range(num_nodes)], dtype=np.float64).reshape(num_nodes, 2)
+
+def _edge_arrays(sim_state):
+    """(u, v) endpoint arrays of every edge, from the simulation's edge list."""
+    if sim_state.get('edges') is not None:
+        return sim_state['edges']
+    empty = np.empty(0, dtype=np.int64)
+    return empty, empty
+
+def select_edges(u, v, group_codes, edge_mode='all', sample_fraction=0.1, max_edges=DEFAULT_MAX_EDGES, seed=0):
+    """
+    Chooses which edges to draw, so large networks stay viewable.
+
+    Args:
+        u, v (numpy.ndarray): Edge endpoints.
+        group_codes (numpy.ndarray): Group code of every agent.
+        edge_mode (str): 'all', 'inter' (only edges between groups), 'intra' (only
+            edges within groups), 'sample' (a random sample_fraction of edges) or 'none'.
+        sample_fraction (float): Fraction of edges kept by 'sample'.
+        max_edges (int or None): Cap on drawn edges; larger selections are sampled down.
+        seed (int): Seed for sampling, so redraws show the same edges.
+
+    Returns:
+        tuple: (u, v) of the edges to draw.
+    """
+    if edge_mode not in EDGE_MODES:
+        raise ValueError(f"Unknown edge_mode: {edge_mode}")
+    u, v = np.asarray(u), np.asarray(v)
+    if edge_mode == 'none':
+        return u[:0], v[:0]
+    if edge_mode in ('inter', 'intra'):
+        crosses = group_codes[u] != group_codes[v]
+        keep = crosses if edge_mode == 'inter' else ~crosses
+        u, v = u[keep], v[keep]
+
+    rng = np.random.default_rng(seed)
+    if edge_mode == 'sample':
+        keep = rng.random(u.size) < sample_fraction
+        u, v = u[keep], v[keep]
+    if max_edges is not None and u.size > max_edges:
+        keep = np.sort(rng.choice(u.size, size=max_edges, replace=False))
+        u, v = u[keep], v[keep]
+    return u, v
+
+def visualize_network(sim_state, pos, render_mode='auto', edge_mode='all',
+                      edge_sample_fraction=0.1, max_edges=DEFAULT_MAX_EDGES):
     """Generates a Plotly figure for the network state.
 
     Args:
-        sim_state (dict): Dictionary containing 'agents', 'network', 'time_step', 'model_type'.
-        pos (dict): Dictionary of node positions generated by networkx layout.
+        sim_state (dict): Dictionary containing 'agents', 'edges', 'beliefs', 'time_step', 'model_type'
+            and optionally 'group_index' (groups.GroupIndex), 'beliefs' and 'edges'.
+        pos (dict): Dictionary of node positions generated by networkx layout
+            (an (N, 2) array of positions by agent id also works).
+        render_mode (str): 'svg' (go.Scatter), 'webgl' (go.Scattergl) or 'auto', which
+            uses WebGL once the network exceeds WEBGL_NODE_THRESHOLD nodes or
+            WEBGL_EDGE_THRESHOLD edges.
+        edge_mode (str): Which edges to draw (see select_edges).
+        edge_sample_fraction (float): Fraction of edges drawn when edge_mode is 'sample'.
+        max_edges (int or None): Cap on drawn edges; larger selections are sampled down.
 
     Returns:
         plotly.graph_objects.Figure: The Plotly figure object, or None if no network.
     """
     agents = sim_state['agents']
-    network = sim_state['network']
-    time_step = sim_state['time_step']
     model_type = sim_state['model_type']
 
-    if not network or not agents:
+    if not agents:
         return None
 
-    # 1. Edge Trace
-    edge_x = []
-    edge_y = []
-    if network.number_of_edges() > 0:
-        for edge in network.edges():
-            x0, y0 = pos[edge[0]]
-            x1, y1 = pos[edge[1]]
-            edge_x.extend([x0, x1, None])
-            edge_y.extend([y0, y1, None])
-
-    edge_trace = go.Scatter(
+    num_nodes = len(agents)
+    positions = _positions_array(pos, num_nodes)
+
+    # Groups are fixed: read labels and symbols straight from the group index
+    group_index = sim_state.get('group_index') or GroupIndex.from_agents(agents)
+
+    # 1. Edge Trace (one polyline, NaN breaks the line between edges)
+    all_u, all_v = _edge_arrays(sim_state)
+    if render_mode == 'auto':
+        large = num_nodes > WEBGL_NODE_THRESHOLD or len(all_u) > WEBGL_EDGE_THRESHOLD
+        render_mode = 'webgl' if large else 'svg'
+    scatter = go.Scattergl if render_mode == 'webgl' else go.Scatter
+
+    u, v = select_edges(all_u, all_v, group_index.codes, edge_mode=edge_mode,
+                        sample_fraction=edge_sample_fraction, max_edges=max_edges)
+    edge_x = np.full(3 * len(u), np.nan)
+    edge_y = np.full(3 * len(u), np.nan)
+    edge_x[0::3], edge_x[1::3] = positions[u, 0], positions[v, 0]
+    edge_y[0::3], edge_y[1::3] = positions[u, 1], positions[v, 1]
+
+    edge_trace = scatter(
         x=edge_x, y=edge_y,
         line=dict(width=0.5, color='#888'),
         hoverinfo='none',
         mode='lines')
 
     # 2. Node Trace
-    node_x = []
-    node_y = []
-    node_text = []
-    node_colors = []
-    node_symbols = []
-    node_ids = list(network.nodes())
-
-    for node_id in node_ids:
-        if node_id not in pos: # Check if node has position (might not if isolated)
-            continue
-        x, y = pos[node_id]
-        node_x.append(x)
-        node_y.append(y)
-        agent = agents[node_id]
-        belief_str = f"Belief: {agent.belief_state:.3f}"
-        trust_info = ""
-        if model_type == 'chamber' and agent.trust_scores:
-            avg_trust = sum(agent.trust_scores.values()) / len(agent.trust_scores) if agent.trust_scores else 0
-            trust_info = f"<br>Avg Trust Given: {avg_trust:.2f}"
-
-        group = agent.group
-        symbol = "circle" if group == 'A' else "square"
-
-        node_text.append(f"Agent ID: {agent.id}<br>Group: {group}<br>{belief_str}{trust_info}")
-        node_colors.append(agent.belief_state)
-        node_symbols.append(symbol)
-
-    node_trace = go.Scatter(
-        x=node_x, y=node_y,
+    group_symbols = [GROUP_SYMBOLS[code % len(GROUP_SYMBOLS)] for code in range(len(group_index.labels))]
+    node_symbols = [group_symbols[code] for code in group_index.codes.tolist()]
+    node_groups = [group_index.labels[code] for code in group_index.codes.tolist()]
+
+    # Hover labels are static; the belief is read from the (patched) marker color
+    customdata = [[agent_id, node_groups[agent_id]] for agent_id in range(num_nodes)]
+    hovertemplate = "Agent ID: %{customdata[0]}<br>Group: %{customdata[1]}<br>Belief: %{marker.color:.3f}"
+    if model_type == 'chamber':
+        for agent_id in range(num_nodes):
+            avg_trust = agents[agent_id].average_trust()
+            customdata[agent_id].append(avg_trust if avg_trust is not None else 0)
+        hovertemplate += "<br>Avg Trust Given: %{customdata[2]:.2f}"
+    hovertemplate += "<extra></extra>"
+
+    node_trace = scatter(
+        x=positions[:, 0], y=positions[:, 1],
         mode='markers',
-        hoverinfo='text',
+        customdata=customdata,
+        hovertemplate=hovertemplate,
         marker=dict(
             showscale=True,
             colorscale='RdBu',
             reversescale=False,
-            color=node_colors,
+            color=_belief_array(sim_state),
             size=10,
             symbol=node_symbols,
             colorbar=dict(
@@ -84,22 +169,25 @@ def visualize_network(sim_state, pos):
             ),
             line_width=1,
             line_color='#333'
-        ),
-        text=node_text
+        )
     )
 
     # 3. Create Figure
+    caption = "Visualization by Plotly"
+    if len(u) < len(all_u):
+        caption += f" (showing {len(u):,} of {len(all_u):,} edges)"
     fig = go.Figure(data=[edge_trace, node_trace],
                  layout=go.Layout(
                     title=dict(
-                        text=f'Network State at Time Step: {time_step} ({model_type.capitalize()})',
+                        text=_title_text(sim_state),
                         font=dict(size=16)
                     ),
                     showlegend=False,
                     hovermode='closest',
+                    uirevision='network', # Keep zoom/pan across updates
                     margin=dict(b=20,l=5,r=5,t=40),
                     annotations=[ dict(
-                        text="Visualization by Plotly",
+                        text=caption,
                         showarrow=False,
                         xref="paper", yref="paper",
                         x=0.005, y=-0.002 ) ],
@@ -108,21 +196,79 @@ def visualize_network(sim_state, pos):
                     )
     return fig
 
+def network_figure_update(sim_state, decimals=4):
+    """
+    Returns the parts of the network figure that change between steps.
+
+    Args:
+        sim_state (dict): Current simulation state (see visualize_network).
+        decimals (int): Beliefs are rounded to this many decimals to keep payloads small.
+
+    Returns:
+        dict: 'node_colors' (list of beliefs by agent id) and 'title' (str).
+    """
+    return {
+        'node_colors': np.round(_belief_array(sim_state), decimals).tolist(),
+        'title': _title_text(sim_state),
+    }
+
+def update_network_figure(fig, sim_state):
+    """Updates a figure built by visualize_network in place with the current beliefs."""
+    update = network_figure_update(sim_state)
+    fig.data[1].marker.color = update['node_colors']
+    fig.layout.title.text = update['title']
+    return fig
+
 # --- Metrics Plotting Function ---
-def plot_metrics(metrics_history):
+def downsample_minmax(x, y, max_points=DEFAULT_MAX_PLOT_POINTS):
+    """
+    Reduces a line to at most max_points points, keeping its visual envelope.
+
+    The series is cut into max_points // 2 equal buckets and each bucket keeps
+    its lowest and highest point (in x order), plus the first and last point,
+    so spikes survive while the cost stays O(len(x)) and fully vectorized.
+    NaN values are ignored.
+
+    Args:
+        x, y (numpy.ndarray): The line's coordinates, x sorted ascending.
+        max_points (int): Point budget.
+
+    Returns:
+        tuple: (x, y) of the kept points.
+    """
+    n = len(x)
+    num_buckets = max(1, (max_points - 2) // 2)
+    if n <= max_points:
+        return x, y
+    bucket_size = -(-n // num_buckets) # ceil division
+    padding = num_buckets * bucket_size - n
+    values = np.asarray(y, dtype=np.float64)
+    low = np.concatenate([np.where(np.isnan(values), np.inf, values), np.full(padding, np.inf)])
+    high = np.concatenate([np.where(np.isnan(values), -np.inf, values), np.full(padding, -np.inf)])
+    offsets = np.arange(num_buckets) * bucket_size
+    lows = offsets + np.argmin(low.reshape(num_buckets, bucket_size), axis=1)
+    highs = offsets + np.argmax(high.reshape(num_buckets, bucket_size), axis=1)
+    keep = np.unique(np.concatenate([[0, n - 1], np.minimum(lows, n - 1), np.minimum(highs, n - 1)]))
+    return x[keep], y[keep]
+
+def plot_metrics(metrics_history, max_points=DEFAULT_MAX_PLOT_POINTS):
     """Generates a Plotly figure for the simulation metrics history.
 
+    Long histories are downsampled to max_points per line (see
+    downsample_minmax), so the figure size stays flat as runs get longer.
+
     Args:
-        metrics_history (list): List of metric dictionaries.
+        metrics_history (metrics.MetricsHistory or list): Columnar history, or a list of metric dictionaries.
+        max_points (int): Point budget per plotted line.
 
     Returns:
         plotly.graph_objects.Figure: The Plotly figure object, or None if no history.
     """
     if not metrics_history or len(metrics_history) < 1:
         return None
-
-    df = pd.DataFrame(metrics_history)
-    df = df.dropna(axis=1, how='all')
+    if not isinstance(metrics_history, MetricsHistory):
+        metrics_history = MetricsHistory(metrics_history)
+    time_steps = metrics_history.column('time_step')
 
     fig = go.Figure()
     colors = px.colors.qualitative.Plotly
@@ -130,13 +276,17 @@ def plot_metrics(metrics_history):
     color_B = colors[1]
 
     # Plot Group A Avg (Thick)
-    if 'group_A_avg' in df.columns:
-        fig.add_trace(go.Scatter(x=df['time_step'], y=df['group_A_avg'], mode='lines+markers',
+    group_A_avg = metrics_history.column('group_A_avg')
+    if group_A_avg is not None and not np.isnan(group_A_avg).all():
+        x, y = downsample_minmax(time_steps, group_A_avg, max_points)
+        fig.add_trace(go.Scatter(x=x, y=y, mode='lines+markers',
                                  name='Avg Belief (Grp A)', line=dict(color=color_A, width=3)))
 
     # Plot Group B Avg (Thick)
-    if 'group_B_avg' in df.columns:
-        fig.add_trace(go.Scatter(x=df['time_step'], y=df['group_B_avg'], mode='lines+markers',
+    group_B_avg = metrics_history.column('group_B_avg')
+    if group_B_avg is not None and not np.isnan(group_B_avg).all():
+        x, y = downsample_minmax(time_steps, group_B_avg, max_points)
+        fig.add_trace(go.Scatter(x=x, y=y, mode='lines+markers',
                                  name='Avg Belief (Grp B)', line=dict(color=color_B, width=3)))
 
     fig.update_layout(